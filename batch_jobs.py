@@ -0,0 +1,388 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from html_parser import PARSER_PATTERN
+from review_stream import STREAM_MEDIA_TYPES, format_event
+from selector_cache import page_domain
+from static_fetcher import throttle_signals
+
+logger = logging.getLogger()
+
+# Batch scheduler configuration
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", "4"))
+BATCH_DOMAIN_MAX_CONCURRENCY = float(os.getenv("BATCH_DOMAIN_MAX_CONCURRENCY", "4"))
+BATCH_DECREASE_FACTOR = float(os.getenv("BATCH_DECREASE_FACTOR", "0.5"))
+BATCH_BACKOFF = float(os.getenv("BATCH_BACKOFF", "30"))
+BATCH_URL_DEADLINE = float(os.getenv("BATCH_URL_DEADLINE", "90"))
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "2"))
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "10000"))
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL", str(24 * 3600)))
+
+# How a URL of a batch ended
+RESULT_DONE = "done"
+RESULT_EMPTY = "empty"
+RESULT_FAILED = "failed"
+
+# Scrape errors that mean the site is pushing back
+THROTTLE_STATUSES = {429, 503}
+
+
+class BatchJob:
+    """URLs submitted together and their results, in the order they finished."""
+
+    def __init__(self, urls: List[str], page_limit: int, parser: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.urls = urls
+        self.page_limit = page_limit
+        self.parser = parser
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancelled = False
+        self.results: List[Dict] = []
+        self._pending = len(urls)
+        self._changed = threading.Condition()
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is None:
+            return "running"
+        return "cancelled" if self.cancelled else "finished"
+
+    def record(self, result: Dict):
+        with self._changed:
+            self.results.append(result)
+            self._settle(1)
+
+    def drop(self, count: int):
+        """Forget `count` URLs that were cancelled before they ran."""
+        with self._changed:
+            self._settle(count)
+
+    def wait(self, offset: int, timeout: float) -> Tuple[List[Dict], bool]:
+        """Results after the first `offset`, waiting up to `timeout` for one, and whether the job is over."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.results) > offset or self.finished_at is not None, timeout)
+            return self.results[offset:], self.finished_at is not None
+
+    def snapshot(self, offset: int = 0) -> Dict:
+        with self._changed:
+            counts = {outcome: 0 for outcome in (RESULT_DONE, RESULT_EMPTY, RESULT_FAILED)}
+            for result in self.results:
+                counts[result["status"]] += 1
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "total": len(self.urls),
+                "completed": len(self.results),
+                "counts": counts,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "results": self.results[offset:]
+            }
+
+    def _settle(self, count: int):
+        self._pending -= count
+        if self._pending <= 0 and self.finished_at is None:
+            self.finished_at = time.time()
+        self._changed.notify_all()
+
+
+class DomainState:
+    """A domain's queued URLs and its AIMD concurrency window.
+
+    The window grows by one per success until the first sign of pushback
+    (slow start), then by one per window's worth of successes. Errors,
+    timeouts and 429/503s halve it, at most once per window: failures of
+    requests started before the last cut don't cut it again. A 429/503 also
+    pauses the domain for its Retry-After or BATCH_BACKOFF.
+    """
+
+    def __init__(self, max_limit: float = BATCH_DOMAIN_MAX_CONCURRENCY):
+        self.max_limit = max(1.0, max_limit)
+        # Starts at one so the first page discovers and caches the domain's
+        # selectors and tier before the rest of the batch shares them
+        self.limit = 1.0
+        self.threshold = self.max_limit
+        self.in_flight = 0
+        self.queue: Deque[Tuple[BatchJob, str, int]] = deque()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.failures = 0
+
+    def runnable(self, now: float) -> bool:
+        return bool(self.queue) and self.in_flight < int(self.limit) and now >= self.blocked_until
+
+    def succeeded(self):
+        self.successes += 1
+        self.limit += 1.0 if self.limit < self.threshold else 1.0 / self.limit
+        self.limit = min(self.limit, self.max_limit)
+
+    def congested(self, started_at: float, retry_after: Optional[float]):
+        now = time.monotonic()
+        self.failures += 1
+        if started_at >= self.last_decrease:
+            self.limit = max(1.0, self.limit * BATCH_DECREASE_FACTOR)
+            self.threshold = self.limit
+            self.last_decrease = now
+        if retry_after is not None:
+            self.blocked_until = max(self.blocked_until, now + max(retry_after, BATCH_BACKOFF))
+
+    def snapshot(self, now: float) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self.queue),
+            "paused_for": max(0.0, round(self.blocked_until - now, 1)),
+            "successes": self.successes,
+            "failures": self.failures
+        }
+
+
+class BatchScheduler:
+    """Runs batch jobs' URLs with per-domain adaptive concurrency.
+
+    URLs are queued per domain and dispatched round-robin across domains,
+    so one big site can't starve the rest. At most `max_in_flight` scrapes
+    run at once, on the scheduler's own threads, so batches never take the
+    interactive endpoints' executor slots. `scrape(url, page_limit, parser)`
+    is the app's blocking single-URL scrape.
+
+    A URL still running after `deadline` seconds fails and frees its slot;
+    its scrape is left to finish on its own thread and its result dropped.
+    """
+
+    def __init__(self, scrape: Callable, max_in_flight: int = BATCH_MAX_IN_FLIGHT, deadline: float = BATCH_URL_DEADLINE):
+        self.scrape = scrape
+        self.max_in_flight = max(1, max_in_flight)
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="batch")
+        self._domains: "OrderedDict[str, DomainState]" = OrderedDict()
+        self._jobs: Dict[str, BatchJob] = {}
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def start(self):
+        self._dispatcher = threading.Thread(target=self._dispatch, name="batch-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, urls: List[str], page_limit: int, parser: Optional[str] = None) -> BatchJob:
+        job = BatchJob(urls, page_limit, parser)
+        with self._cond:
+            self._expire_jobs()
+            self._jobs[job.id] = job
+            for url in urls:
+                self._domain(page_domain(url)).queue.append((job, url, 0))
+            self._cond.notify_all()
+        logger.info(f"Queued batch {job.id} with {len(urls)} URLs")
+        return job
+
+    def job(self, job_id: str) -> Optional[BatchJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job: BatchJob):
+        """Drop the job's queued URLs; ones already running still finish."""
+        with self._cond:
+            job.cancelled = True
+            dropped = 0
+            for state in self._domains.values():
+                kept = deque(entry for entry in state.queue if entry[0] is not job)
+                dropped += len(state.queue) - len(kept)
+                state.queue = kept
+        job.drop(dropped)
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "jobs": len(self._jobs),
+                "domains": {domain: state.snapshot(now) for domain, state in self._domains.items()}
+            }
+
+    def _domain(self, domain: str) -> DomainState:
+        state = self._domains.get(domain)
+        if state is None:
+            state = self._domains[domain] = DomainState()
+        return state
+
+    def _expire_jobs(self):
+        cutoff = time.time() - BATCH_JOB_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _dispatch(self):
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                picked = self._next_runnable(now)
+                if picked is None:
+                    self._cond.wait(self._idle_wait(now))
+                    continue
+                domain, state, entry = picked
+                state.in_flight += 1
+                self._in_flight += 1
+                self._executor.submit(self._run, domain, state, *entry)
+
+    def _next_runnable(self, now: float) -> Optional[Tuple[str, DomainState, Tuple[BatchJob, str, int]]]:
+        if self._in_flight >= self.max_in_flight:
+            return None
+        for domain, state in self._domains.items():
+            if state.runnable(now):
+                # Rotate so the next pick starts with another domain
+                self._domains.move_to_end(domain)
+                return domain, state, state.queue.popleft()
+        return None
+
+    def _idle_wait(self, now: float) -> Optional[float]:
+        """Until the earliest paused domain with work resumes, or None to wait for a notify."""
+        paused = [state.blocked_until - now for state in self._domains.values() if state.queue and state.blocked_until > now]
+        return min(paused) if paused else None
+
+    def _run(self, domain: str, state: DomainState, job: BatchJob, url: str, attempt: int):
+        started_at = time.monotonic()
+        result = {"url": url, "attempts": attempt + 1}
+        pushback = False
+        future = self._start_scrape(url, job)
+        try:
+            if not wait([future], timeout=self.deadline).done:
+                logger.warning(f"Batch scrape of {url} did not finish within {self.deadline:.0f}s")
+                result.update(status=RESULT_FAILED, error=f"Scraping did not finish within {self.deadline:.0f}s")
+                pushback = True
+            else:
+                response = future.result()
+                # Validators are only for the response cache
+                result.update(status=RESULT_DONE, response=jsonable_encoder(response, exclude={"validators"}))
+        except HTTPException as e:
+            # A page without reviews is an answer, not a sign of overload
+            result.update(status=RESULT_EMPTY if e.status_code == 404 else RESULT_FAILED, error=e.detail)
+            pushback = e.status_code != 404
+        except Exception as e:
+            logger.error(f"Batch scrape of {url} failed: {e}")
+            result.update(status=RESULT_FAILED, error=str(e))
+            pushback = True
+        elapsed = time.monotonic() - started_at
+        retry_after = throttle_signals.take(domain)
+        retry = result["status"] == RESULT_FAILED and attempt < BATCH_RETRIES and not job.cancelled
+
+        with self._cond:
+            state.in_flight -= 1
+            self._in_flight -= 1
+            if pushback or retry_after is not None:
+                state.congested(started_at, retry_after)
+                logger.info(f"Batch concurrency for {domain} cut to {int(state.limit)}")
+            elif result["status"] == RESULT_DONE:
+                state.succeeded()
+            if retry:
+                state.queue.append((job, url, attempt + 1))
+            self._cond.notify_all()
+        if not retry:
+            result["elapsed"] = round(elapsed, 3)
+            job.record(result)
+
+    def _start_scrape(self, url: str, job: BatchJob) -> Future:
+        """Scrape on a thread of its own, so one past the deadline can be abandoned.
+
+        A hung scrape can't be stopped; on the scheduler's pool it would hold
+        a slot forever.
+        """
+        future = Future()
+
+        def scrape():
+            try:
+                future.set_result(self.scrape(url, job.page_limit, job.parser))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=scrape, name="batch-scrape", daemon=True).start()
+        return future
+
+
+class BatchRequest(BaseModel):
+    urls: List[str] = Field(..., description="Product page URLs to scrape")
+    page_limit: int = Field(5, description="Maximum number of pages to scrape per URL")
+    parser: Optional[str] = Field(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)")
+
+
+def add_batch_routes(app: FastAPI, scheduler: BatchScheduler):
+    """Serve batch jobs backed by `scheduler` under /api/batch."""
+    def find_job(job_id: str) -> BatchJob:
+        job = scheduler.job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown batch job")
+        return job
+
+    @app.post("/api/batch")
+    async def submit_batch(request: BatchRequest):
+        """Queue many product URLs at once; poll or stream the returned job for results."""
+        if not request.urls:
+            raise HTTPException(status_code=400, detail="No URLs given")
+        if len(request.urls) > BATCH_MAX_URLS:
+            raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_URLS} URLs per batch")
+        return scheduler.submit(request.urls, request.page_limit, request.parser).snapshot()
+
+    @app.get("/api/batch/{job_id}")
+    async def get_batch(
+        job_id: str,
+        offset: int = Query(0, description="Skip this many results, e.g. the count seen by an earlier poll")
+    ):
+        """Progress of a batch job and its results so far."""
+        return find_job(job_id).snapshot(offset)
+
+    @app.get("/api/batch/{job_id}/stream")
+    async def stream_batch(
+        job_id: str,
+        format: str = Query("ndjson", regex="^(ndjson|sse)$", description="Stream as NDJSON or server-sent events"),
+        offset: int = Query(0, description="Skip this many results, e.g. to resume a dropped stream")
+    ):
+        """Stream a batch job's results as each URL finishes, then a summary."""
+        job = find_job(job_id)
+
+        async def events() -> AsyncIterator[str]:
+            seen = offset
+            while True:
+                results, finished = await run_in_threadpool(job.wait, seen, 1.0)
+                for result in results:
+                    yield format_event({"event": "result", **result}, format)
+                seen += len(results)
+                if finished and not results:
+                    break
+            summary = job.snapshot(seen)
+            del summary["results"]
+            yield format_event({"event": "summary", **summary}, format)
+
+        return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[format])
+
+    @app.delete("/api/batch/{job_id}")
+    async def cancel_batch(job_id: str):
+        """Cancel a batch job's queued URLs; ones already running still finish."""
+        job = find_job(job_id)
+        scheduler.cancel(job)
+        return job.snapshot(len(job.results))
+
+    @app.get("/api/batch-scheduler")
+    async def get_batch_scheduler_stats():
+        """Per-domain concurrency windows, queues and pauses of the batch scheduler."""
+        return scheduler.snapshot()
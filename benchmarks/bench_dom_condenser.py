@@ -0,0 +1,51 @@
+"""Compare the old 3000-character prompt slice with the condensed DOM.
+
+For each corpus page, reports prompt tokens and whether the prompt contains
+a complete review that the default selectors can extract.
+
+Usage:
+    python benchmarks/bench_dom_condenser.py --budget 1000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_parsers import FIELD_SELECTORS, REVIEW_ITEM_SELECTORS  # noqa: E402
+from benchmarks.fixtures import load_corpus  # noqa: E402
+from dom_condenser import condense_html, estimate_tokens  # noqa: E402
+from html_parser import parse_html  # noqa: E402
+from selector_matcher import SelectorMatcher, select_first_working  # noqa: E402
+
+PROMPT_SLICE = 3000
+
+
+def has_review(prompt_html: str) -> bool:
+    """Whether a review container with a body is visible in the prompt."""
+    _, elements = select_first_working(parse_html(prompt_html), REVIEW_ITEM_SELECTORS)
+    matcher = SelectorMatcher({"body": FIELD_SELECTORS["body"]})
+    return any(matcher.match(element)["body"] for element in elements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=None, help="Token budget (default: LLM_PROMPT_TOKENS)")
+    args = parser.parse_args()
+
+    for name, html_content in load_corpus().items():
+        sliced = html_content[:PROMPT_SLICE]
+        start = time.perf_counter()
+        condensed = condense_html(html_content, args.budget) if args.budget else condense_html(html_content)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<11} page {estimate_tokens(html_content):>7} tok  "
+            f"slice {estimate_tokens(sliced):>5} tok review={'yes' if has_review(sliced) else 'no ':<3}  "
+            f"condensed {estimate_tokens(condensed):>5} tok review={'yes' if has_review(condensed) else 'no ':<3}  "
+            f"in {elapsed * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Compare in-page extraction with shipping `page_source` to Python.
+
+Loads every corpus page in headless Chrome and extracts its reviews both
+ways with review1's DEFAULT_SELECTORS and review2's REVIEW_SELECTORS.
+Checks that both ways give the same reviews, fingerprint and next link,
+then reports the bytes sent over the WebDriver connection and the time
+from rendered page to reviews.
+
+Needs Chrome and chromedriver (set CHROMEDRIVER_PATH to skip the download).
+
+Usage:
+    python benchmarks/bench_in_page_extraction.py --repeat 3
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The services read these at import time: stub Groq and keep their SQLite
+# files and review2's log file out of the working tree
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+_cwd = os.getcwd()
+os.chdir(SCRATCH_DIR)
+try:
+    import review1  # noqa: E402
+    import review2  # noqa: E402
+finally:
+    os.chdir(_cwd)
+from benchmarks.fixtures import CORPUS_DIR, load_corpus  # noqa: E402
+from browser_pool import create_chrome_driver  # noqa: E402
+from html_parser import parse_html  # noqa: E402
+from in_page_extraction import ExtractedPage, extract_in_page, page_fingerprint_in_page  # noqa: E402
+from llm_selectors import extract_review_data  # noqa: E402
+from pagination import find_next_link  # noqa: E402
+from selector_cache import page_fingerprint  # noqa: E402
+from selector_matcher import SelectorMatcher, select_first_working  # noqa: E402
+
+REVIEW1_FIELDS = {field: review1.DEFAULT_SELECTORS[field] for field in ("body", "rating", "reviewer")}
+REVIEW2_FIELDS = {field: review2.REVIEW_SELECTORS[field] for field in ("review_text", "rating", "reviewer")}
+
+
+def review1_from_soup(soup) -> List[Dict]:
+    _, elements = select_first_working(soup, review1.DEFAULT_SELECTORS["review_item"])
+    matcher = SelectorMatcher(REVIEW1_FIELDS)
+    reviews = (extract_review_data(element, matcher) for element in elements)
+    return [review.dict() for review in reviews if review]
+
+
+def review2_from_soup(soup) -> List[Dict]:
+    return [review.dict() for review in review2.extract_reviews(soup)]
+
+
+# Extractor name -> (Python extraction from a soup, container selectors,
+# field selectors, review builder)
+EXTRACTORS: Dict[str, Tuple[Callable, List[str], Dict[str, List[str]], Callable]] = {
+    "review1": (review1_from_soup, review1.DEFAULT_SELECTORS["review_item"], REVIEW1_FIELDS, review1.build_review),
+    "review2": (review2_from_soup, review2.REVIEW_SELECTORS["review_containers"], REVIEW2_FIELDS, review2.build_review)
+}
+
+
+def via_page_source(driver, extract: Callable) -> Tuple[List[Dict], int, float]:
+    start = time.perf_counter()
+    html_content = driver.page_source
+    reviews = extract(parse_html(html_content))
+    return reviews, len(html_content.encode("utf-8")), time.perf_counter() - start
+
+
+def via_page(driver, containers: List[str], fields: Dict[str, List[str]], build: Callable) -> Tuple[List[Dict], int, float]:
+    start = time.perf_counter()
+    result = extract_in_page(driver, containers, fields)
+    reviews = [review.dict() for review in map(build, result.fields) if review]
+    return reviews, result.size, time.perf_counter() - start
+
+
+def check_page_parity(driver, name: str, url: str):
+    """The fingerprint and next link must match what the Python side finds in the HTML."""
+    soup = parse_html(driver.page_source)
+    if page_fingerprint_in_page(driver) != page_fingerprint(soup):
+        raise SystemExit(f"In-page fingerprint differs from selector_cache's on {name}")
+    _, containers, fields, _ = EXTRACTORS["review1"]
+    result = extract_in_page(driver, containers, fields)
+    if find_next_link(parse_html(ExtractedPage([], result.next_link)), url) != find_next_link(soup, url):
+        raise SystemExit(f"In-page next link differs from find_next_link's on {name}")
+
+
+def run(driver, name: str, repeat: int):
+    url = "file://" + os.path.join(os.path.abspath(CORPUS_DIR), f"{name}.html")
+    driver.get(url)
+    check_page_parity(driver, name, url)
+    print(name)
+    for extractor, (extract, containers, fields, build) in EXTRACTORS.items():
+        source_runs = [via_page_source(driver, extract) for _ in range(repeat)]
+        page_runs = [via_page(driver, containers, fields, build) for _ in range(repeat)]
+        reviews, source_bytes, _ = source_runs[0]
+        if page_runs[0][0] != reviews:
+            raise SystemExit(f"In-page extraction differs from {extractor}'s Python extraction on {name}")
+        source_time = statistics.median(run[2] for run in source_runs)
+        page_time = statistics.median(run[2] for run in page_runs)
+        page_bytes = page_runs[0][1]
+        print(
+            f"  {extractor:<8} {len(reviews):6d} reviews  "
+            f"page_source {source_bytes / 1024:8.1f} KB {source_time * 1000:8.1f} ms  "
+            f"in-page {page_bytes / 1024:8.1f} KB {page_time * 1000:8.1f} ms  "
+            f"({source_bytes / max(page_bytes, 1):.1f}x smaller, {source_time / max(page_time, 1e-9):.1f}x faster)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pages", nargs="+", help="Corpus entries to run (default: all)")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    driver = create_chrome_driver()
+    try:
+        for name in args.pages or corpus:
+            run(driver, name, args.repeat)
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Compare review2's extraction loop under synchronous and queued logging.
+
+Runs review2's extraction over the corpus three ways:
+  sync        the old setup: DEBUG records formatted and written to a
+              stream and a file on the calling thread, one eager
+              f-string and `review.dict()` per extracted review
+  structured  structured_logging: sampled, rate-limited records handed to
+              a queue and written on the listener thread
+  off         logging disabled, the floor for either setup
+
+Checks that all three extract the same reviews, then reports the CPU time
+the extraction thread spends per corpus pass, what logging adds to it per
+review and, for the queued setup, what the listener thread spends. Log output goes to files in a scratch
+directory.
+
+Usage:
+    python benchmarks/bench_logging.py --repeat 5
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import traceback
+from contextlib import redirect_stderr
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The services read these at import time: stub Groq and keep their SQLite
+# files and review2's log file out of the working tree
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+_cwd = os.getcwd()
+os.chdir(SCRATCH_DIR)
+# review2 configures queued logging on import; send its stream to a file too
+_structured_stream = open(os.path.join(SCRATCH_DIR, "structured.stream.log"), "w")
+try:
+    with redirect_stderr(_structured_stream):
+        import review2  # noqa: E402
+finally:
+    os.chdir(_cwd)
+from benchmarks.fixtures import load_corpus  # noqa: E402
+from html_parser import parse_html  # noqa: E402
+from pattern_extraction import FIELD_MATCHER, REVIEW_SELECTORS, build_review  # noqa: E402
+from selector_matcher import select_first_working  # noqa: E402
+
+logger = logging.getLogger()
+
+
+def legacy_extract_reviews(soup) -> List:
+    """review2.extract_reviews with the logging calls it had before structured logging."""
+    reviews = []
+    container_selector, review_elements = select_first_working(soup, REVIEW_SELECTORS["review_containers"])
+    if not container_selector:
+        logger.warning("No review containers found")
+        return reviews
+
+    logger.debug(f"Found working selector: {container_selector}")
+    logger.info(f"Found {len(review_elements)} potential review containers")
+
+    for element in review_elements:
+        try:
+            matches = FIELD_MATCHER.match(element)
+            if not matches["review_text"]:
+                continue
+
+            fields = {field: match.get_text(strip=True) if match else None for field, match in matches.items()}
+            fields["images"] = [img["src"] for img in element.select("img[src]")]
+            review = build_review(fields)
+            if review is None:
+                continue
+            reviews.append(review)
+            logger.debug(f"Successfully extracted review: {review.dict()}")
+
+        except Exception as e:
+            logger.error(f"Error extracting single review: {str(e)}")
+            logger.error(traceback.format_exc())
+            continue
+
+    return reviews
+
+
+def sync_handlers() -> List[logging.Handler]:
+    """The handlers review2 used to pass to `logging.basicConfig`."""
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    handlers = [
+        logging.StreamHandler(open(os.path.join(SCRATCH_DIR, "sync.stream.log"), "w")),
+        logging.FileHandler(os.path.join(SCRATCH_DIR, "sync.log"))
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def run_pass(extract: Callable, soups: Dict) -> Dict[str, List[Dict]]:
+    return {name: [review.dict() for review in extract(soup)] for name, soup in soups.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    soups = {name: parse_html(html) for name, html in load_corpus().items()}
+    queued = list(logger.handlers)
+    listener_queue = queued[0].queue
+    # Setup name -> (extraction function, root handlers)
+    setups = {
+        "sync": (legacy_extract_reviews, sync_handlers()),
+        "structured": (review2.extract_reviews, queued),
+        "off": (review2.extract_reviews, [])
+    }
+
+    # Interleave the setups so drift in machine load hits them all alike.
+    # CPU time keeps other processes out of the numbers: the extraction
+    # thread's own, and the whole process's including the listener thread.
+    results, drain_times = {}, []
+    times: Dict[str, List[float]] = {name: [] for name in setups}
+    for _ in range(args.repeat):
+        for name, (extract, handlers) in setups.items():
+            logger.handlers = handlers
+            logging.disable(logging.CRITICAL if name == "off" else logging.NOTSET)
+            start, process_start = time.thread_time(), time.process_time()
+            results[name] = run_pass(extract, soups)
+            times[name].append(time.thread_time() - start)
+            if name == "structured":
+                listener_queue.join()
+                drain_times.append(time.process_time() - process_start)
+    logger.handlers = queued
+    logging.disable(logging.NOTSET)
+
+    if not results["sync"] == results["structured"] == results["off"]:
+        raise SystemExit("Extraction output differs between logging setups")
+
+    reviews = sum(len(page) for page in results["off"].values())
+    print(f"{len(soups)} pages, {reviews} reviews per pass, best of {args.repeat}")
+    floor = min(times["off"])
+    for name in setups:
+        best = min(times[name])
+        overhead = (best - floor) / reviews * 1e6
+        print(f"  {name:<11} {best * 1000:8.1f} ms  logging {overhead:6.1f} us/review")
+    listener = (min(drain_times) - min(times["structured"])) / reviews * 1e6
+    print(f"  structured listener thread: {listener:6.1f} us/review")
+    print(f"Log files in {SCRATCH_DIR}")
+
+
+if __name__ == "__main__":
+    main()
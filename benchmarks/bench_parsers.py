@@ -0,0 +1,86 @@
+"""Compare HTML parser backends on the benchmark corpus.
+
+Checks that every installed backend extracts the same review fields, then
+reports parse time and peak allocation per backend.
+
+Usage:
+    python benchmarks/bench_parsers.py --repeat 3
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import load_corpus  # noqa: E402
+from html_parser import FALLBACK_PARSER, available_backends, parse_html  # noqa: E402
+from selector_matcher import SelectorMatcher, select_first_working  # noqa: E402
+
+# Selectors from review1.DEFAULT_SELECTORS
+REVIEW_ITEM_SELECTORS = [".review", "[class*=review]", "[class*=Review]", ".product-review", ".comment", "[data-review]"]
+FIELD_SELECTORS = {
+    "body": [".review-content", ".review-text", ".review-body", "p", "[class*=review-content]", "[class*=ReviewText]"],
+    "rating": [".rating", ".stars", "[class*=rating]", "[class*=stars]", "[data-rating]"],
+    "reviewer": [".reviewer-name", ".author", ".username", "[class*=author]", "[class*=reviewer]"]
+}
+
+
+def extract_fields(html_content: str, backend: str) -> List[Dict[str, Optional[str]]]:
+    soup = parse_html(html_content, backend)
+    _, elements = select_first_working(soup, REVIEW_ITEM_SELECTORS)
+    matcher = SelectorMatcher(FIELD_SELECTORS)
+    return [
+        {field: match.get_text(strip=True) if match else None for field, match in matcher.match(element).items()}
+        for element in elements
+    ]
+
+
+def time_parse(html_content: str, backend: str, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_html(html_content, backend)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(html_content: str, backend: str) -> int:
+    tracemalloc.start()
+    try:
+        soup = parse_html(html_content, backend)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del soup
+    return peak
+
+
+def run(name: str, html_content: str, backends: List[str], repeat: int):
+    baseline = extract_fields(html_content, FALLBACK_PARSER)
+    print(f"{name} ({len(html_content) / 1024:.0f} KB, {len(baseline)} reviews)")
+    for backend in backends:
+        if extract_fields(html_content, backend) != baseline:
+            raise SystemExit(f"{backend} extracts different reviews than {FALLBACK_PARSER} on {name}")
+        parse_time = time_parse(html_content, backend, repeat)
+        peak = peak_memory(html_content, backend)
+        print(f"  {backend:<12} parse {parse_time * 1000:8.1f} ms  peak {peak / 1024 / 1024:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pages", nargs="+", help="Corpus entries to run (default: all)")
+    args = parser.parse_args()
+
+    backends = available_backends()
+    print(f"Backends: {', '.join(backends)}")
+    corpus = load_corpus()
+    for name in args.pages or corpus:
+        run(name, corpus[name], backends, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
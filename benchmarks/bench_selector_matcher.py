@@ -0,0 +1,107 @@
+"""Compare per-field selector loops with the single-pass SelectorMatcher.
+
+Usage:
+    python benchmarks/bench_selector_matcher.py --reviews 100 300 1000
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selector_matcher import SelectorMatcher  # noqa: E402
+
+# Field selectors from review1.DEFAULT_SELECTORS
+FIELD_SELECTORS = {
+    "body": [".review-content", ".review-text", ".review-body", "p", "[class*=review-content]", "[class*=ReviewText]"],
+    "rating": [".rating", ".stars", "[class*=rating]", "[class*=stars]", "[data-rating]"],
+    "reviewer": [".reviewer-name", ".author", ".username", "[class*=author]", "[class*=reviewer]"]
+}
+REVIEW_ITEM_SELECTOR = ".review"
+
+
+def build_page(review_count: int) -> str:
+    """Product page whose review fields mostly match low-priority selectors."""
+    reviews = "".join(
+        f"""
+        <div class="review">
+          <div class="review-header">
+            <span class="review-author-name">Customer {i}</span>
+            <div class="star-rating-widget" data-rating="{i % 5 + 1}"><i></i><i></i><i></i></div>
+          </div>
+          <div class="review-meta"><time>2024-01-{i % 28 + 1:02d}</time><a href="#">Report</a></div>
+          <div class="ReviewTextBlock"><span>Review number {i}: solid product, arrived on time.</span></div>
+          <ul class="helpful"><li><button>Yes</button></li><li><button>No</button></li></ul>
+        </div>"""
+        for i in range(review_count)
+    )
+    return f"<html><body><div id='reviews'>{reviews}</div></body></html>"
+
+
+def find_working_selector(soup, selectors: List[str]) -> Optional[str]:
+    """The selector loop review1/review2 used before the compiled matcher."""
+    for selector in selectors:
+        try:
+            if soup.select(selector):
+                return selector
+        except Exception:
+            continue
+    return None
+
+
+def legacy_match(element) -> Dict[str, Optional[str]]:
+    result = {}
+    for field, selectors in FIELD_SELECTORS.items():
+        selector = find_working_selector(element, selectors)
+        match = element.select_one(selector) if selector else None
+        result[field] = match.get_text(strip=True) if match else None
+    return result
+
+
+def compiled_match(matcher: SelectorMatcher, element) -> Dict[str, Optional[str]]:
+    return {
+        field: match.get_text(strip=True) if match else None
+        for field, match in matcher.match(element).items()
+    }
+
+
+def run(review_count: int, repeat: int):
+    soup = BeautifulSoup(build_page(review_count), "html.parser")
+    elements = soup.select(REVIEW_ITEM_SELECTOR)
+    matcher = SelectorMatcher(FIELD_SELECTORS)
+
+    legacy_times, compiled_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        legacy = [legacy_match(element) for element in elements]
+        legacy_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        compiled = [compiled_match(matcher, element) for element in elements]
+        compiled_times.append(time.perf_counter() - start)
+
+    if legacy != compiled:
+        raise SystemExit(f"Matcher output differs from the selector loops at {review_count} reviews")
+
+    legacy_best, compiled_best = min(legacy_times), min(compiled_times)
+    print(
+        f"{review_count:>6} reviews  loops {legacy_best * 1000:8.1f} ms  "
+        f"compiled {compiled_best * 1000:8.1f} ms  speedup {legacy_best / compiled_best:5.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for review_count in args.reviews:
+        run(review_count, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
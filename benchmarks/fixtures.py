@@ -0,0 +1,164 @@
+"""Product page corpus shared by the benchmarks.
+
+Pages are saved under benchmarks/corpus/ so every run (and every commit
+being compared) parses byte-identical input; drop real saved product pages
+in there too and they join the corpus. Regenerate the synthetic ones with
+`python benchmarks/fixtures.py`; `huge` is too big to commit and is
+written on first use.
+
+Each layout mirrors a pattern our selector lists target, so the review1
+(`DEFAULT_SELECTORS`) and review2 (`REVIEW_SELECTORS`) extractors find
+reviews on all of them. Like real product pages, the reviews sit behind a
+few KB of styles, scripts, icons and navigation.
+"""
+import os
+import argparse
+from typing import Callable, Dict
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>Product {layout}</title>
+  <style>{styles}</style>
+  <script>window.dataLayer = [{{"page": "product"}}];</script>
+  <script>{script}</script>
+</head>
+<body>
+  <svg style="display:none">{icons}</svg>
+  <nav><ul>{nav}</ul></nav>
+  <main>
+    <h1>Product {layout}</h1>
+    <section id="reviews-container">{reviews}</section>
+  </main>
+  <footer><p>Footer text</p></footer>
+</body>
+</html>"""
+
+
+def _styles() -> str:
+    return " ".join(f".block-{i} {{ margin: {i}px; padding: {i % 7}px; color: #{i * 4111 % 0xffffff:06x}; }}" for i in range(60))
+
+
+def _script() -> str:
+    return "var config = {" + ", ".join(f'"flag{i}": {str(i % 2 == 0).lower()}' for i in range(120)) + "};"
+
+
+def _icons() -> str:
+    return "".join(f'<symbol id="icon-{i}"><path d="M{i} 0 L{i + 10} 10 L{i} 20 Z"></path></symbol>' for i in range(20))
+
+
+def _nav() -> str:
+    return "".join(f'<li><a href="/category/{i}">Category {i}</a></li>' for i in range(40))
+
+
+def simple_review(i: int) -> str:
+    return (
+        f'<div class="review">'
+        f'<span class="reviewer-name">Customer {i}</span>'
+        f'<span class="rating">{i % 5 + 1}</span>'
+        f'<p class="review-text">Review {i}: does what it says, arrived quickly.</p>'
+        f'</div>'
+    )
+
+
+def nested_review(i: int) -> str:
+    return (
+        f'<div class="review product-review" data-review="{i}">'
+        f'<div class="review-header"><div class="review-meta">'
+        f'<span class="author"><a href="/u/{i}">Customer {i}</a></span>'
+        f'<div class="stars" data-rating="{i % 5 + 1}"><span>{i % 5 + 1} out of 5</span></div>'
+        f'</div></div>'
+        f'<div class="review-body"><div><div><p>Review {i}: nested several levels deep.</p>'
+        f'<img src="/images/review-{i}.jpg"></div></div></div>'
+        f'</div>'
+    )
+
+
+def obfuscated_review(i: int) -> str:
+    return (
+        f'<div class="sc-{i % 7}x ReviewCard__Root-a{i % 3}">'
+        f'<div class="ReviewCard__AuthorName-b1">Customer {i}</div>'
+        f'<div class="RatingStars__Value-c2" aria-label="{i % 5 + 1} stars">{(i % 5 + 1) * 20}%</div>'
+        f'<div class="ReviewTextBody-d3"><span>Review {i}: hashed class names everywhere.</span></div>'
+        f'</div>'
+    )
+
+
+LAYOUTS: Dict[str, Callable[[int], str]] = {
+    "simple": simple_review,
+    "nested": nested_review,
+    "obfuscated": obfuscated_review
+}
+
+# Named corpus entries: (layout, review count)
+CORPUS = {
+    "small": ("simple", 10),
+    "nested": ("nested", 200),
+    "obfuscated": ("obfuscated", 200),
+    "huge": ("nested", 5000)
+}
+
+
+def build_reviews(layout: str, review_count: int, start: int = 0) -> str:
+    """Reviews `start` to `start + review_count` in the given layout."""
+    return "".join(LAYOUTS[layout](i) for i in range(start, start + review_count))
+
+
+def build_page(layout: str, review_count: int, start: int = 0, after_reviews: str = "") -> str:
+    """Full product page with `review_count` reviews in the given layout.
+
+    `after_reviews` goes at the end of the review section, e.g. pagination
+    controls or the script of a JS review widget.
+    """
+    reviews = build_reviews(layout, review_count, start) + after_reviews
+    return PAGE_TEMPLATE.format(
+        layout=layout, styles=_styles(), script=_script(), icons=_icons(), nav=_nav(), reviews=reviews
+    )
+
+
+def build_corpus() -> Dict[str, str]:
+    """Every corpus entry rendered to HTML."""
+    return {name: build_page(layout, count) for name, (layout, count) in CORPUS.items()}
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def write_corpus(names=None) -> Dict[str, str]:
+    """Render corpus entries and save them as `<name>.html` in CORPUS_DIR."""
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    pages = {}
+    for name in names or CORPUS:
+        layout, count = CORPUS[name]
+        pages[name] = build_page(layout, count)
+        with open(os.path.join(CORPUS_DIR, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(pages[name])
+    return pages
+
+
+def load_corpus() -> Dict[str, str]:
+    """Every saved page in CORPUS_DIR, writing any missing synthetic entry first."""
+    missing = [name for name in CORPUS if not os.path.exists(os.path.join(CORPUS_DIR, f"{name}.html"))]
+    if missing:
+        write_corpus(missing)
+    pages = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                pages[filename[:-len(".html")]] = f.read()
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the synthetic benchmark pages")
+    parser.add_argument("names", nargs="*", help=f"Entries to write: {', '.join(CORPUS)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(CORPUS)
+    if unknown:
+        parser.error(f"Unknown corpus entries: {', '.join(sorted(unknown))}")
+    for name, html_content in write_corpus(args.names).items():
+        print(f"Wrote {name}.html ({len(html_content) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Load-test `/api/reviews` of each app against the synthetic review site.
+
+Starts the synthetic site with its stub Groq endpoint, then for each app
+starts it under uvicorn in a scratch directory and sends `--requests`
+scrapes from `--concurrency` concurrent clients. Products cycle through the
+review layouts and pagination styles, and every `--js-share` of them
+renders its reviews from a script. Reports per app: requests/sec,
+p50/p95/p99 latency, error rate by cause, reviews per response, and peak
+memory of the app process and of its Chrome processes (read from /proc;
+Linux only).
+
+The response cache is off so every request scrapes, unless
+--response-cache is given. Needs Chrome and chromedriver (set
+CHROMEDRIVER_PATH to skip the download).
+
+Usage:
+    python benchmarks/load_test.py --apps review1 review2 server3 --concurrency 8 --requests 200
+    python benchmarks/load_test.py --delay-ms 100 --llm-delay 0.5 --output load_report.json
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import LAYOUTS  # noqa: E402
+from benchmarks.synthetic_site import PAGINATION_STYLES, SyntheticSite, product_url  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["review1", "review2", "server3"]
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def build_targets(base: str, products: int, reviews: int, per_page: int, js_share: float, delay_ms: int) -> List[str]:
+    """Product URLs covering every layout and pagination style."""
+    layouts = list(LAYOUTS)
+    targets = []
+    for i in range(products):
+        params = {
+            "layout": layouts[i % len(layouts)],
+            # Offset so layouts and pagination styles pair up differently
+            "pagination": PAGINATION_STYLES[(i // len(layouts) + i) % len(PAGINATION_STYLES)],
+            "reviews": reviews,
+            "per_page": per_page
+        }
+        # Spread the JS-rendered products evenly
+        if int((i + 1) * js_share) > int(i * js_share):
+            params["js"] = 1
+        if delay_ms:
+            params["delay"] = delay_ms
+        targets.append(product_url(base, f"p{i}", **params))
+    return targets
+
+
+def _children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _rss(pid: int) -> int:
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def _command(pid: int) -> str:
+    with open(f"/proc/{pid}/comm") as f:
+        return f.read().strip()
+
+
+class MemorySampler:
+    """Samples the RSS of a process and of the Chrome processes below it."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak = {"app_rss_mb": 0.0, "browser_rss_mb": 0.0, "browser_processes": 0}
+        self.supported = os.path.isdir("/proc")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def start(self) -> "MemorySampler":
+        if self.supported:
+            self._thread.start()
+        return self
+
+    def stop(self) -> Optional[Dict]:
+        self._stop.set()
+        if not self.supported:
+            return None
+        self._thread.join()
+        return self.peak
+
+    def sample(self) -> Tuple[int, int, int]:
+        """Bytes of the app, bytes of its browsers and the number of browser processes."""
+        children = _children()
+        app, browsers, processes = _rss(self.pid), 0, 0
+        pending = list(children.get(self.pid, []))
+        while pending:
+            pid = pending.pop()
+            pending.extend(children.get(pid, []))
+            try:
+                # chromedriver is the WebDriver server, not the browser
+                command = _command(pid)
+                if command.startswith("chrom") and command != "chromedriver":
+                    browsers += _rss(pid)
+                    processes += 1
+            except OSError:
+                continue
+        return app, browsers, processes
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                app, browsers, processes = self.sample()
+            except OSError:
+                break
+            self.peak["app_rss_mb"] = max(self.peak["app_rss_mb"], round(app / 2 ** 20, 1))
+            self.peak["browser_rss_mb"] = max(self.peak["browser_rss_mb"], round(browsers / 2 ** 20, 1))
+            self.peak["browser_processes"] = max(self.peak["browser_processes"], processes)
+            self._stop.wait(self.interval)
+
+
+class AppProcess:
+    """One app served by uvicorn in its own scratch directory."""
+
+    def __init__(self, name: str, port: int, env: Dict[str, str], scratch_dir: str):
+        self.name = name
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.log_path = os.path.join(scratch_dir, f"{name}.log")
+        cwd = os.path.join(scratch_dir, name)
+        os.makedirs(cwd, exist_ok=True)
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{name}:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=cwd,
+            env=env,
+            stdout=self._log,
+            stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"{self.name} exited during startup, see {self.log_path}")
+            try:
+                if httpx.get(f"{self.base_url}/metrics", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        raise SystemExit(f"{self.name} not ready after {timeout:.0f}s, see {self.log_path}")
+
+    def stop(self):
+        # SIGTERM runs the shutdown hooks, which close the browsers
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+
+
+async def run_load(base_url: str, targets: List[str], requests: int, concurrency: int, page_limit: int, timeout: float) -> List[Dict]:
+    """Send `requests` scrapes, cycling through `targets`, from `concurrency` clients."""
+    results: List[Dict] = []
+    counter = iter(range(requests))
+
+    async def client(http: httpx.AsyncClient):
+        for i in counter:
+            params = {"page": targets[i % len(targets)], "page_limit": page_limit}
+            start = time.perf_counter()
+            try:
+                response = await http.get(f"{base_url}/api/reviews", params=params)
+                result = {"status": response.status_code}
+                if response.status_code == 200:
+                    result["reviews"] = len(response.json()["reviews"])
+            except httpx.HTTPError as e:
+                result = {"status": None, "error": type(e).__name__}
+            result["latency"] = time.perf_counter() - start
+            results.append(result)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+    return results
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    latencies = sorted(result["latency"] for result in results)
+    errors = Counter(
+        str(result["status"]) if result["status"] else result["error"]
+        for result in results if result["status"] != 200
+    )
+    reviews = [result["reviews"] for result in results if "reviews" in result]
+    # quantiles needs two points; a single request is every percentile
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(cuts[49] * 1000, 1),
+        "p95_ms": round(cuts[94] * 1000, 1),
+        "p99_ms": round(cuts[98] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "error_rate": round(sum(errors.values()) / len(results), 4),
+        "errors": dict(errors),
+        "reviews_per_response": round(statistics.mean(reviews), 1) if reviews else 0.0
+    }
+
+
+def run_app_load(name: str, port: int, env: Dict[str, str], scratch_dir: str, site: SyntheticSite, targets: List[str], args) -> Dict:
+    app = AppProcess(name, port, env, scratch_dir)
+    try:
+        app.wait_ready(args.startup_timeout)
+        if args.warmup:
+            asyncio.run(run_load(app.base_url, targets, args.warmup, args.concurrency, args.page_limit, args.timeout))
+        sampler = MemorySampler(app.process.pid).start()
+        served = site.snapshot()
+        start = time.perf_counter()
+        results = asyncio.run(
+            run_load(app.base_url, targets, args.requests, args.concurrency, args.page_limit, args.timeout)
+        )
+        summary = summarize(results, time.perf_counter() - start)
+        summary["memory"] = sampler.stop()
+        # What the measured requests cost the site, e.g. pages and Groq calls
+        summary["site"] = {stat: count - served[stat] for stat, count in site.snapshot().items()}
+        return summary
+    finally:
+        app.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS)
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per app")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=4, help="Unmeasured requests first, to start the browsers")
+    parser.add_argument("--products", type=int, default=30)
+    parser.add_argument("--reviews", type=int, default=30, help="Reviews per product")
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--page-limit", type=int, default=3)
+    parser.add_argument("--js-share", type=float, default=0.25, help="Share of products rendered by a script")
+    parser.add_argument("--delay-ms", type=int, default=0, help="Site response delay")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Stub Groq response delay in seconds")
+    parser.add_argument("--response-cache", action="store_true", help="Leave the apps' response caches on")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--port", type=int, default=8900, help="First app port; each app gets the next one")
+    parser.add_argument("--output", help="Write the report as JSON here")
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix="load-")
+    site = SyntheticSite(llm_delay=args.llm_delay).start()
+    targets = build_targets(site.base_url, args.products, args.reviews, args.per_page, args.js_share, args.delay_ms)
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+        "LLM_BACKEND": "groq",
+        "GROQ_BASE_URL": site.base_url,
+        "RESPONSE_CACHE": "1" if args.response_cache else "0"
+    }
+
+    report = {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "apps": {}
+    }
+    print(f"{'app':<9} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'reviews':>8} {'app MB':>7} {'chrome MB':>10}")
+    try:
+        for offset, name in enumerate(args.apps):
+            summary = run_app_load(name, args.port + offset, env, scratch_dir, site, targets, args)
+            report["apps"][name] = summary
+            memory = summary["memory"] or {}
+            print(
+                f"{name:<9} {summary['rps']:7.2f} {summary['p50_ms']:9.1f} {summary['p95_ms']:9.1f} "
+                f"{summary['p99_ms']:9.1f} {summary['error_rate']:7.1%} {summary['reviews_per_response']:8.1f} "
+                f"{memory.get('app_rss_mb', float('nan')):7.1f} {memory.get('browser_rss_mb', float('nan')):10.1f}"
+            )
+            if summary["errors"]:
+                print(f"{'':<9} errors: {summary['errors']}")
+    finally:
+        site.stop()
+
+    print(f"App logs in {scratch_dir}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Benchmark the extraction hot path of all three services on the saved corpus.
+
+Runs review1 (selectors + `extract_review_data`), review2 (`extract_reviews`)
+and server3 (text heuristic + Groq selectors) on every corpus page with the
+LLM stubbed, timing each stage and measuring its allocations and peak
+memory. Results go to a JSON report; `compare` flags regressions between
+two reports.
+
+Usage:
+    python benchmarks/run_benchmarks.py run --output bench_report.json
+    python benchmarks/run_benchmarks.py compare base.json bench_report.json --threshold 0.15
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The services read these at import time: stub Groq and keep the selector
+# cache and review2's log file out of the working tree
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("SELECTOR_CACHE_PATH", os.path.join(SCRATCH_DIR, "selector_cache.db"))
+
+_cwd = os.getcwd()
+os.chdir(SCRATCH_DIR)
+try:
+    import review1  # noqa: E402
+    import review2  # noqa: E402
+    import server3  # noqa: E402
+finally:
+    os.chdir(_cwd)
+from benchmarks.fixtures import load_corpus  # noqa: E402
+from html_parser import parse_html, resolve_backend  # noqa: E402
+from llm_gateway import LLMGateway, StubBackend  # noqa: E402
+from llm_selectors import extract_review_data  # noqa: E402
+from selector_matcher import SelectorMatcher  # noqa: E402
+
+# What the stubbed Groq answers for server3; review1's stub answers with its
+# DEFAULT_SELECTORS lists
+SERVER3_STUB_SELECTORS = {
+    "review": "[class*=review], [class*=Review]",
+    "title": "h1",
+    "body": "p, [class*=ReviewText]",
+    "rating": "[class*=rating], [class*=Rating]",
+    "reviewer": "[class*=author], [class*=Author]",
+    "images": "img"
+}
+
+PAGE_URL = "https://shop.example/products/{name}"
+
+# Stage timings below this are too noisy to call regressions
+NOISE_FLOOR_MS = 0.5
+
+Stage = Tuple[str, Callable[[Dict], object]]
+
+
+def review1_stages(url: str, html_content: str) -> List[Stage]:
+    def parse(state):
+        state["soup"] = parse_html(html_content)
+
+    def selectors(state):
+        state["selectors"], state["item_selector"] = review1.selector_extractor.get_page_selectors(url, html_content, state["soup"])
+
+    def llm_selectors(state):
+        # The uncached path: condense the page and ask the (stubbed) LLM
+        return review1.selector_extractor.get_llm_selectors(html_content)
+
+    def match(state):
+        if not state["item_selector"]:
+            return []
+        matcher = SelectorMatcher({field: state["selectors"][field] for field in ("body", "rating", "reviewer")})
+        reviews = [extract_review_data(element, matcher) for element in state["soup"].select(state["item_selector"])]
+        return [review for review in reviews if review]
+
+    return [("parse", parse), ("selectors", selectors), ("llm_selectors", llm_selectors), ("match", match)]
+
+
+def review2_stages(url: str, html_content: str) -> List[Stage]:
+    def parse(state):
+        state["soup"] = parse_html(html_content)
+
+    def extract(state):
+        return review2.extract_reviews(state["soup"])
+
+    return [("parse", parse), ("extract", extract)]
+
+
+def server3_stages(url: str, html_content: str) -> List[Stage]:
+    def parse(state):
+        state["soup"] = parse_html(html_content)
+
+    def heuristic(state):
+        return server3.heuristic_reviews(state["soup"])
+
+    def selectors(state):
+        return server3.selector_reviews(url, html_content, state["soup"])
+
+    return [("parse", parse), ("heuristic", heuristic), ("selectors", selectors)]
+
+
+TARGETS = {
+    "review1": review1_stages,
+    "review2": review2_stages,
+    "server3": server3_stages
+}
+
+
+def stub_llm():
+    """Instant canned Groq answers, with no token budget to throttle repeated runs."""
+    review1.selector_extractor.llm_gateway = LLMGateway(StubBackend(json.dumps(review1.DEFAULT_SELECTORS)), tokens_per_minute=10 ** 9)
+    server3.llm_gateway = LLMGateway(StubBackend(json.dumps(SERVER3_STUB_SELECTORS)), tokens_per_minute=10 ** 9)
+
+
+def measure(stages: List[Stage], repeat: int) -> List[Dict]:
+    """Time every stage over `repeat` runs, then measure memory in one traced run."""
+    timings: Dict[str, List[float]] = {name: [] for name, _ in stages}
+    outputs: Dict[str, int] = {}
+    for _ in range(repeat):
+        state: Dict = {}
+        for name, stage in stages:
+            start = time.perf_counter()
+            result = stage(state)
+            timings[name].append((time.perf_counter() - start) * 1000)
+            if isinstance(result, list):
+                outputs[name] = len(result)
+
+    # Traced separately because tracemalloc slows everything down
+    memory: Dict[str, Tuple[int, int, int]] = {}
+    state = {}
+    tracemalloc.start()
+    try:
+        for name, stage in stages:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            blocks_before = sys.getallocatedblocks()
+            stage(state)
+            after, peak = tracemalloc.get_traced_memory()
+            memory[name] = (peak - before, after - before, sys.getallocatedblocks() - blocks_before)
+    finally:
+        tracemalloc.stop()
+
+    return [
+        {
+            "stage": name,
+            "median_ms": round(statistics.median(timings[name]), 3),
+            "min_ms": round(min(timings[name]), 3),
+            "peak_kb": round(memory[name][0] / 1024, 1),
+            "retained_kb": round(memory[name][1] / 1024, 1),
+            "allocated_blocks": memory[name][2],
+            "reviews": outputs.get(name)
+        }
+        for name, _ in stages
+    ]
+
+
+def run(args) -> int:
+    logging.disable(logging.WARNING)
+    stub_llm()
+    corpus = load_corpus()
+    pages = args.pages or list(corpus)
+    results = []
+    for target in args.targets:
+        for name in pages:
+            html_content = corpus[name]
+            for row in measure(TARGETS[target](PAGE_URL.format(name=name), html_content), args.repeat):
+                row.update(target=target, page=name)
+                results.append(row)
+                print(
+                    f"{target:<8} {name:<11} {row['stage']:<14} {row['median_ms']:>9.2f} ms  "
+                    f"peak {row['peak_kb']:>9.1f} KB  reviews {row['reviews'] if row['reviews'] is not None else '-'}"
+                )
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser": resolve_backend(None),
+            "repeat": args.repeat,
+            "page_bytes": {name: len(corpus[name]) for name in pages}
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    def key(row: Dict) -> Tuple[str, str, str]:
+        return row["target"], row["page"], row["stage"]
+
+    base_rows = {key(row): row for row in base["results"]}
+    regressions = 0
+    for row in new["results"]:
+        old = base_rows.get(key(row))
+        if old is None:
+            continue
+        flags = []
+        if row["median_ms"] - old["median_ms"] > NOISE_FLOOR_MS and row["median_ms"] > old["median_ms"] * (1 + args.threshold):
+            flags.append(f"time {old['median_ms']:.2f} -> {row['median_ms']:.2f} ms")
+        if row["peak_kb"] > old["peak_kb"] * (1 + args.threshold) and row["peak_kb"] - old["peak_kb"] > 64:
+            flags.append(f"peak {old['peak_kb']:.0f} -> {row['peak_kb']:.0f} KB")
+        if row.get("reviews") != old.get("reviews"):
+            flags.append(f"reviews {old.get('reviews')} -> {row.get('reviews')}")
+        if flags:
+            regressions += 1
+            print(f"REGRESSION {'/'.join(key(row))}: {'; '.join(flags)}")
+        else:
+            ratio = row["median_ms"] / old["median_ms"] if old["median_ms"] else 1.0
+            print(f"ok         {'/'.join(key(row))}: {ratio:5.2f}x time")
+    print(f"{regressions} regression(s) at threshold {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Benchmark the corpus and write a JSON report")
+    run_parser.add_argument("--output", default="bench_report.json")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--pages", nargs="+", help="Corpus entries to run (default: all)")
+    run_parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
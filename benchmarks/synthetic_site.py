@@ -0,0 +1,313 @@
+"""Local product site and stub Groq endpoint for load tests.
+
+Serves synthetic product pages built from the benchmark fixtures' review
+layouts, so review1's `DEFAULT_SELECTORS`, review2's `REVIEW_SELECTORS` and
+the stub Groq selectors find reviews on every page. Query parameters shape
+each page:
+
+  layout       simple, nested or obfuscated (default simple)
+  reviews      total reviews of the product (default 30)
+  per_page     reviews per page or per loaded chunk (default 10)
+  pagination   none, query (?page=N and a .pagination .next link), path
+               (/page/N and a rel=next link), load_more (a "Load more
+               reviews" button) or scroll (infinite scroll) (default query)
+  js           1 to render the page's reviews from a script after
+               `js_delay` ms, like a third-party review widget (default 0)
+  delay        ms to wait before answering, for pages and review chunks
+
+POST /openai/v1/chat/completions answers like Groq with selectors for these
+layouts, after `--llm-delay` seconds. Point the apps at it with
+GROQ_BASE_URL=http://127.0.0.1:<port> and LLM_BACKEND=groq. GET /stats
+counts what was served.
+
+Usage:
+    python benchmarks/synthetic_site.py --port 8800 --llm-delay 0.5
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import LAYOUTS, build_page, build_reviews  # noqa: E402
+
+PAGINATION_STYLES = ["none", "query", "path", "load_more", "scroll"]
+PAGE_DEFAULTS = {
+    "layout": "simple",
+    "reviews": "30",
+    "per_page": "10",
+    "pagination": "query",
+    "js": "0",
+    "js_delay": "200",
+    "delay": "0"
+}
+
+PRODUCT_PATH = re.compile(r"^/products/([\w-]+)(?:/page/(\d+))?$")
+REVIEWS_PATH = re.compile(r"^/products/([\w-]+)/reviews$")
+CHAT_COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+# Stub Groq answers, matching all of LAYOUTS. review1 asks for one selector
+# per field; server3 for the keys in its REQUIRED_SELECTOR_KEYS
+REVIEW1_SELECTORS = {
+    "review_item": ".review, [class*=ReviewCard__Root]",
+    "body": ".review-text, .review-body p, [class*=ReviewTextBody]",
+    "rating": ".rating, .stars, [class*=RatingStars]",
+    "reviewer": ".reviewer-name, .author, [class*=AuthorName]"
+}
+SERVER3_SELECTORS = {
+    "review": ".review, [class*=ReviewCard__Root]",
+    "title": "h1",
+    "body": ".review-text, .review-body p, [class*=ReviewTextBody]",
+    "rating": ".rating, .stars, [class*=RatingStars]",
+    "reviewer": ".reviewer-name, .author, [class*=AuthorName]",
+    "images": "img"
+}
+
+# Loads review chunks into the page: after `js_delay` ms for a JS widget,
+# on click for load_more, near the bottom of the page for scroll
+WIDGET_SCRIPT = """
+<script>
+(() => {
+  const total = %(total)d, perPage = %(per_page)d, mode = "%(mode)s";
+  let next = %(next)d, loading = false;
+  const end = document.getElementById("reviews-end");
+  const load = (start, count) => {
+    loading = true;
+    return fetch(`%(chunk_url)s&start=${start}&count=${count}`)
+      .then(response => response.text())
+      .then(html => {
+        end.insertAdjacentHTML("beforebegin", html);
+        next = Math.max(next, start + count);
+        loading = false;
+        if (mode === "load_more" && next >= total) end.remove();
+      });
+  };
+  if (%(deferred_count)d) setTimeout(() => load(%(deferred_start)d, %(deferred_count)d), %(js_delay)d);
+  if (mode === "load_more") {
+    end.addEventListener("click", () => { if (!loading && next < total) load(next, perPage); });
+  } else if (mode === "scroll") {
+    window.addEventListener("scroll", () => {
+      if (!loading && next < total && innerHeight + scrollY >= document.body.scrollHeight - 100) load(next, perPage);
+    });
+  }
+})();
+</script>
+"""
+# Keeps infinite-scroll pages taller than the browser window
+SCROLL_STYLE = "<style>#reviews-container > div { min-height: 160px; }</style>"
+
+
+class PageSpec:
+    """One product page request, parsed from its URL."""
+
+    def __init__(self, product: str, page: int, params: Dict[str, str]):
+        options = {**PAGE_DEFAULTS, **params}
+        self.product = product
+        self.page = page
+        self.layout = options["layout"] if options["layout"] in LAYOUTS else "simple"
+        self.total = max(0, int(options["reviews"]))
+        self.per_page = max(1, int(options["per_page"]))
+        self.pagination = options["pagination"] if options["pagination"] in PAGINATION_STYLES else "query"
+        self.js = options["js"] == "1"
+        self.js_delay = int(options["js_delay"])
+        self.delay = float(options["delay"]) / 1000
+        # Everything but the page number, carried over to further pages and chunks
+        self.query = {name: value for name, value in params.items() if name != "page"}
+
+    @property
+    def start(self) -> int:
+        return (self.page - 1) * self.per_page if self.pagination in ("query", "path") else 0
+
+    @property
+    def count(self) -> int:
+        if self.pagination == "none":
+            return self.total
+        return max(0, min(self.per_page, self.total - self.start))
+
+    def render(self) -> str:
+        end = ""
+        more = self.start + self.count < self.total
+        if self.pagination == "query" and more:
+            href = f"/products/{self.product}?{urlencode({**self.query, 'page': self.page + 1})}"
+            end = f'<div class="pagination"><a class="next" href="{href}">Next</a></div>'
+        elif self.pagination == "path" and more:
+            href = f"/products/{self.product}/page/{self.page + 1}?{urlencode(self.query)}"
+            end = f'<link rel="next" href="{href}"><a rel="next" href="{href}">Next</a>'
+
+        widget = self.js or self.pagination in ("load_more", "scroll")
+        if widget:
+            if self.pagination == "load_more" and (more or self.js):
+                end += '<button id="reviews-end" class="load-more" type="button">Load more reviews</button>'
+            else:
+                end += '<div id="reviews-end"></div>'
+            if self.pagination == "scroll":
+                end += SCROLL_STYLE
+            end += WIDGET_SCRIPT % {
+                "total": self.total,
+                "per_page": self.per_page,
+                "mode": self.pagination,
+                "next": self.start + (0 if self.js else self.count),
+                "chunk_url": f"/products/{self.product}/reviews?{urlencode({'layout': self.layout, 'delay': self.delay * 1000})}",
+                "deferred_start": self.start,
+                "deferred_count": self.count if self.js else 0,
+                "js_delay": self.js_delay
+            }
+        return build_page(self.layout, 0 if self.js else self.count, self.start, end)
+
+
+def product_url(base: str, product: str, **params) -> str:
+    """URL of a synthetic product page, e.g. `product_url(base, "p1", pagination="scroll")`."""
+    return f"{base}/products/{product}?{urlencode(params)}" if params else f"{base}/products/{product}"
+
+
+class SyntheticSite:
+    """The site and stub Groq endpoint, served from a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, llm_delay: float = 0.0):
+        self.llm_delay = llm_delay
+        self.stats = {"pages": 0, "review_chunks": 0, "llm_calls": 0, "not_found": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "SyntheticSite":
+        self._thread = threading.Thread(target=self.serve_forever, name="synthetic-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def chat_completion(self, request: Dict) -> Dict:
+        """A Groq-style chat completion carrying the selectors the caller asks for."""
+        self.count("llm_calls")
+        if self.llm_delay:
+            time.sleep(self.llm_delay)
+        prompt = " ".join(message.get("content", "") for message in request.get("messages", []))
+        selectors = REVIEW1_SELECTORS if "review_item" in prompt else SERVER3_SELECTORS
+        content = json.dumps(selectors)
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        return {
+            "id": f"chatcmpl-stub-{self.stats['llm_calls']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+                "logprobs": None
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+
+def _handler(site: SyntheticSite):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            params = dict(parse_qsl(parsed.query))
+            product = PRODUCT_PATH.match(parsed.path)
+            chunk = REVIEWS_PATH.match(parsed.path)
+            if parsed.path == "/stats":
+                self._send(200, json.dumps(site.snapshot()), "application/json")
+            elif product:
+                page = int(product.group(2) or params.get("page", "1"))
+                spec = PageSpec(product.group(1), page, params)
+                if page < 1 or (page > 1 and spec.count == 0):
+                    self._not_found()
+                    return
+                self._delay(spec.delay)
+                site.count("pages")
+                self._send(200, spec.render())
+            elif chunk:
+                self._delay(float(params.get("delay", "0")) / 1000)
+                site.count("review_chunks")
+                layout = params.get("layout", "simple")
+                html = build_reviews(layout if layout in LAYOUTS else "simple", int(params["count"]), int(params["start"]))
+                self._send(200, html)
+            else:
+                self._not_found()
+
+        def do_POST(self):
+            if urlparse(self.path).path != CHAT_COMPLETIONS_PATH:
+                self._not_found()
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+            self._send(200, json.dumps(site.chat_completion(json.loads(body or b"{}"))), "application/json")
+
+        def _delay(self, seconds: float):
+            if seconds > 0:
+                time.sleep(seconds)
+
+        def _not_found(self):
+            site.count("not_found")
+            self._send(404, "Not found", "text/plain")
+
+        def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8"):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # A browser navigating away or a scrape giving up mid-response
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Seconds the stub Groq endpoint takes to answer")
+    args = parser.parse_args()
+
+    site = SyntheticSite(args.host, args.port, args.llm_delay)
+    print(f"Serving on {site.base_url}, e.g.")
+    for style in PAGINATION_STYLES:
+        print(f"  {product_url(site.base_url, 'demo', layout='nested', pagination=style)}")
+    print(f"Stub Groq: GROQ_BASE_URL={site.base_url} LLM_BACKEND=groq")
+    try:
+        site.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+
+from tracing import span, traced
+
+logger = logging.getLogger()
+
+# Pool configuration
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_POOL_WARM = int(os.getenv("BROWSER_POOL_WARM", "1"))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "50"))
+BROWSER_MEMORY_WATERMARK_MB = float(os.getenv("BROWSER_MEMORY_WATERMARK_MB", "512"))
+BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT", "60"))
+BROWSER_NETWORK_LOG = os.getenv("BROWSER_NETWORK_LOG", "1") == "1"
+
+DEFAULT_CHROME_ARGUMENTS = [
+    "--headless",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage"
+]
+
+_driver_path: Optional[str] = None
+_driver_path_lock = threading.Lock()
+
+
+def get_driver_path() -> str:
+    """Resolve the chromedriver binary once and reuse it for every browser."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.getenv("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+            logger.info(f"Resolved chromedriver binary: {_driver_path}")
+    return _driver_path
+
+
+def build_chrome_options(arguments: Optional[List[str]] = None) -> Options:
+    """Build Chrome options from a list of command line arguments."""
+    chrome_options = Options()
+    for argument in arguments or DEFAULT_CHROME_ARGUMENTS:
+        chrome_options.add_argument(argument)
+    if BROWSER_NETWORK_LOG:
+        # Network events for review JSON capture and resource metrics
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return chrome_options
+
+
+def create_chrome_driver(arguments: Optional[List[str]] = None) -> webdriver.Chrome:
+    """Start a new headless Chrome using the cached driver binary."""
+    return webdriver.Chrome(service=Service(get_driver_path()), options=build_chrome_options(arguments))
+
+
+def read_network_log(driver) -> List[Dict]:
+    """DevTools network events recorded since the last read, oldest first."""
+    if not BROWSER_NETWORK_LOG:
+        return []
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logger.debug(f"Performance log unavailable: {e}")
+        return []
+    return [json.loads(entry["message"])["message"] for entry in entries]
+
+
+class PooledBrowser:
+    """A live WebDriver plus the bookkeeping used to decide when to recycle it."""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class BrowserPool:
+    """Fixed-size pool of warm Chrome instances shared by all requests of an app."""
+
+    def __init__(
+        self,
+        factory: Optional[Callable[[], webdriver.Chrome]] = None,
+        size: int = BROWSER_POOL_SIZE,
+        max_uses: int = BROWSER_MAX_USES,
+        memory_watermark_mb: float = BROWSER_MEMORY_WATERMARK_MB
+    ):
+        self.factory = factory or create_chrome_driver
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.memory_watermark_mb = memory_watermark_mb
+        self._idle: "queue.LifoQueue[PooledBrowser]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+        self.stats: Dict[str, int] = {
+            "created": 0,
+            "reused": 0,
+            "recycled": 0,
+            "health_failures": 0
+        }
+
+    def start(self, warm: int = BROWSER_POOL_WARM):
+        """Resolve the driver binary and pre-launch `warm` browsers."""
+        get_driver_path()
+        for _ in range(min(warm, self.size)):
+            try:
+                self._idle.put(self._create())
+            except Exception as e:
+                logger.error(f"Failed to pre-warm browser: {e}")
+                break
+        logger.info(f"Browser pool started (size={self.size}, warm={self._idle.qsize()})")
+
+    def close(self):
+        """Quit every idle browser; browsers still in use are quit on release."""
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(browser)
+        logger.info("Browser pool closed")
+
+    @contextmanager
+    def session(self, timeout: float = BROWSER_ACQUIRE_TIMEOUT):
+        """Borrow a clean browser for the duration of a `with` block."""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        with span("browser_acquire"):
+            if not self._slots.acquire(timeout=timeout):
+                raise TimeoutError(f"No browser available after {timeout}s")
+
+        browser = None
+        try:
+            browser = self._checkout()
+            browser.uses += 1
+            yield browser.driver
+        finally:
+            if browser:
+                self._checkin(browser)
+            self._slots.release()
+
+    @traced("browser_start")
+    def _create(self) -> PooledBrowser:
+        browser = PooledBrowser(self.factory())
+        self.stats["created"] += 1
+        logger.debug(f"Launched pooled browser #{self.stats['created']}")
+        return browser
+
+    def _checkout(self) -> PooledBrowser:
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create()
+            if self._is_healthy(browser):
+                self.stats["reused"] += 1
+                return browser
+            self.stats["health_failures"] += 1
+            logger.warning("Discarding unhealthy pooled browser")
+            self._quit(browser)
+
+    def _checkin(self, browser: PooledBrowser):
+        if self._closed:
+            self._quit(browser)
+            return
+
+        if browser.uses >= self.max_uses:
+            logger.debug(f"Recycling browser after {browser.uses} uses")
+            self._recycle(browser)
+            return
+
+        memory_mb = self._memory_mb(browser)
+        if memory_mb is not None and memory_mb >= self.memory_watermark_mb:
+            logger.debug(f"Recycling browser at {memory_mb:.0f}MB JS heap")
+            self._recycle(browser)
+            return
+
+        try:
+            self._reset(browser.driver)
+        except Exception as e:
+            logger.warning(f"Browser reset failed, recycling: {e}")
+            self._recycle(browser)
+            return
+
+        self._idle.put(browser)
+
+    def _recycle(self, browser: PooledBrowser):
+        self.stats["recycled"] += 1
+        self._quit(browser)
+
+    @staticmethod
+    def _reset(driver: webdriver.Chrome):
+        """Close extra tabs and clear cookies and storage so jobs don't leak state."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            # about:blank and some sandboxed origins don't expose storage
+            pass
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get("about:blank")
+        if BROWSER_NETWORK_LOG:
+            # Drain the network log so the next job only sees its own requests
+            driver.get_log("performance")
+
+    @staticmethod
+    def _is_healthy(browser: PooledBrowser) -> bool:
+        try:
+            return browser.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def _memory_mb(browser: PooledBrowser) -> Optional[float]:
+        try:
+            used = browser.driver.execute_script(
+                "return window.performance.memory ? window.performance.memory.usedJSHeapSize : null"
+            )
+            return used / (1024 * 1024) if used else None
+        except Exception:
+            return None
+
+    @staticmethod
+    def _quit(browser: PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting browser: {e}")
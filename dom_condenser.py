@@ -0,0 +1,180 @@
+import os
+import re
+import logging
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+from html_parser import parse_html
+from tracing import traced
+
+logger = logging.getLogger()
+
+# Condenser configuration
+LLM_PROMPT_TOKENS = int(os.getenv("LLM_PROMPT_TOKENS", "1000"))
+CONDENSE_MIN_REPEATS = int(os.getenv("CONDENSE_MIN_REPEATS", "3"))
+CONDENSE_TEXT_CHARS = int(os.getenv("CONDENSE_TEXT_CHARS", "120"))
+
+# Rough average for HTML; good enough to keep prompts inside a budget
+CHARS_PER_TOKEN = 4
+
+# Tags that carry no structure the LLM could write a selector against
+DROP_TAGS = {"script", "style", "noscript", "svg", "iframe", "template", "link", "meta", "head", "canvas", "object"}
+
+# Attributes kept on every element; everything else (href, src, style,
+# event handlers, tracking ids) is noise for selector discovery
+KEEP_ATTRIBUTES = {"class", "id", "itemprop", "itemtype", "itemscope", "role", "aria-label"}
+KEEP_DATA_ATTRIBUTE = re.compile(r"^data-.*(review|rating|star|author|score)", re.I)
+
+# Names that suggest review content, matched against class/id/itemprop/data attributes
+REVIEW_SIGNAL = re.compile(r"review|rating|stars?\b|author|reviewer|comment|testimonial|feedback", re.I)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _strip_noise(root: Tag):
+    """Drop noise tags, comments and attributes and shorten text in one walk."""
+    root.attrs = {}
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        for child in list(element.children):
+            if isinstance(child, Comment):
+                child.extract()
+            elif isinstance(child, NavigableString):
+                stripped = " ".join(child.split())
+                if not stripped:
+                    child.extract()
+                elif len(stripped) > CONDENSE_TEXT_CHARS:
+                    child.replace_with(stripped[:CONDENSE_TEXT_CHARS] + "...")
+                elif stripped != child:
+                    child.replace_with(stripped)
+            elif child.name in DROP_TAGS:
+                child.decompose()
+            else:
+                child.attrs = {
+                    name: value for name, value in child.attrs.items()
+                    if name in KEEP_ATTRIBUTES or KEEP_DATA_ATTRIBUTE.match(name)
+                }
+                stack.append(child)
+
+
+def _signal(element: Tag) -> bool:
+    for name, value in element.attrs.items():
+        if isinstance(value, list):
+            value = " ".join(value)
+        # Review-ish data attributes are the only data-* ones left after stripping
+        if name.startswith("data-") or REVIEW_SIGNAL.search(str(value)):
+            return True
+    return False
+
+
+def _bottom_up(root: Tag) -> List[Tag]:
+    """`root` and every element under it, children before their parents.
+
+    Walked with an explicit stack: real pages nest deeper than Python's recursion limit.
+    """
+    order: List[Tag] = []
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        order.append(element)
+        stack.extend(child for child in element.children if isinstance(child, Tag))
+    order.reverse()
+    return order
+
+
+def _review_scores(root: Tag) -> Dict[int, int]:
+    """Review-signal elements per subtree, counted before repeats are collapsed
+
+    so a region with many reviews outranks one with a single review-like node.
+    """
+    scores: Dict[int, int] = {}
+    for element in _bottom_up(root):
+        score = 1 if _signal(element) else 0
+        score += sum(scores[id(child)] for child in element.children if isinstance(child, Tag))
+        scores[id(element)] = score
+    return scores
+
+
+def _sibling_signature(element: Tag) -> str:
+    """Tag name plus child tag names; ignores classes, which are often hashed per item."""
+    children = ",".join(child.name for child in element.children if isinstance(child, Tag))
+    return f"{element.name}>{children}"
+
+
+def _collapse_repeats(root: Tag, soup: BeautifulSoup):
+    """Keep one exemplar of each run of same-signature siblings."""
+    for element in [root] + root.find_all(True):
+        if element.decomposed:
+            continue
+        run: List[Tag] = []
+        for child in list(element.children) + [None]:
+            if isinstance(child, NavigableString):
+                continue
+            if child is not None and run and _sibling_signature(child) == _sibling_signature(run[0]):
+                run.append(child)
+                continue
+            if len(run) >= CONDENSE_MIN_REPEATS:
+                for duplicate in run[1:]:
+                    duplicate.decompose()
+                run[0].insert_after(soup.new_string(f" {len(run) - 1} more like this ", Comment))
+            run = [child] if child is not None else []
+
+
+def _serialized_lengths(root: Tag) -> Dict[int, int]:
+    """Approximate serialized length of every subtree, computed bottom-up."""
+    lengths: Dict[int, int] = {}
+    for element in _bottom_up(root):
+        # Opening and closing tags plus attributes
+        length = 2 * len(element.name) + 5
+        length += sum(len(name) + len(str(value)) + 4 for name, value in element.attrs.items())
+        for child in element.children:
+            length += lengths[id(child)] if isinstance(child, Tag) else len(child)
+        lengths[id(element)] = length
+    return lengths
+
+
+def _densest_region(root: Tag, scores: Dict[int, int], lengths: Dict[int, int], budget_chars: int) -> Tag:
+    """The subtree holding the most review signals that still fits the budget.
+
+    Ties go to the larger subtree so the LLM sees some surrounding structure.
+    """
+    best: Optional[Tag] = None
+    for element in [root] + root.find_all(True):
+        length = lengths.get(id(element), 0)
+        if length > budget_chars:
+            continue
+        key = (scores.get(id(element), 0), length)
+        if best is None or key > (scores.get(id(best), 0), lengths[id(best)]):
+            best = element
+    # Only when a single element is over budget; the caller truncates it
+    return best if best is not None else root
+
+
+@traced("condense")
+def condense_html(html_content: str, token_budget: int = LLM_PROMPT_TOKENS, parser: Optional[str] = None) -> str:
+    """Shrink a page to the review-dense markup an LLM needs to infer selectors.
+
+    Drops scripts, styles, SVG and non-structural attributes, collapses
+    repeated siblings to one exemplar and returns the subtree with the most
+    review signals that fits in `token_budget` tokens.
+    """
+    soup = parse_html(html_content, parser)
+    root = soup.body or soup
+    _strip_noise(root)
+    scores = _review_scores(root)
+    _collapse_repeats(root, soup)
+
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    lengths = _serialized_lengths(root)
+    region = _densest_region(root, scores, lengths, budget_chars)
+    condensed = str(region)[:budget_chars]
+
+    logger.info(
+        f"Condensed HTML from {estimate_tokens(html_content)} to {estimate_tokens(condensed)} tokens "
+        f"(<{region.name}> with {scores.get(id(region), 0)} review signals)"
+    )
+    return condensed
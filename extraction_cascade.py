@@ -0,0 +1,280 @@
+import os
+import re
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Union
+
+from bs4 import BeautifulSoup
+
+from selector_cache import page_domain, page_fingerprint
+from static_fetcher import TierMemory
+from tracing import span
+
+logger = logging.getLogger()
+
+# Cascade configuration
+CASCADE_MIN_REVIEWS = int(os.getenv("CASCADE_MIN_REVIEWS", "1"))
+CASCADE_MIN_BODY_CHARS = int(os.getenv("CASCADE_MIN_BODY_CHARS", "20"))
+CASCADE_MIN_GOOD_RATIO = float(os.getenv("CASCADE_MIN_GOOD_RATIO", "0.6"))
+CASCADE_RACE = os.getenv("CASCADE_RACE", "1") == "1"
+CASCADE_RACE_WORKERS = int(os.getenv("CASCADE_RACE_WORKERS", "4"))
+
+
+class Page:
+    """One fetched page, parsed once and shared by every strategy."""
+
+    def __init__(self, url: str, html_content: str, soup: BeautifulSoup):
+        self.url = url
+        self.html_content = html_content
+        self.soup = soup
+        self.domain = page_domain(url)
+        self._fingerprint: Optional[str] = None
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            self._fingerprint = page_fingerprint(self.soup)
+        return self._fingerprint
+
+
+class ExtractionStrategy:
+    """A named way of finding reviews on a parsed page.
+
+    `extract` returns reviews as models or dicts. `cheap` is a flag or a
+    per-page check; cheap strategies run inline one after another, the rest
+    only when the cheap ones fall short (or raced alongside them on domains
+    where they won before). Expensive strategies should be the ones that
+    mostly wait on I/O, since raced threads share the GIL. Strategies must
+    not modify the shared soup.
+    """
+
+    def __init__(self, name: str, extract: Callable[[Page], List], cheap: Union[bool, Callable[[Page], bool]] = True):
+        self.name = name
+        self.extract = extract
+        self.cheap = cheap
+
+    def is_cheap(self, page: Page) -> bool:
+        return self.cheap(page) if callable(self.cheap) else self.cheap
+
+
+def _rating(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"\d+(?:\.\d+)?", str(value or ""))
+    return float(match.group(0)) if match else None
+
+
+def normalize_review(review) -> Dict:
+    """Plain review dict (title, body, rating, reviewer, images) from any strategy's output."""
+    data = review if isinstance(review, dict) else review.dict()
+    return {
+        "title": data.get("title"),
+        "body": (data.get("body") or "").strip(),
+        "rating": _rating(data.get("rating")),
+        "reviewer": data.get("reviewer"),
+        "images": data.get("images") or []
+    }
+
+
+def review_quality(reviews: List[Dict]) -> List[Dict]:
+    """The reviews that look real: a long enough body, duplicates dropped."""
+    seen = set()
+    good = []
+    for review in reviews:
+        body = review["body"]
+        if len(body) >= CASCADE_MIN_BODY_CHARS and body not in seen:
+            seen.add(body)
+            good.append(review)
+    return good
+
+
+class Attempt:
+    """What one strategy produced on one page and whether it passed the quality check."""
+
+    def __init__(self, strategy: str, reviews: List[Dict], seconds: float, error: Optional[str] = None):
+        self.strategy = strategy
+        self.seconds = seconds
+        self.error = error
+        self.raw_count = len(reviews)
+        self.reviews = review_quality(reviews)
+        self.passed = (
+            len(self.reviews) >= CASCADE_MIN_REVIEWS
+            and len(self.reviews) >= CASCADE_MIN_GOOD_RATIO * self.raw_count
+        )
+
+    @property
+    def score(self) -> float:
+        """Good reviews, with a bonus for the ratings and reviewer names they carry."""
+        return sum(
+            1 + 0.25 * (review["rating"] is not None) + 0.25 * bool(review["reviewer"])
+            for review in self.reviews
+        )
+
+    def summary(self) -> Dict:
+        return {
+            "strategy": self.strategy,
+            "reviews": len(self.reviews),
+            "raw_reviews": self.raw_count,
+            "passed": self.passed,
+            "seconds": round(self.seconds, 4),
+            "error": self.error
+        }
+
+
+class CascadeResult:
+    """The winning attempt for a page, plus every attempt made along the way."""
+
+    def __init__(self, winner: Optional[Attempt], attempts: List[Attempt]):
+        self.winner = winner
+        self.attempts = attempts
+
+    @property
+    def strategy(self) -> Optional[str]:
+        return self.winner.strategy if self.winner else None
+
+    @property
+    def reviews(self) -> List[Dict]:
+        return self.winner.reviews if self.winner else []
+
+
+class StrategyMemory(TierMemory):
+    """Remembers per domain which strategy last won the cascade."""
+
+
+class CascadeStats:
+    """Per-strategy runs, wins and time, for the stats endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.raced = 0
+        self.abandoned = 0
+        self.strategies: Dict[str, Dict[str, float]] = {}
+
+    def record(self, result: CascadeResult, raced: bool, abandoned: int):
+        with self._lock:
+            self.pages += 1
+            self.raced += raced
+            self.abandoned += abandoned
+            for attempt in result.attempts:
+                stats = self.strategies.setdefault(
+                    attempt.strategy, {"runs": 0, "passed": 0, "wins": 0, "errors": 0, "seconds": 0.0}
+                )
+                stats["runs"] += 1
+                stats["passed"] += attempt.passed
+                stats["wins"] += attempt is result.winner
+                stats["errors"] += attempt.error is not None
+                stats["seconds"] += attempt.seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "raced": self.raced,
+                "abandoned": self.abandoned,
+                "strategies": {
+                    name: {**stats, "average_seconds": stats["seconds"] / stats["runs"] if stats["runs"] else 0.0}
+                    for name, stats in self.strategies.items()
+                }
+            }
+
+
+class ExtractionCascade:
+    """Runs strategies cheapest first on one parsed page and stops at the first good result.
+
+    Cheap strategies run inline in order. Expensive ones (the LLM) run only
+    when every cheap one fails the quality check, all at once on the race
+    pool, and the first to pass wins. On domains where an expensive strategy
+    won last time they start alongside the cheap ones instead, so their
+    network wait overlaps the cheap work. If nothing passes, the
+    best-scoring attempt is returned.
+    """
+
+    def __init__(self, strategies: List[ExtractionStrategy], race: bool = CASCADE_RACE, race_workers: int = CASCADE_RACE_WORKERS):
+        self.strategies = strategies
+        self.race = race
+        self.memory = StrategyMemory()
+        self.stats = CascadeStats()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, race_workers), thread_name_prefix="cascade")
+
+    def extract(self, page: Page) -> CascadeResult:
+        cheap = [strategy for strategy in self.strategies if strategy.is_cheap(page)]
+        costly = [strategy for strategy in self.strategies if strategy not in cheap]
+
+        racing: Dict[Future, str] = {}
+        if self.race and self.memory.get(page.domain) in {strategy.name for strategy in costly}:
+            racing = self._start(costly, page)
+        raced = bool(racing)
+
+        attempts: List[Attempt] = []
+        winner = None
+        for strategy in cheap:
+            # A raced strategy that already passed beats the cheap ones still to run
+            winner = self._collect(racing, attempts, block=False)
+            if winner:
+                break
+            attempt = self._attempt(strategy, page)
+            attempts.append(attempt)
+            if attempt.passed:
+                winner = attempt
+                break
+
+        # Cheap strategies fell short: race every expensive one, first to pass wins
+        if winner is None and costly:
+            if not racing:
+                racing = self._start(costly, page)
+            while winner is None and racing:
+                winner = self._collect(racing, attempts, block=True)
+
+        # Raced strategies still running are left to finish in the background
+        abandoned = sum(1 for future in racing if not future.cancel())
+
+        if winner is None:
+            winner = max(attempts, key=lambda attempt: attempt.score, default=None)
+            if winner is not None and not winner.reviews:
+                winner = None
+
+        result = CascadeResult(winner, attempts)
+        self.stats.record(result, raced, abandoned)
+        if winner:
+            self.memory.remember(page.domain, winner.strategy)
+            logger.info(f"Cascade picked {winner.strategy} ({len(winner.reviews)} reviews) for {page.url}")
+        return result
+
+    def _start(self, strategies: List[ExtractionStrategy], page: Page) -> Dict[Future, str]:
+        return {
+            self._pool.submit(contextvars.copy_context().run, self._attempt, strategy, page): strategy.name
+            for strategy in strategies
+        }
+
+    @staticmethod
+    def _collect(racing: Dict[Future, str], attempts: List[Attempt], block: bool) -> Optional[Attempt]:
+        """Move finished raced attempts into `attempts`, returning the first that passed."""
+        if block:
+            done, _ = wait(racing, return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in racing if future.done()]
+        winner = None
+        for future in done:
+            del racing[future]
+            attempt = future.result()
+            attempts.append(attempt)
+            if attempt.passed and winner is None:
+                winner = attempt
+        return winner
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _attempt(self, strategy: ExtractionStrategy, page: Page) -> Attempt:
+        start = time.perf_counter()
+        try:
+            with span(f"strategy_{strategy.name}"):
+                reviews = [normalize_review(review) for review in strategy.extract(page)]
+            return Attempt(strategy.name, reviews, time.perf_counter() - start)
+        except Exception as e:
+            logger.warning(f"Strategy {strategy.name} failed on {page.url}: {e}")
+            return Attempt(strategy.name, [], time.perf_counter() - start, str(e))
@@ -0,0 +1,45 @@
+import os
+import logging
+from typing import List, Optional
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+from tracing import traced
+
+logger = logging.getLogger()
+
+# Parser configuration
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml")
+
+# Backends the extractors can run on. All of them produce a BeautifulSoup
+# tree so the selector code is identical across backends.
+PARSER_BACKENDS = ["lxml", "html.parser", "html5lib"]
+FALLBACK_PARSER = "html.parser"
+PARSER_PATTERN = "^(" + "|".join(backend.replace(".", r"\.") for backend in PARSER_BACKENDS) + ")$"
+
+_warned_missing = set()
+
+
+def available_backends() -> List[str]:
+    """Backends whose parser library is installed."""
+    return [backend for backend in PARSER_BACKENDS if builder_registry.lookup(backend)]
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """The requested (or configured) backend, or html.parser if it isn't installed."""
+    backend = backend or HTML_PARSER
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {backend}")
+    if builder_registry.lookup(backend) is None:
+        if backend not in _warned_missing:
+            _warned_missing.add(backend)
+            logger.warning(f"HTML parser backend {backend!r} is not installed, using {FALLBACK_PARSER}")
+        return FALLBACK_PARSER
+    return backend
+
+
+@traced("parse")
+def parse_html(html_content: str, backend: Optional[str] = None) -> BeautifulSoup:
+    """Parse HTML with the chosen backend (HTML_PARSER by default)."""
+    return BeautifulSoup(html_content, resolve_backend(backend))
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Optional
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from pagination import LOAD_MORE_SCRIPT, LOAD_MORE_TIMEOUT, NEXT_LINK_SELECTORS, NEXT_LINK_TEXT, PageBudget
+from readiness import READINESS_POLL_INTERVAL
+from selector_cache import FINGERPRINT_SKIP_TAGS, fingerprint_signatures
+from tracing import span, traced
+
+logger = logging.getLogger()
+
+# In-page extraction configuration
+IN_PAGE_EXTRACTION = os.getenv("IN_PAGE_EXTRACTION", "1") == "1"
+HARVEST_QUIET_MS = int(os.getenv("HARVEST_QUIET_MS", "300"))
+# Scrolling inserts nothing on pages without infinite scroll, so wait less for it
+HARVEST_SCROLL_TIMEOUT = float(os.getenv("HARVEST_SCROLL_TIMEOUT", "2"))
+
+# Evaluates prioritised selector lists inside the page the way the Python
+# extractors do: the first container selector with any matches picks the
+# containers, and per field the first selector with a match inside a container
+# wins. Text is joined like BeautifulSoup's get_text(strip=True), leaving out
+# script and style contents. Each review is a row of field texts followed by
+# image URLs; containers without text for the first field (the body) are
+# skipped. The next link is found like find_next_link.
+EXTRACT_FUNCTIONS = """
+const [containers, fields, nextSelectors, nextPattern] = arguments;
+const SKIPPED_TEXT = new Set(['script', 'style', 'template']);
+const textOf = (root, strip) => {
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+    const parts = [];
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+        if (SKIPPED_TEXT.has(node.parentNode.localName)) {
+            continue;
+        }
+        const text = strip ? node.data.trim() : node.data;
+        if (text) {
+            parts.push(text);
+        }
+    }
+    return parts.join('');
+};
+// Selectors the browser can't parse match nothing
+const queryAll = (root, selector) => {
+    try {
+        return root.querySelectorAll(selector);
+    } catch (e) {
+        return [];
+    }
+};
+const queryOne = (root, selector) => {
+    try {
+        return root.querySelector(selector);
+    } catch (e) {
+        return null;
+    }
+};
+const firstMatch = (root, selectors) => {
+    for (const selector of selectors) {
+        const found = queryOne(root, selector);
+        if (found) {
+            return found;
+        }
+    }
+    return null;
+};
+const chooseContainer = () => {
+    for (const selector of containers) {
+        const found = queryAll(document, selector);
+        if (found.length) {
+            return [selector, Array.from(found)];
+        }
+    }
+    return [null, []];
+};
+const reviewRows = elements => {
+    const rows = [];
+    for (const element of elements) {
+        const row = [];
+        for (const selectors of fields) {
+            const match = firstMatch(element, selectors);
+            row.push(match ? textOf(match, true) : null);
+        }
+        if (!row[0]) {
+            continue;
+        }
+        row.push(Array.from(element.querySelectorAll('img[src]'), img => img.getAttribute('src')));
+        rows.push(row);
+    }
+    return rows;
+};
+const nextLink = () => {
+    for (const selector of nextSelectors) {
+        const found = queryOne(document, selector);
+        if (found && found.getAttribute('href')) {
+            return found.getAttribute('href');
+        }
+    }
+    const pattern = new RegExp(nextPattern, 'i');
+    for (const anchor of document.querySelectorAll('a[href]')) {
+        if (pattern.test(textOf(anchor, false))) {
+            return anchor.getAttribute('href');
+        }
+    }
+    return null;
+};
+"""
+
+EXTRACT_SCRIPT = EXTRACT_FUNCTIONS + """
+const [container, elements] = chooseContainer();
+return {container: container, reviews: reviewRows(elements), next: nextLink()};
+"""
+
+# Like EXTRACT_SCRIPT, but the first call also installs a MutationObserver that
+# collects inserted elements, and later calls only extract the review
+# containers inside what was inserted since the previous call. Containers
+# already extracted are never returned twice.
+HARVEST_SCRIPT = EXTRACT_FUNCTIONS + """
+let state = window.__reviewHarvest;
+if (!state) {
+    state = window.__reviewHarvest = {
+        container: null, seen: new WeakSet(), added: [], mutations: 0, lastMutation: performance.now()
+    };
+    new MutationObserver(records => {
+        for (const record of records) {
+            for (const node of record.addedNodes) {
+                if (node.nodeType === Node.ELEMENT_NODE) {
+                    state.added.push(node);
+                }
+            }
+        }
+        state.mutations += 1;
+        state.lastMutation = performance.now();
+    }).observe(document, {childList: true, subtree: true});
+}
+
+let elements = [];
+if (state.container === null) {
+    // Until some container selector matches, scan the whole document
+    [state.container, elements] = chooseContainer();
+} else {
+    for (const node of state.added) {
+        if (!node.isConnected) {
+            continue;
+        }
+        if (node.matches(state.container)) {
+            elements.push(node);
+        }
+        for (const element of node.querySelectorAll(state.container)) {
+            elements.push(element);
+        }
+    }
+    elements.sort((a, b) => a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1);
+}
+state.added = [];
+
+const fresh = [];
+for (const element of elements) {
+    if (!state.seen.has(element)) {
+        state.seen.add(element);
+        fresh.push(element);
+    }
+}
+return {container: state.container, reviews: reviewRows(fresh), next: nextLink(), mutations: state.mutations};
+"""
+
+# Whether the page inserted nodes since the given mutation count and then went quiet
+HARVEST_SETTLED_SCRIPT = """
+const state = window.__reviewHarvest;
+return state.mutations > arguments[0] && performance.now() - state.lastMutation >= arguments[1];
+"""
+
+# Scrolls to the bottom to trigger infinite scroll; false if the page can't scroll further
+SCROLL_SCRIPT = """
+const root = document.scrollingElement || document.documentElement;
+const before = root.scrollTop;
+root.scrollTop = root.scrollHeight;
+return root.scrollTop > before;
+"""
+
+# The tag/class signatures selector_cache.page_fingerprint collects from the parsed page
+SIGNATURES_SCRIPT = """
+const skipped = new Set(arguments[0]);
+const signatures = new Set();
+for (const element of document.getElementsByTagName('*')) {
+    const name = element.localName.toLowerCase();
+    if (skipped.has(name)) {
+        continue;
+    }
+    const classes = (element.getAttribute('class') || '').split(/\\s+/).filter(Boolean).sort();
+    signatures.add(name + '.' + classes.join('.'));
+}
+return Array.from(signatures);
+"""
+
+
+class InPageResult:
+    """Field texts of each review container found in the page, plus its next link.
+
+    `fields` holds one dict per review: the requested fields' texts (None
+    where nothing matched) and `images`.
+    """
+
+    def __init__(self, container: Optional[str], fields: List[Dict], next_link: Optional[str], size: int, mutations: int = 0):
+        self.container = container
+        self.fields = fields
+        self.next_link = next_link
+        self.size = size
+        # DOM insertions seen so far by the harvest observer
+        self.mutations = mutations
+
+
+def _run_extraction(driver, script: str, containers: List[str], fields: Dict[str, List[str]]) -> Optional[InPageResult]:
+    names = list(fields)
+    try:
+        result = driver.execute_script(
+            script, containers, [fields[name] for name in names], NEXT_LINK_SELECTORS, NEXT_LINK_TEXT.pattern
+        )
+    except WebDriverException as e:
+        logger.warning(f"In-page extraction failed, falling back to page source: {e.msg}")
+        return None
+    reviews = [dict(zip(names, row), images=row[-1]) for row in result["reviews"]]
+    return InPageResult(result["container"], reviews, result["next"], len(json.dumps(result)), result.get("mutations", 0))
+
+
+def extract_in_page(driver, containers: List[str], fields: Dict[str, List[str]]) -> Optional[InPageResult]:
+    """Run the selector lists inside the page and fetch only the review fields.
+
+    The first field in `fields` is the review body. Returns None if the
+    script fails, so the caller can fall back to `page_source`.
+    """
+    with span("in_page_extract"):
+        result = _run_extraction(driver, EXTRACT_SCRIPT, containers, fields)
+    if result is not None:
+        logger.info(f"Extracted {len(result.fields)} reviews in the page ({result.size} bytes)")
+    return result
+
+
+def _harvest_round(
+    driver,
+    containers: List[str],
+    fields: Dict[str, List[str]],
+    previous: InPageResult,
+    timeout: float
+) -> Optional[InPageResult]:
+    """Click "load more" or scroll, then pull the reviews inserted in response.
+
+    Pages with a next link are paginated, so they are never scrolled. Waits
+    for the page to insert nodes and go quiet; nodes that hold no new reviews
+    (spinners, placeholders) just restart the wait until the timeout.
+    """
+    if not driver.execute_script(LOAD_MORE_SCRIPT):
+        if previous.next_link or not driver.execute_script(SCROLL_SCRIPT):
+            return None
+        timeout = min(timeout, HARVEST_SCROLL_TIMEOUT)
+    mutations = previous.mutations
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        try:
+            WebDriverWait(driver, remaining, poll_frequency=READINESS_POLL_INTERVAL).until(
+                lambda d: d.execute_script(HARVEST_SETTLED_SCRIPT, mutations, HARVEST_QUIET_MS)
+            )
+        except TimeoutException:
+            return None
+        result = _run_extraction(driver, HARVEST_SCRIPT, containers, fields)
+        if result is None or result.fields:
+            return result
+        mutations = result.mutations
+
+
+@traced("harvest")
+def harvest_in_page(
+    driver,
+    containers: List[str],
+    fields: Dict[str, List[str]],
+    budget: Optional[PageBudget] = None,
+    timeout: float = LOAD_MORE_TIMEOUT
+) -> Optional[InPageResult]:
+    """Extract the page's reviews in the browser, then load and harvest more.
+
+    Each round spends a page of `budget` and clicks a "load more" control,
+    or scrolls to the bottom for infinite scroll. It then fetches only the
+    reviews in the nodes the page inserted, which a MutationObserver
+    collects. Stops at the first round that adds no reviews, or when the
+    budget runs out. Returns None if the first extraction fails, so the
+    caller can fall back to `page_source`.
+    """
+    result = _run_extraction(driver, HARVEST_SCRIPT, containers, fields)
+    if result is None:
+        return None
+
+    completed = 0
+    while budget and budget.remaining:
+        harvested = _harvest_round(driver, containers, fields, result, timeout)
+        if harvested is None:
+            break
+        budget.spend()
+        completed += 1
+        result.fields.extend(harvested.fields)
+        result.container = harvested.container
+        result.next_link = harvested.next_link
+        result.mutations = harvested.mutations
+        result.size += harvested.size
+
+    logger.info(f"Harvested {len(result.fields)} reviews in the page over {completed} more rounds ({result.size} bytes)")
+    return result
+
+
+def page_fingerprint_in_page(driver) -> Optional[str]:
+    """The page's selector_cache fingerprint, computed from the live DOM."""
+    try:
+        with span("in_page_fingerprint"):
+            return fingerprint_signatures(driver.execute_script(SIGNATURES_SCRIPT, sorted(FINGERPRINT_SKIP_TAGS)))
+    except WebDriverException as e:
+        logger.warning(f"In-page fingerprint failed: {e.msg}")
+        return None
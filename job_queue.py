@@ -0,0 +1,415 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from scrape_executor import SCRAPE_DEADLINE, SCRAPE_MAX_IN_FLIGHT, SCRAPE_MAX_QUEUE
+from selector_cache import page_domain
+from static_fetcher import throttle_signals
+
+logger = logging.getLogger()
+
+# Job queue configuration
+SCRAPE_WORKERS = os.getenv("SCRAPE_WORKERS", "0") == "1"
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "job_queue.db")
+JOB_LEASE_TIMEOUT = float(os.getenv("JOB_LEASE_TIMEOUT", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", str(24 * 3600)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.1"))
+JOB_MAX_POLL_INTERVAL = float(os.getenv("JOB_MAX_POLL_INTERVAL", "1"))
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+
+class SQLiteJobQueue:
+    """Durable scrape job queue in a SQLite file shared by API and worker processes.
+
+    A worker claims a job by taking a lease on it and keeps the lease alive
+    with heartbeats. If the worker dies, the lease runs out and the job goes
+    to another worker, until it has used `max_attempts`. Results and errors
+    stay in the queue for JOB_RESULT_TTL.
+
+    Other backends (e.g. a networked broker for several hosts) only need the
+    same methods: enqueue, claim, heartbeat, complete, fail, cancel, get,
+    depth, register_worker and stats.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, lease_timeout: float = JOB_LEASE_TIMEOUT):
+        self.lease_timeout = lease_timeout
+        self._lock = threading.Lock()
+        # Autocommit, with explicit transactions where a read decides a write
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id TEXT PRIMARY KEY,
+                service TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                max_attempts INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS scrape_jobs_ready ON scrape_jobs (service, status, available_at)"
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scrape_workers (
+                id TEXT PRIMARY KEY,
+                service TEXT NOT NULL,
+                host TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                running INTEGER NOT NULL,
+                done INTEGER NOT NULL,
+                failed INTEGER NOT NULL
+            )
+            """
+        )
+
+    def enqueue(self, service: str, payload: Dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO scrape_jobs VALUES (?, ?, ?, ?, 0, ?, ?, NULL, NULL, NULL, NULL, ?, ?)",
+                (job_id, service, json.dumps(payload), JOB_QUEUED, max_attempts, now, now, now)
+            )
+        return job_id
+
+    def claim(self, service: str, worker: str) -> Optional[Dict]:
+        """Lease the oldest ready job of `service`, including ones whose lease ran out."""
+        now = time.time()
+        with self._transaction():
+            while True:
+                row = self._db.execute(
+                    "SELECT id, payload, attempts, max_attempts FROM scrape_jobs WHERE service = ? AND ("
+                    "(status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?)"
+                    ") ORDER BY available_at LIMIT 1",
+                    (service, JOB_QUEUED, now, JOB_RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, payload, attempts, max_attempts = row
+                if attempts >= max_attempts:
+                    # Its last worker died holding it
+                    self._db.execute(
+                        "UPDATE scrape_jobs SET status = ?, worker = NULL, error = ?, updated_at = ? WHERE id = ?",
+                        (JOB_FAILED, json.dumps({"status_code": 500, "detail": "Worker lease expired"}), now, job_id)
+                    )
+                    continue
+                self._db.execute(
+                    "UPDATE scrape_jobs SET status = ?, attempts = attempts + 1, worker = ?, lease_expires = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (JOB_RUNNING, worker, now + self.lease_timeout, now, job_id)
+                )
+                return {"id": job_id, "payload": json.loads(payload), "attempt": attempts + 1}
+
+    def heartbeat(self, job_ids: List[str], worker: str) -> List[str]:
+        """Extend the leases `worker` still holds, returning the jobs it lost."""
+        now = time.time()
+        lost = []
+        with self._lock:
+            for job_id in job_ids:
+                updated = self._db.execute(
+                    "UPDATE scrape_jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                    (now + self.lease_timeout, now, job_id, worker, JOB_RUNNING)
+                ).rowcount
+                if not updated:
+                    lost.append(job_id)
+        return lost
+
+    def complete(self, job_id: str, worker: str, result: Dict) -> bool:
+        """Store a job's result; False if the worker no longer held the job."""
+        return self._finish(job_id, worker, JOB_DONE, result=json.dumps(result))
+
+    def fail(self, job_id: str, worker: str, error: Dict, retry: bool) -> bool:
+        """Requeue the job with backoff if `retry` and attempts remain, else mark it failed."""
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT attempts, max_attempts FROM scrape_jobs WHERE id = ? AND worker = ? AND status = ?",
+                (job_id, worker, JOB_RUNNING)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts, max_attempts = row
+            if retry and attempts < max_attempts:
+                self._db.execute(
+                    "UPDATE scrape_jobs SET status = ?, worker = NULL, available_at = ?, error = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (JOB_QUEUED, now + JOB_RETRY_DELAY * 2 ** (attempts - 1), json.dumps(error), now, job_id)
+                )
+            else:
+                self._db.execute(
+                    "UPDATE scrape_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (JOB_FAILED, json.dumps(error), now, job_id)
+                )
+            return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job no worker has started; False if it already started or finished."""
+        with self._lock:
+            return bool(self._db.execute(
+                "UPDATE scrape_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (JOB_CANCELLED, time.time(), job_id, JOB_QUEUED)
+            ).rowcount)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT service, payload, status, attempts, worker, result, error, created_at, updated_at "
+                "FROM scrape_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        service, payload, status, attempts, worker, result, error, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "service": service,
+            "payload": json.loads(payload),
+            "status": status,
+            "attempts": attempts,
+            "worker": worker,
+            "result": json.loads(result) if result else None,
+            "error": json.loads(error) if error else None,
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
+    def depth(self, service: str) -> int:
+        """Jobs of `service` waiting for a worker, shared by every API process."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM scrape_jobs WHERE service = ? AND status = ?", (service, JOB_QUEUED)
+            ).fetchone()[0]
+
+    def register_worker(self, worker: str, service: str, running: int = 0, done: int = 0, failed: int = 0):
+        """Record that `worker` is alive, with its job counters."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO scrape_workers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                "last_seen = excluded.last_seen, running = excluded.running, done = excluded.done, "
+                "failed = excluded.failed",
+                (worker, service, socket.gethostname(), os.getpid(), now, now, running, done, failed)
+            )
+
+    def stats(self, service: str) -> Dict:
+        """Jobs per state and the workers heard from within a lease timeout."""
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM scrape_jobs WHERE service = ? GROUP BY status", (service,)
+            ).fetchall())
+            workers = self._db.execute(
+                "SELECT id, host, pid, started_at, last_seen, running, done, failed FROM scrape_workers "
+                "WHERE service = ? AND last_seen >= ?",
+                (service, now - self.lease_timeout)
+            ).fetchall()
+        return {
+            "jobs": {status: counts.get(status, 0) for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED)},
+            "workers": [
+                dict(zip(("id", "host", "pid", "started_at", "last_seen", "running", "done", "failed"), worker))
+                for worker in workers
+            ]
+        }
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _finish(self, job_id: str, worker: str, status: str, result: Optional[str] = None) -> bool:
+        with self._lock:
+            return bool(self._db.execute(
+                "UPDATE scrape_jobs SET status = ?, result = ?, error = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, result, time.time(), job_id, worker, JOB_RUNNING)
+            ).rowcount)
+
+    def _purge(self, now: float):
+        self._db.execute(
+            "DELETE FROM scrape_jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+            (JOB_DONE, JOB_FAILED, JOB_CANCELLED, now - JOB_RESULT_TTL)
+        )
+        self._db.execute("DELETE FROM scrape_workers WHERE last_seen < ?", (now - JOB_RESULT_TTL,))
+
+
+def create_job_queue():
+    """Queue selected by JOB_QUEUE_BACKEND (only "sqlite" ships here)."""
+    if JOB_QUEUE_BACKEND == "sqlite":
+        return SQLiteJobQueue()
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {JOB_QUEUE_BACKEND}")
+
+
+class JobClient:
+    """Runs an app's scrapes on worker processes through the job queue.
+
+    The API process only enqueues and waits for the stored result, so the
+    browser work can be spread over as many `scrape_worker.py` processes,
+    cores or hosts as the queue backend reaches.
+
+    Requests are admitted like ScrapeExecutor admits them: 429 once
+    `max_queue` jobs already wait for a worker or this process already waits
+    on `max_in_flight + max_queue` jobs, and 503 after shutdown.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        queue=None,
+        deadline: float = SCRAPE_DEADLINE,
+        max_in_flight: int = SCRAPE_MAX_IN_FLIGHT,
+        max_queue: int = SCRAPE_MAX_QUEUE
+    ):
+        self.service = service
+        self.queue = queue or create_job_queue()
+        self.deadline = deadline
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._closed = False
+
+    def submit(self, url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> str:
+        return self.queue.enqueue(
+            self.service, {"url": url, "page_limit": page_limit, "parser": parser, "incremental": incremental}
+        )
+
+    def scrape(self, url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> Dict:
+        """Blocking scrape on a worker, for callers that already run on a thread."""
+        job_id = self.submit(url, page_limit, parser, incremental)
+        expires_at = time.monotonic() + self.deadline
+        interval = JOB_POLL_INTERVAL
+        while True:
+            job = self.queue.get(job_id)
+            if job is not None and job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+                return self._outcome(job)
+            if time.monotonic() >= expires_at:
+                return self._expire(job_id)
+            time.sleep(interval)
+            interval = min(interval * 2, JOB_MAX_POLL_INTERVAL)
+
+    async def run(self, url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> Dict:
+        """Scrape on a worker without blocking the event loop, if the request is admitted."""
+        self._admit()
+        try:
+            # The queue is shared by every API process, so its depth is the real backlog
+            queued = await run_in_threadpool(self.queue.depth, self.service)
+            if queued >= self.max_queue:
+                logger.warning(f"Rejecting scrape job: {queued} jobs already queued for workers")
+                raise self._too_many()
+            return await self._run(url, page_limit, parser, incremental)
+        finally:
+            with self._lock:
+                self._admitted -= 1
+
+    def shutdown(self):
+        """Stop admitting requests; jobs already queued stay for the workers."""
+        with self._lock:
+            self._closed = True
+
+    def stats(self) -> Dict:
+        return self.queue.stats(self.service)
+
+    def _admit(self):
+        with self._lock:
+            if self._closed:
+                raise HTTPException(status_code=503, detail="Scraper is shutting down")
+            if self._admitted >= self.max_in_flight + self.max_queue:
+                logger.warning(f"Rejecting scrape job: {self._admitted} jobs already awaited")
+                raise self._too_many()
+            self._admitted += 1
+
+    def _too_many(self) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail="Too many scrape jobs queued, retry later",
+            headers={"Retry-After": "5"}
+        )
+
+    async def _run(self, url: str, page_limit: int, parser: Optional[str], incremental: bool) -> Dict:
+        job_id = await run_in_threadpool(self.submit, url, page_limit, parser, incremental)
+        expires_at = time.monotonic() + self.deadline
+        interval = JOB_POLL_INTERVAL
+        while True:
+            job = await run_in_threadpool(self.queue.get, job_id)
+            if job is not None and job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+                return self._outcome(job)
+            if time.monotonic() >= expires_at:
+                return self._expire(job_id)
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, JOB_MAX_POLL_INTERVAL)
+
+    def _outcome(self, job: Dict) -> Dict:
+        # Hand the worker's 429/503 signal to this process's batch scheduler
+        outcome = job["result"] if job["status"] == JOB_DONE else job["error"]
+        retry_after = outcome.pop("retry_after", None) if outcome else None
+        if retry_after is not None:
+            throttle_signals.note(page_domain(job["payload"]["url"]), retry_after)
+        if job["status"] == JOB_DONE:
+            return job["result"]
+        error = job["error"] or {"status_code": 500, "detail": f"Job {job['status']}"}
+        raise HTTPException(status_code=error["status_code"], detail=error["detail"])
+
+    def _expire(self, job_id: str) -> Dict:
+        # A worker that already started it still stores its result for GET /api/jobs
+        self.queue.cancel(job_id)
+        logger.error(f"Scrape job {job_id} did not finish within {self.deadline:.0f}s")
+        raise HTTPException(
+            status_code=504,
+            detail=f"Scraping did not finish within {self.deadline:.0f}s (job {job_id})"
+        )
+
+
+def add_job_routes(app: FastAPI, client: JobClient):
+    """Serve stored job results and queue stats for an app that scrapes on workers."""
+    @app.get("/api/jobs/{job_id}")
+    async def get_job(job_id: str):
+        """A scrape job's state, attempts and stored result or error."""
+        job = await run_in_threadpool(client.queue.get, job_id)
+        if job is None or job["service"] != client.service:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return job
+
+    @app.get("/api/job-queue")
+    async def get_job_queue_stats():
+        """Jobs per state and the live workers pulling from the queue."""
+        return await run_in_threadpool(client.stats)
@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Hashable, List, Optional, Union
+
+from groq import AsyncGroq
+
+from dom_condenser import estimate_tokens
+from tracing import traced
+
+logger = logging.getLogger()
+
+# LLM gateway configuration
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "6000"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+# Extra seconds a blocking caller waits for the gateway loop to get to its call
+LLM_QUEUE_GRACE = float(os.getenv("LLM_QUEUE_GRACE", "5"))
+LLM_STUB_RESPONSE = os.getenv("LLM_STUB_RESPONSE", "{}")
+LLM_STUB_DELAY = float(os.getenv("LLM_STUB_DELAY", "0"))
+
+Messages = List[Dict[str, str]]
+
+
+class GroqBackend:
+    """Chat completions from the Groq API."""
+
+    def __init__(self, api_key: str, model: str = LLM_MODEL):
+        self.client = AsyncGroq(api_key=api_key)
+        self.model = model
+
+    async def complete(self, messages: Messages, max_tokens: int) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=False,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+
+class StubBackend:
+    """Canned completions for tests and offline runs; counts the calls it gets."""
+
+    def __init__(self, response: Union[str, Callable[[Messages], str]] = LLM_STUB_RESPONSE, delay: float = LLM_STUB_DELAY):
+        self.response = response
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, messages: Messages, max_tokens: int) -> str:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.response(messages) if callable(self.response) else self.response
+
+
+def groq_api_key(fallback: str = "") -> str:
+    """The Groq key from GROQ_API_KEY, else the app's own `fallback`.
+
+    Warns at startup when there is neither, instead of failing each LLM call later.
+    """
+    api_key = os.getenv("GROQ_API_KEY") or fallback
+    if not api_key and LLM_BACKEND != "stub":
+        logger.warning("GROQ_API_KEY is not set: every Groq call will fail and extraction falls back to heuristics")
+    return api_key
+
+
+def create_llm_backend(api_key: str):
+    """Backend selected by LLM_BACKEND ("groq" or "stub")."""
+    if LLM_BACKEND == "stub":
+        logger.info("Using the stub LLM backend")
+        return StubBackend()
+    return GroqBackend(api_key)
+
+
+class TokenBudget:
+    """Token bucket shared by all LLM calls, refilled at `tokens_per_minute`."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, tokens: int, max_wait: float) -> Optional[float]:
+        """Reserve `tokens`, returning how long to wait before using them.
+
+        Returns None, reserving nothing, if the wait would exceed `max_wait`.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A prompt larger than the whole bucket only has to wait for a full one
+        tokens = min(tokens, self.capacity)
+        wait = max(0.0, (tokens - self.tokens) / self.rate) if self.rate else 0.0
+        if wait > max_wait:
+            return None
+        self.tokens -= tokens
+        return wait
+
+
+class LLMGateway:
+    """Single entry point for LLM calls from any thread or event loop.
+
+    Calls run on the gateway's own event loop. Concurrent calls with the same
+    key (domain and page template) share one in-flight request, and all
+    calls share a concurrency limit and a token-rate budget. A call that
+    would wait too long for budget, times out or fails returns None so the
+    caller can fall back to its default selectors straight away.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        timeout: float = LLM_TIMEOUT,
+        queue_grace: float = LLM_QUEUE_GRACE
+    ):
+        self.backend = backend
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.queue_grace = queue_grace
+        self._budget = TokenBudget(tokens_per_minute)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "throttled": 0, "timeouts": 0, "errors": 0}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, key: Optional[Hashable], messages: Messages, max_tokens: int = 1024) -> Future:
+        """Schedule a completion on the gateway loop; `key=None` disables coalescing."""
+        return asyncio.run_coroutine_threadsafe(self._complete(key, messages, max_tokens), self._ensure_loop())
+
+    @traced("llm")
+    def complete_sync(self, key: Optional[Hashable], messages: Messages, max_tokens: int = 1024) -> Optional[str]:
+        """Blocking completion for scrape threads.
+
+        Gives up after the call's own timeout plus `queue_grace`, in case the
+        gateway loop is stalled or stopped, so no scrape thread hangs on it.
+        """
+        future = self.submit(key, messages, max_tokens)
+        try:
+            return future.result(timeout=self.timeout + self.queue_grace)
+        except FutureTimeoutError:
+            future.cancel()
+            self.stats["timeouts"] += 1
+            logger.warning(f"Gave up waiting for the LLM gateway after {self.timeout + self.queue_grace:.1f}s")
+            return None
+
+    async def complete(self, key: Optional[Hashable], messages: Messages, max_tokens: int = 1024) -> Optional[str]:
+        """Completion awaitable from any event loop."""
+        return await asyncio.wrap_future(self.submit(key, messages, max_tokens))
+
+    def close(self):
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop = None
+
+    async def _complete(self, key: Optional[Hashable], messages: Messages, max_tokens: int) -> Optional[str]:
+        shared = self._inflight.get(key) if key is not None else None
+        if shared is not None:
+            self.stats["coalesced"] += 1
+            logger.info(f"Joining in-flight LLM call for {key}")
+            return await asyncio.shield(shared)
+
+        task = asyncio.ensure_future(self._call(messages, max_tokens))
+        if key is not None:
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _call(self, messages: Messages, max_tokens: int) -> Optional[str]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        tokens = sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+        wait = self._budget.reserve(tokens, self.timeout)
+        if wait is None:
+            self.stats["throttled"] += 1
+            logger.warning(f"LLM token budget exhausted, skipping a {tokens}-token call")
+            return None
+
+        self.stats["calls"] += 1
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(self._limited(messages, max_tokens, wait), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"LLM call timed out after {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"LLM call failed: {e}")
+        return None
+
+    async def _limited(self, messages: Messages, max_tokens: int, wait: float) -> str:
+        if wait:
+            await asyncio.sleep(wait)
+        async with self._semaphore:
+            return await self.backend.complete(messages, max_tokens)
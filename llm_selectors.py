@@ -0,0 +1,251 @@
+import re
+import json
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from pydantic import BaseModel
+
+from selector_cache import SelectorCache, page_domain, page_fingerprint
+from selector_matcher import SelectorMatcher
+from dom_condenser import condense_html
+from review_blocks import detect_review_blocks
+from llm_gateway import LLMGateway
+from tracing import count_fallback, span, traced
+
+logger = logging.getLogger()
+
+class Review(BaseModel):
+    body: str
+    rating: Optional[float] = None
+    reviewer: Optional[str] = None
+    images: List[str] = []
+
+# Default selectors as fallback
+DEFAULT_SELECTORS = {
+    "review_item": [
+        ".review",
+        "[class*=review]",
+        "[class*=Review]",
+        ".product-review",
+        ".comment",
+        "[data-review]"
+    ],
+    "body": [
+        ".review-content",
+        ".review-text",
+        ".review-body",
+        "p",
+        "[class*=review-content]",
+        "[class*=ReviewText]"
+    ],
+    "rating": [
+        ".rating",
+        ".stars",
+        "[class*=rating]",
+        "[class*=stars]",
+        "[data-rating]"
+    ],
+    "reviewer": [
+        ".reviewer-name",
+        ".author",
+        ".username",
+        "[class*=author]",
+        "[class*=reviewer]"
+    ]
+}
+
+SELECTOR_PROMPT = """
+        Analyze this HTML and return ONLY a JSON object with CSS selectors for reviews.
+        Format:
+        {
+            "review_item": "CSS selector for individual review container",
+            "body": "CSS selector for review text",
+            "rating": "CSS selector for rating",
+            "reviewer": "CSS selector for reviewer name"
+        }
+        """
+
+def extract_json_from_llm_response(text: str) -> Dict:
+    """Extract JSON from LLM response even if it's wrapped in text."""
+    try:
+        # Try to find JSON-like structure in the text
+        json_match = re.search(r'\{[^{}]*\}', text)
+        if json_match:
+            return json.loads(json_match.group(0))
+        return {}
+    except Exception as e:
+        logger.error(f"Error extracting JSON from LLM response: {e}")
+        return {}
+
+def selector_list(value) -> List[str]:
+    """An LLM answer's selectors for one field, or [] if it isn't a selector or list of them."""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, str) and item.strip()]
+
+def find_working_selector(soup: BeautifulSoup, selectors: List[str]) -> Optional[str]:
+    """Try multiple selectors and return the first one that works."""
+    for selector in selectors:
+        try:
+            elements = soup.select(selector)
+            if elements:
+                return selector
+        except Exception:
+            continue
+    return None
+
+def build_review(fields: Dict) -> Optional[Review]:
+    """Build a review from its field texts, whether matched in Python or in the page."""
+    # Get review body
+    body = fields["body"]
+    if not body:
+        return None
+
+    # Get rating (optional)
+    rating = None
+    if fields["rating"]:
+        # Try to extract number from text
+        rating_match = re.search(r'(\d+(?:\.\d+)?)', fields["rating"])
+        if rating_match:
+            rating = float(rating_match.group(1))
+
+    return Review(
+        body=body,
+        rating=rating,
+        reviewer=fields["reviewer"],
+        images=fields["images"]
+    )
+
+def extract_review_data(review_element: BeautifulSoup, matcher: SelectorMatcher) -> Optional[Review]:
+    """Extract data for a single review with improved error handling."""
+    try:
+        # Match body, rating and reviewer selectors in one pass over the review
+        matches = matcher.match(review_element)
+        if not matches["body"]:
+            return None
+
+        fields = {field: element.get_text(strip=True) if element else None for field, element in matches.items()}
+        fields["images"] = [img["src"] for img in review_element.select("img[src]")]
+        return build_review(fields)
+    except Exception as e:
+        logger.error(f"Error extracting review data: {e}")
+        return None
+
+
+class SelectorExtractor:
+    """Reviews matched with selectors from the cache, the LLM or the defaults.
+
+    Owns no resources: the caller creates, and closes, the gateway and cache.
+    """
+
+    def __init__(self, llm_gateway: LLMGateway, selector_cache: SelectorCache):
+        self.llm_gateway = llm_gateway
+        self.selector_cache = selector_cache
+
+    def get_llm_selectors(self, html_content: str, key: Optional[Tuple[str, str]] = None) -> dict:
+        """Get CSS selectors using LLM with improved error handling.
+
+        Concurrent calls with the same `key` (domain, page fingerprint) share one LLM request.
+        """
+        try:
+            content = self.llm_gateway.complete_sync(
+                key,
+                [
+                    {"role": "system", "content": SELECTOR_PROMPT},
+                    {"role": "user", "content": f"HTML: {condense_html(html_content)}"}
+                ],
+                max_tokens=1024
+            )
+            if content is None:
+                logger.warning("LLM unavailable, using default selectors")
+                count_fallback("llm_unavailable")
+                return DEFAULT_SELECTORS
+
+            # Try to extract JSON from response
+            selectors = extract_json_from_llm_response(content)
+
+            # The LLM answers with one selector per field; the extractors expect lists,
+            # so null, numbers or objects are dropped for the defaults
+            selectors = {key: selector_list(value) for key, value in selectors.items()}
+            selectors = {key: value for key, value in selectors.items() if value}
+
+            if not selectors:
+                logger.warning("Using default selectors as fallback")
+                count_fallback("invalid_response")
+                return DEFAULT_SELECTORS
+
+            for key, fallback in DEFAULT_SELECTORS.items():
+                selectors.setdefault(key, fallback)
+
+            return selectors
+        except Exception as e:
+            logger.error(f"Error getting LLM selectors: {e}")
+            count_fallback("error")
+            return DEFAULT_SELECTORS
+
+    @traced("selector_lookup")
+    def get_page_selectors(
+        self,
+        url: str,
+        html_content: str,
+        soup: BeautifulSoup,
+        fingerprint: Optional[str] = None
+    ) -> Tuple[dict, Optional[str]]:
+        """Get selectors from the cache or the LLM, plus the review item selector that matches."""
+        domain = page_domain(url)
+        fingerprint = fingerprint or page_fingerprint(soup)
+
+        # Cached selectors are only trusted while they still find review items
+        selectors = self.selector_cache.get(domain, fingerprint)
+        if selectors:
+            review_item_selector = find_working_selector(soup, selectors["review_item"])
+            if review_item_selector:
+                return selectors, review_item_selector
+            self.selector_cache.invalidate(domain, fingerprint)
+
+        start = time.monotonic()
+        selectors = self.get_llm_selectors(html_content, (domain, fingerprint))
+        # Recorded as what a later cache hit saves
+        latency = time.monotonic() - start
+
+        # Without an LLM answer, selectors inferred from repeated blocks beat the generic defaults
+        if selectors is DEFAULT_SELECTORS:
+            # A hit on these saves the detector's time, not the failed LLM call's
+            start = time.monotonic()
+            detected = detect_review_blocks(soup)
+            latency = time.monotonic() - start
+            if detected:
+                selectors = {**DEFAULT_SELECTORS, **detected.selectors()}
+
+        review_item_selector = find_working_selector(soup, selectors["review_item"])
+        if review_item_selector and selectors is not DEFAULT_SELECTORS:
+            self.selector_cache.put(domain, fingerprint, selectors, latency)
+        return selectors, review_item_selector
+
+    def select_page_reviews(
+        self,
+        url: str,
+        html_content: str,
+        soup: BeautifulSoup,
+        fingerprint: Optional[str] = None
+    ) -> List[Review]:
+        """Extract every review from an already parsed page."""
+        reviews = []
+
+        # Get selectors from the cache, the LLM or the defaults
+        selectors, review_item_selector = self.get_page_selectors(url, html_content, soup, fingerprint)
+        if not review_item_selector:
+            return reviews
+
+        # Extract reviews
+        matcher = SelectorMatcher({field: selectors[field] for field in ("body", "rating", "reviewer")})
+        with span("selector_match"):
+            for review_element in soup.select(review_item_selector):
+                review_data = extract_review_data(review_element, matcher)
+                if review_data:
+                    reviews.append(review_data)
+        return reviews
@@ -0,0 +1,266 @@
+import os
+import json
+import base64
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import requests
+
+from pagination import PaginationPattern, page_number, page_url_template
+from static_fetcher import STATIC_FETCH_TIMEOUT, get_http_session
+from tracing import traced
+
+logger = logging.getLogger()
+
+# Network capture configuration
+NETWORK_CAPTURE = os.getenv("NETWORK_CAPTURE", "1") == "1"
+NETWORK_CAPTURE_MIN_REVIEWS = int(os.getenv("NETWORK_CAPTURE_MIN_REVIEWS", "2"))
+NETWORK_CAPTURE_MAX_FEEDS = int(os.getenv("NETWORK_CAPTURE_MAX_FEEDS", "256"))
+
+# Keys review widgets commonly use for each field, most specific first
+BODY_KEYS = ["body", "review_text", "reviewText", "text", "content", "comment", "review", "description", "message"]
+RATING_KEYS = ["rating", "ratingValue", "rating_value", "score", "stars", "overall"]
+REVIEWER_KEYS = ["reviewer", "author", "user", "customer", "nickname", "userName", "user_name", "displayName", "display_name", "name"]
+NAME_KEYS = ["name", "displayName", "display_name", "nickname", "username", "userName"]
+TITLE_KEYS = ["title", "headline", "summary", "subject"]
+IMAGE_KEYS = ["images", "photos", "media", "pictures", "image_urls", "imageUrls"]
+IMAGE_URL_KEYS = ["url", "src", "uri", "original", "large"]
+
+# Query parameters that page through results by item offset instead of page number
+OFFSET_PARAMS = ["offset", "start", "skip", "from"]
+
+MIN_BODY_LENGTH = 15
+MAX_SEARCH_DEPTH = 4
+
+
+def _lookup(item: Dict, path: str) -> Any:
+    value = item
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _field_path(item: Dict, keys: List[str]) -> Optional[str]:
+    """First key in `keys` with a usable value; nested author/user objects resolve to their name."""
+    for key in keys:
+        value = item.get(key)
+        if isinstance(value, dict):
+            for name_key in NAME_KEYS:
+                if isinstance(value.get(name_key), str) and value[name_key].strip():
+                    return f"{key}.{name_key}"
+        elif isinstance(value, (str, int, float, list)) and not isinstance(value, bool) and value != "":
+            return key
+    return None
+
+
+def _looks_like_review(item: Any, body_key: str) -> bool:
+    return isinstance(item, dict) and isinstance(item.get(body_key), str) and len(item[body_key].strip()) >= MIN_BODY_LENGTH
+
+
+def _review_list(data: Any, path: Tuple = (), depth: int = 0) -> Optional[Tuple[Tuple, Dict[str, str], int]]:
+    """Largest list in `data` whose items look like reviews: (path, field paths, size)."""
+    best = None
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        body_key = _field_path(data[0], BODY_KEYS)
+        if body_key and "." not in body_key:
+            count = sum(1 for item in data if _looks_like_review(item, body_key))
+            if count >= NETWORK_CAPTURE_MIN_REVIEWS and count * 2 >= len(data):
+                fields = {
+                    "body": body_key,
+                    "rating": _field_path(data[0], RATING_KEYS),
+                    "reviewer": _field_path(data[0], REVIEWER_KEYS),
+                    "title": _field_path(data[0], TITLE_KEYS),
+                    "images": _field_path(data[0], IMAGE_KEYS)
+                }
+                best = (path, fields, count)
+
+    if depth < MAX_SEARCH_DEPTH:
+        children = data.items() if isinstance(data, dict) else enumerate(data[:1]) if isinstance(data, list) else ()
+        for key, value in children:
+            found = _review_list(value, path + (key,), depth + 1)
+            if found and (best is None or found[2] > best[2]):
+                best = found
+    return best
+
+
+def _rating(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _image_urls(value: Any) -> List[str]:
+    urls = []
+    for image in value if isinstance(value, list) else []:
+        if isinstance(image, str):
+            urls.append(image)
+        elif isinstance(image, dict):
+            url = next((image[key] for key in IMAGE_URL_KEYS if isinstance(image.get(key), str)), None)
+            if url:
+                urls.append(url)
+    return urls
+
+
+def map_review(item: Dict, fields: Dict[str, Optional[str]]) -> Dict:
+    """Review fields (title, body, rating, reviewer, images) from one JSON item."""
+    def text(field: str) -> Optional[str]:
+        value = _lookup(item, fields[field]) if fields.get(field) else None
+        return str(value).strip() if value not in (None, "") else None
+
+    return {
+        "title": text("title"),
+        "body": text("body"),
+        "rating": _rating(_lookup(item, fields["rating"])) if fields.get("rating") else None,
+        "reviewer": text("reviewer"),
+        "images": _image_urls(_lookup(item, fields["images"])) if fields.get("images") else []
+    }
+
+
+class ReviewFeed:
+    """A review-shaped JSON endpoint seen while a page rendered, replayable over HTTP."""
+
+    def __init__(self, url: str, path: Tuple, fields: Dict[str, Optional[str]], reviews: List[Dict]):
+        self.url = url
+        self.path = path
+        self.fields = fields
+        self.reviews = reviews
+
+    def extract(self, data: Any) -> List[Dict]:
+        """Map a response from this endpoint to reviews."""
+        for key in self.path:
+            try:
+                data = data[key]
+            except (KeyError, IndexError, TypeError):
+                return []
+        if not isinstance(data, list):
+            return []
+        reviews = []
+        for item in data:
+            review = map_review(item, self.fields) if isinstance(item, dict) else None
+            if review and review["body"]:
+                review["images"] = [urljoin(self.url, image) for image in review["images"]]
+                reviews.append(review)
+        return reviews
+
+    @traced("feed_replay")
+    def fetch_reviews(self, url: str) -> List[Dict]:
+        """Replay the endpoint for another page with a plain GET."""
+        try:
+            response = get_http_session().get(url, headers={"Accept": "application/json"}, timeout=STATIC_FETCH_TIMEOUT)
+            if response.status_code != 200:
+                logger.info(f"Review feed replay got HTTP {response.status_code}: {url}")
+                return []
+            return self.extract(response.json())
+        except (requests.RequestException, ValueError) as e:
+            logger.info(f"Review feed replay failed for {url}: {e}")
+            return []
+
+    def pattern(self) -> Optional[PaginationPattern]:
+        """How to address further pages of the endpoint, by page number or item offset."""
+        numbered = page_number(self.url)
+        if numbered:
+            return PaginationPattern(None, page_url_template(self.url, numbered[0]), numbered[1])
+
+        parsed = urlparse(self.url)
+        params = dict(parse_qsl(parsed.query))
+        for name in OFFSET_PARAMS:
+            if params.get(name, "").isdigit():
+                start, page_size = int(params[name]), len(self.reviews)
+
+                def page_url(number: int, name: str = name) -> str:
+                    query = dict(params, **{name: str(start + (number - 1) * page_size)})
+                    return urlunparse(parsed._replace(query=urlencode(query)))
+
+                return PaginationPattern(None, page_url, 1)
+        return None
+
+
+def detect_review_feed(url: str, data: Any) -> Optional[ReviewFeed]:
+    """A ReviewFeed if `data` (a decoded JSON response) holds a list of reviews."""
+    found = _review_list(data)
+    if found is None:
+        return None
+    path, fields, _ = found
+    feed = ReviewFeed(url, path, fields, [])
+    feed.reviews = feed.extract(data)
+    return feed if feed.reviews else None
+
+
+def _response_json(driver, request_id: str) -> Any:
+    result = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+    body = result.get("body", "")
+    if result.get("base64Encoded"):
+        body = base64.b64decode(body).decode("utf-8", "replace")
+    return json.loads(body)
+
+
+@traced("feed_capture")
+def capture_review_feed(driver, network_log: List[Dict]) -> Optional[ReviewFeed]:
+    """Look through a page's network log for a review JSON response.
+
+    `network_log` comes from browser_pool.read_network_log. Only GET requests
+    are considered, since only those can be replayed.
+    """
+    if not NETWORK_CAPTURE:
+        return None
+
+    methods: Dict[str, str] = {}
+    best: Optional[ReviewFeed] = None
+    for message in network_log:
+        params = message.get("params", {})
+        if message.get("method") == "Network.requestWillBeSent":
+            methods[params["requestId"]] = params["request"]["method"]
+            continue
+        if message.get("method") != "Network.responseReceived" or params.get("type") not in ("XHR", "Fetch"):
+            continue
+        response = params["response"]
+        if "json" not in response.get("mimeType", "") or methods.get(params["requestId"]) != "GET":
+            continue
+        try:
+            feed = detect_review_feed(response["url"], _response_json(driver, params["requestId"]))
+        except Exception as e:
+            logger.debug(f"Skipping response {response['url']}: {e}")
+            continue
+        if feed and (best is None or len(feed.reviews) > len(best.reviews)):
+            best = feed
+
+    if best:
+        logger.info(f"Captured review feed with {len(best.reviews)} reviews: {best.url}")
+    return best
+
+
+class FeedRegistry:
+    """Feeds captured while rendering, keyed by page URL until pagination claims them."""
+
+    def __init__(self, max_entries: int = NETWORK_CAPTURE_MAX_FEEDS):
+        self.max_entries = max_entries
+        self._feeds: "OrderedDict[str, ReviewFeed]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, url: str, feed: ReviewFeed):
+        with self._lock:
+            self._feeds[url] = feed
+            self._feeds.move_to_end(url)
+            while len(self._feeds) > self.max_entries:
+                self._feeds.popitem(last=False)
+
+    def pop(self, url: str) -> Optional[ReviewFeed]:
+        with self._lock:
+            return self._feeds.pop(url, None)
+
+
+review_feeds = FeedRegistry()
+
+
+def capture_page_feed(driver, url: str, network_log: List[Dict]) -> Optional[ReviewFeed]:
+    """Capture the review feed of the page just rendered and register it under `url`."""
+    feed = capture_review_feed(driver, network_log)
+    if feed:
+        review_feeds.remember(url, feed)
+    return feed
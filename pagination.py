@@ -0,0 +1,356 @@
+import os
+import re
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+from bs4 import BeautifulSoup
+
+from html_parser import parse_html
+from readiness import mark_page_changed, wait_for_page_ready
+from tracing import traced
+
+logger = logging.getLogger()
+
+# Pagination configuration
+PAGINATION_CONCURRENCY = int(os.getenv("PAGINATION_CONCURRENCY", "4"))
+LOAD_MORE_TIMEOUT = float(os.getenv("LOAD_MORE_TIMEOUT", "8"))
+
+# Query parameters sites commonly use for the page number
+PAGE_PARAMS = ["page", "p", "pg", "pageNumber", "page_number", "reviewPage", "review_page"]
+PAGE_PATH_PATTERN = re.compile(r"/page/(\d+)")
+
+NEXT_LINK_SELECTORS = [
+    "link[rel=next]",
+    "a[rel=next]",
+    "a[aria-label*=next i]",
+    "[class*=pagination] a[class*=next]",
+    "a[class*=next]"
+]
+NEXT_LINK_TEXT = re.compile(r"^\s*(next|next page|›|»|>)\s*$", re.I)
+
+# Clicks the first visible "load more" style control; returns whether one was found
+LOAD_MORE_SCRIPT = """
+const pattern = /load more|show more|more reviews|see more reviews|view more/i;
+for (const el of document.querySelectorAll('button, a, [role=button]')) {
+    if (el.offsetParent !== null && !el.disabled && pattern.test(el.textContent || '')) {
+        el.scrollIntoView({block: 'center'});
+        el.click();
+        return true;
+    }
+}
+return false;
+"""
+ELEMENT_COUNT_SCRIPT = "return document.getElementsByTagName('*').length"
+
+
+class PaginationPattern:
+    """How to reach further pages: by page number template or by next link."""
+
+    def __init__(self, next_url: Optional[str], page_url: Optional[Callable[[int], str]] = None, current: int = 1):
+        self.next_url = next_url
+        self.page_url = page_url
+        self.current = current
+
+
+class RenderedPage:
+    """A page whose reviews were extracted inside the browser.
+
+    Its HTML never left the browser, so the page's next link, found there
+    too and as written in its href, stands in for the pagination links the
+    HTML would have shown.
+    Fetchers return it instead of HTML; extractors and the paginator
+    branch on it.
+    """
+
+    def __init__(self, reviews: List, next_link: Optional[str] = None):
+        self.reviews = reviews
+        self.next_link = next_link
+
+
+# What a page fetcher returns: the page's HTML, or reviews already extracted in the browser
+Page = Union[str, RenderedPage]
+
+
+def find_next_link(soup: BeautifulSoup, url: str) -> Optional[str]:
+    """Absolute URL of the page's "next" link, if it has one."""
+    for selector in NEXT_LINK_SELECTORS:
+        try:
+            element = soup.select_one(selector)
+        except Exception:
+            continue
+        if element and element.get("href"):
+            return urljoin(url, element["href"])
+    for anchor in soup.find_all("a", href=True):
+        if NEXT_LINK_TEXT.match(anchor.get_text()):
+            return urljoin(url, anchor["href"])
+    return None
+
+
+def page_number(url: str) -> Optional[Tuple[str, int]]:
+    """Which query parameter (or "path") carries the page number, and its value."""
+    parsed = urlparse(url)
+    params = dict(parse_qsl(parsed.query))
+    for name in PAGE_PARAMS:
+        if params.get(name, "").isdigit():
+            return name, int(params[name])
+    match = PAGE_PATH_PATTERN.search(parsed.path)
+    if match:
+        return "path", int(match.group(1))
+    return None
+
+
+def page_url_template(url: str, name: str) -> Callable[[int], str]:
+    parsed = urlparse(url)
+
+    def page_url(number: int) -> str:
+        if name == "path":
+            return urlunparse(parsed._replace(path=PAGE_PATH_PATTERN.sub(f"/page/{number}", parsed.path)))
+        params = dict(parse_qsl(parsed.query))
+        params[name] = str(number)
+        return urlunparse(parsed._replace(query=urlencode(params)))
+
+    return page_url
+
+
+def links_to_page(soup: BeautifulSoup, url: str, name: str, number: int) -> bool:
+    """Whether the page links to page `number` of `url`, numbered by `name`."""
+    path = urlparse(url).path
+    for anchor in soup.find_all("a", href=True):
+        target = urljoin(url, anchor["href"])
+        if page_number(target) == (name, number) and (name == "path" or urlparse(target).path == path):
+            return True
+    return False
+
+
+def page_next_link(page: Page, url: str) -> Optional[str]:
+    """Absolute URL of the next page, from the HTML or as found in the browser."""
+    if isinstance(page, RenderedPage):
+        return urljoin(url, page.next_link) if page.next_link else None
+    return find_next_link(parse_html(page), url)
+
+
+def detect_pagination(page: Page, url: str) -> Optional[PaginationPattern]:
+    """Work out how this page links to the next one.
+
+    A numbered pattern (`?page=N` or `/page/N`) lets later pages be fetched
+    concurrently; a bare next link has to be followed one page at a time.
+    A page number in the URL alone is not enough, since `?p=123` may just as
+    well be a product id: the page must also link to the following page.
+    """
+    if isinstance(page, RenderedPage):
+        soup, next_url = None, page_next_link(page, url)
+    else:
+        soup = parse_html(page)
+        next_url = find_next_link(soup, url)
+    current = page_number(url)
+    following = page_number(next_url) if next_url else None
+
+    if following and (current is None or current[0] == following[0]):
+        start = current[1] if current else following[1] - 1
+        return PaginationPattern(next_url, page_url_template(next_url, following[0]), start)
+    if current and not next_url and soup is not None and links_to_page(soup, url, current[0], current[1] + 1):
+        return PaginationPattern(None, page_url_template(url, current[0]), current[1])
+    if next_url and next_url != url:
+        return PaginationPattern(next_url)
+    return None
+
+
+def review_key(review) -> Tuple:
+    """Identity of a review for de-duplication across pages."""
+    data = review if isinstance(review, dict) else review.dict()
+    return data.get("body"), data.get("reviewer"), data.get("rating")
+
+
+def collect_new(reviews: List, seen: set) -> List:
+    """Reviews not seen before, recording their key hashes as seen."""
+    new = []
+    for review in reviews:
+        key = hash(review_key(review))
+        if key not in seen:
+            seen.add(key)
+            new.append(review)
+    return new
+
+
+class PageBudget:
+    """Pages one scrape may still cover beyond the first.
+
+    Load-more or infinite-scroll rounds on the first page and further pages
+    followed spend from the same budget, so `page_limit` bounds the whole
+    scrape rather than each of them separately.
+    """
+
+    def __init__(self, page_limit: int):
+        # The first page is always fetched
+        self.remaining = max(1, page_limit) - 1
+
+    def spend(self, pages: int = 1):
+        self.remaining = max(0, self.remaining - pages)
+
+
+class Paginator:
+    """Walks a product's review pages, yielding only reviews not seen before.
+
+    Only hashes of review keys are remembered between pages, never the
+    reviews themselves, so a streaming caller can drop each page once sent.
+    Given a captured review `feed` (see network_capture), later pages are
+    fetched from its JSON endpoint instead of rendering HTML.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        html_content: Page,
+        budget: PageBudget,
+        fetch_html: Callable[[str], Optional[Page]],
+        extract: Callable[[Page], List],
+        feed=None
+    ):
+        self.url = url
+        self.html_content = html_content
+        self.budget = budget
+        self.fetch_html = fetch_html
+        self.extract = extract
+        self.feed = feed
+        self.next_page: Optional[str] = None
+        self._seen = set()
+
+    def pages(self, first_reviews: List) -> Iterator[Tuple[str, List]]:
+        """Yield `(page_url, new_reviews)` for the first page and each page followed.
+
+        Stops at the first page that adds nothing; afterwards `next_page` holds
+        the next unvisited page if the budget cut the walk short.
+        """
+        if self.feed and len(self.feed.reviews) > len(first_reviews):
+            # The widget's JSON can hold reviews the rendered HTML doesn't show yet
+            first_reviews = self.feed.reviews
+        yield self.url, collect_new(first_reviews, self._seen)
+        if not self.budget.remaining:
+            return
+
+        feed_pattern = self.feed.pattern() if self.feed else None
+        if feed_pattern:
+            logger.info(f"Replaying review feed {self.feed.url} over HTTP")
+            yield from self._numbered_pages(feed_pattern, self.feed.fetch_reviews)
+            # Feed URLs are JSON endpoints, not pages a caller can resume from
+            self.next_page = None
+            return
+
+        pattern = detect_pagination(self.html_content, self.url)
+        if pattern is None:
+            return
+        if pattern.page_url:
+            yield from self._numbered_pages(pattern)
+        else:
+            yield from self._linked_pages(pattern.next_url)
+
+    def _fetch_and_extract(self, page_url: str) -> List:
+        page_html = self.fetch_html(page_url)
+        return self.extract(page_html) if page_html else []
+
+    def _numbered_pages(
+        self,
+        pattern: PaginationPattern,
+        fetch_reviews: Optional[Callable[[str], List]] = None
+    ) -> Iterator[Tuple[str, List]]:
+        fetch_reviews = fetch_reviews or self._fetch_and_extract
+        numbers = range(pattern.current + 1, pattern.current + 1 + self.budget.remaining)
+        logger.info(f"Prefetching pages {numbers.start}-{numbers.stop - 1} of {self.url}")
+        with ThreadPoolExecutor(max_workers=PAGINATION_CONCURRENCY, thread_name_prefix="page") as pool:
+            # Keep at most PAGINATION_CONCURRENCY pages in flight ahead of the
+            # one being consumed so an early stop wastes little work
+            window = deque()
+            upcoming = iter(numbers)
+            for number in upcoming:
+                window.append((number, pool.submit(contextvars.copy_context().run, fetch_reviews, pattern.page_url(number))))
+                if len(window) >= PAGINATION_CONCURRENCY:
+                    break
+            try:
+                while window:
+                    number, future = window.popleft()
+                    try:
+                        reviews = future.result()
+                    except Exception as e:
+                        # Keep what earlier pages found; the finally cancels the rest
+                        logger.warning(f"Page {number} of {self.url} failed, stopping: {e}")
+                        return
+                    new = collect_new(reviews, self._seen)
+                    if not new:
+                        logger.info(f"Page {number} added no new reviews, stopping")
+                        return
+                    self.budget.spend()
+                    yield pattern.page_url(number), new
+                    following = next(upcoming, None)
+                    if following is not None:
+                        window.append((
+                            following,
+                            pool.submit(contextvars.copy_context().run, fetch_reviews, pattern.page_url(following))
+                        ))
+            finally:
+                # Also runs when the caller stops consuming pages early
+                for _, pending in window:
+                    pending.cancel()
+        self.next_page = pattern.page_url(numbers.stop)
+
+    def _linked_pages(self, next_url: str) -> Iterator[Tuple[str, List]]:
+        while self.budget.remaining:
+            try:
+                page_html = self.fetch_html(next_url)
+                new = collect_new(self.extract(page_html), self._seen) if page_html else []
+            except Exception as e:
+                logger.warning(f"{next_url} failed, stopping: {e}")
+                return
+            if not new:
+                logger.info(f"{next_url} added no new reviews, stopping")
+                return
+            self.budget.spend()
+            yield next_url, new
+            following = page_next_link(page_html, next_url)
+            if not following or following == next_url:
+                return
+            next_url = following
+        self.next_page = next_url
+
+
+def paginate(
+    url: str,
+    html_content: Page,
+    first_reviews: List,
+    budget: PageBudget,
+    fetch_html: Callable[[str], Optional[Page]],
+    extract: Callable[[Page], List],
+    feed=None
+) -> Tuple[List, Optional[str]]:
+    """Follow pagination while `budget` has pages left.
+
+    Returns the de-duplicated reviews and the URL of the next unvisited page
+    (None once the reviews run out).
+    """
+    paginator = Paginator(url, html_content, budget, fetch_html, extract, feed)
+    reviews = []
+    for _, new in paginator.pages(first_reviews):
+        reviews.extend(new)
+    return reviews, paginator.next_page
+
+
+@traced("load_more")
+def expand_load_more(driver, budget: Optional[PageBudget] = None) -> int:
+    """Click "load more" while `budget` has pages left, stopping when the DOM stops growing."""
+    clicks = 0
+    while budget and budget.remaining:
+        before = driver.execute_script(ELEMENT_COUNT_SCRIPT)
+        if not driver.execute_script(LOAD_MORE_SCRIPT):
+            break
+        mark_page_changed(driver)
+        wait_for_page_ready(driver, timeout=LOAD_MORE_TIMEOUT)
+        if driver.execute_script(ELEMENT_COUNT_SCRIPT) <= before:
+            break
+        budget.spend()
+        clicks += 1
+    if clicks:
+        logger.info(f"Expanded {clicks} load-more rounds")
+    return clicks
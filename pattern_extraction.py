@@ -0,0 +1,136 @@
+import re
+import logging
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+from pydantic import BaseModel
+
+from selector_matcher import SelectorMatcher, select_first_working
+from structured_logging import log_event
+from tracing import traced
+
+logger = logging.getLogger()
+
+class Review(BaseModel):
+    body: str
+    rating: Optional[float] = None
+    reviewer: Optional[str] = None
+    images: List[str] = []
+
+# Common selectors patterns
+REVIEW_SELECTORS = {
+    "review_containers": [
+        ".review-item",
+        "[class*=review]",
+        "[class*=Review]",
+        ".review-card",
+        ".review_container",
+        "#reviews-container [class*=review]",
+        "[data-review]",
+        "[itemtype*=Review]",
+        ".product-review"
+    ],
+    "review_text": [
+        ".review-content",
+        ".review-text",
+        ".review-body",
+        "[class*=reviewText]",
+        "[class*=review-content]",
+        "[class*=ReviewContent]",
+        ".review p",
+        "[itemprop=reviewBody]",
+        "[data-review-text]"
+    ],
+    "rating": [
+        "[class*=rating]",
+        "[class*=stars]",
+        "[class*=Rating]",
+        "[itemprop=ratingValue]",
+        "[data-rating]",
+        ".rating-score"
+    ],
+    "reviewer": [
+        "[class*=author]",
+        "[class*=reviewer]",
+        "[itemprop=author]",
+        ".review-username",
+        ".reviewer-name",
+        "[data-reviewer]"
+    ]
+}
+
+# Field selectors compiled once and matched in a single pass per review
+FIELD_MATCHER = SelectorMatcher({
+    "review_text": REVIEW_SELECTORS["review_text"],
+    "rating": REVIEW_SELECTORS["rating"],
+    "reviewer": REVIEW_SELECTORS["reviewer"]
+})
+
+def build_review(fields: Dict) -> Optional[Review]:
+    """Build a review from its field texts, whether matched in Python or in the page."""
+    # Extract review text
+    if not fields["review_text"]:
+        return None
+
+    # Extract rating
+    rating = None
+    if fields["rating"]:
+        rating_match = re.search(r'(\d+(?:\.\d+)?)', fields["rating"])
+        if rating_match:
+            rating = float(rating_match.group(1))
+            if rating > 5:  # Normalize to 5-star scale
+                rating = rating / 20 if rating <= 100 else 5
+
+    # Extract images
+    images = [
+        src for src in fields["images"]
+        if not any(skip in src for skip in ["avatar", "profile", "user"])
+    ]
+
+    return Review(
+        body=fields["review_text"],
+        rating=rating,
+        reviewer=fields["reviewer"],
+        images=images
+    )
+
+@traced("selector_match")
+def extract_reviews(soup: BeautifulSoup) -> List[Review]:
+    """Extract reviews using multiple selector patterns with detailed logging."""
+    reviews = []
+
+    # Find review containers in a single pass over the document
+    container_selector, review_elements = select_first_working(soup, REVIEW_SELECTORS["review_containers"])
+    if not container_selector:
+        logger.warning("No review containers found", extra={"event": "no_review_containers"})
+        return reviews
+
+    logger.debug(
+        "Found working selector: %s", container_selector,
+        extra={"event": "selector_hit", "selector": container_selector}
+    )
+    logger.info(
+        "Found %d potential review containers", len(review_elements),
+        extra={"event": "review_containers", "count": len(review_elements)}
+    )
+
+    for element in review_elements:
+        try:
+            matches = FIELD_MATCHER.match(element)
+            if not matches["review_text"]:
+                continue
+
+            fields = {field: match.get_text(strip=True) if match else None for field, match in matches.items()}
+            fields["images"] = [img["src"] for img in element.select("img[src]")]
+            review = build_review(fields)
+            if review is None:
+                continue
+            reviews.append(review)
+            # Serialized on the logging thread, and only for the sampled records
+            log_event(logger, logging.DEBUG, "Successfully extracted review", "review_extracted", review=review)
+
+        except Exception:
+            logger.error("Error extracting single review", exc_info=True, extra={"event": "review_error"})
+            continue
+
+    return reviews
@@ -0,0 +1,101 @@
+import os
+import time
+from typing import List, Optional
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from tracing import traced
+
+# Readiness configuration
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "15"))
+READINESS_QUIET_MS = int(os.getenv("READINESS_QUIET_MS", "500"))
+READINESS_POLL_INTERVAL = float(os.getenv("READINESS_POLL_INTERVAL", "0.1"))
+
+# Runs inside the page on every poll. The first call installs a MutationObserver
+# and remembers when the DOM and the resource timeline last changed; later calls
+# report which readiness strategy (if any) is satisfied.
+READINESS_SCRIPT = """
+const selectors = arguments[0];
+const quietMs = arguments[1];
+const now = performance.now();
+if (!window.__reviewReadiness) {
+    const state = {
+        lastMutation: now,
+        resourceCount: performance.getEntriesByType('resource').length,
+        lastResourceChange: now
+    };
+    new MutationObserver(() => { state.lastMutation = performance.now(); })
+        .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    window.__reviewReadiness = state;
+}
+const state = window.__reviewReadiness;
+for (const selector of selectors) {
+    try {
+        if (document.querySelector(selector)) {
+            return 'selector';
+        }
+    } catch (e) {
+        // Ignore selectors the browser can't parse
+    }
+}
+const resourceCount = performance.getEntriesByType('resource').length;
+if (resourceCount !== state.resourceCount) {
+    state.resourceCount = resourceCount;
+    state.lastResourceChange = now;
+}
+if (document.readyState === 'complete'
+        && now - state.lastMutation >= quietMs
+        && now - state.lastResourceChange >= quietMs) {
+    return 'quiescent';
+}
+return null;
+"""
+
+
+class ReadinessResult:
+    """Which strategy declared the page ready and how long it took."""
+
+    def __init__(self, strategy: str, waited: float):
+        self.strategy = strategy
+        self.waited = waited
+
+    def __repr__(self):
+        return f"ReadinessResult(strategy={self.strategy!r}, waited={self.waited:.2f}s)"
+
+
+@traced("readiness")
+def wait_for_page_ready(
+    driver,
+    selectors: Optional[List[str]] = None,
+    timeout: float = READINESS_TIMEOUT,
+    quiet_ms: int = READINESS_QUIET_MS
+) -> ReadinessResult:
+    """Block until review containers appear or the DOM and network go quiet.
+
+    Returns as soon as any of `selectors` matches, or once no mutations and no
+    new resource loads were seen for `quiet_ms`, and gives up after `timeout`.
+    """
+    selectors = selectors or []
+    start = time.monotonic()
+
+    def page_ready(d):
+        try:
+            return d.execute_script(READINESS_SCRIPT, selectors, quiet_ms)
+        except WebDriverException:
+            # Page is mid-navigation; try again on the next poll
+            return None
+
+    try:
+        strategy = WebDriverWait(driver, timeout, poll_frequency=READINESS_POLL_INTERVAL).until(page_ready)
+    except TimeoutException:
+        strategy = "timeout"
+
+    return ReadinessResult(strategy, time.monotonic() - start)
+
+
+def mark_page_changed(driver):
+    """Restart the quiet window, e.g. right after clicking something that loads content."""
+    driver.execute_script(
+        "if (window.__reviewReadiness) { window.__reviewReadiness.lastMutation = performance.now(); }"
+    )
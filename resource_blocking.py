@@ -0,0 +1,167 @@
+import os
+import json
+import random
+import logging
+import threading
+from fnmatch import fnmatch
+from typing import Dict, List, Optional
+
+from selector_cache import page_domain
+
+logger = logging.getLogger()
+
+# Resource blocking configuration
+RESOURCE_BLOCKING = os.getenv("RESOURCE_BLOCKING", "1") == "1"
+BLOCKED_RESOURCES = [
+    category.strip()
+    for category in os.getenv("BLOCKED_RESOURCES", "image,font,media,analytics").split(",")
+    if category.strip()
+]
+# Per-domain blocked categories, e.g. {"shop.example": ["font"], "fragile.example": []}
+RESOURCE_BLOCKING_OVERRIDES: Dict[str, List[str]] = json.loads(os.getenv("RESOURCE_BLOCKING_OVERRIDES", "{}"))
+# Share of pages loaded without blocking, as the baseline for the savings metrics;
+# off unless set while measuring, since control pages are slower and heavier
+RESOURCE_BLOCKING_CONTROL_RATE = float(os.getenv("RESOURCE_BLOCKING_CONTROL_RATE", "0"))
+
+
+def _extension_patterns(*extensions: str) -> List[str]:
+    # Only at the end of the path (before any query), so hosts like
+    # www.iconic.com or gifts.example never match
+    return [pattern for extension in extensions for pattern in (f"*://*/*.{extension}", f"*://*/*.{extension}?*")]
+
+
+# URL patterns (CDP Network.setBlockedURLs wildcards) for each blockable category
+CATEGORY_PATTERNS = {
+    "image": _extension_patterns("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"),
+    "font": _extension_patterns("woff", "woff2", "ttf", "otf", "eot"),
+    "media": _extension_patterns("mp4", "webm", "mp3", "m3u8", "mov"),
+    "stylesheet": _extension_patterns("css"),
+    "analytics": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*connect.facebook.net*",
+        "*hotjar.com*", "*segment.com*", "*mixpanel.com*", "*clarity.ms*", "*newrelic.com*", "*nr-data.net*"
+    ]
+}
+
+
+def resource_category(url: str) -> Optional[str]:
+    """The blockable category a request URL falls into, if any."""
+    url = url.lower()
+    for category, patterns in CATEGORY_PATTERNS.items():
+        if any(fnmatch(url, pattern) for pattern in patterns):
+            return category
+    return None
+
+
+def blocked_categories(url: str) -> List[str]:
+    """Categories to block for this page, honouring the most specific domain override."""
+    domain = page_domain(url)
+    matches = [
+        override for override in RESOURCE_BLOCKING_OVERRIDES
+        if domain == override or domain.endswith("." + override)
+    ]
+    if matches:
+        return RESOURCE_BLOCKING_OVERRIDES[max(matches, key=len)]
+    return BLOCKED_RESOURCES
+
+
+class BlockingProfile:
+    """What was blocked for one page load; `control` pages block nothing on purpose."""
+
+    def __init__(self, categories: List[str], control: bool = False):
+        self.categories = categories
+        self.control = control
+
+    @property
+    def patterns(self) -> List[str]:
+        return [pattern for category in self.categories for pattern in CATEGORY_PATTERNS.get(category, [])]
+
+
+def apply_blocking(driver, url: str) -> BlockingProfile:
+    """Install the URL blocklist for `url` on the driver before it navigates."""
+    categories = blocked_categories(url) if RESOURCE_BLOCKING else []
+    profile = BlockingProfile(categories)
+    if categories and random.random() < RESOURCE_BLOCKING_CONTROL_RATE:
+        profile = BlockingProfile([], control=True)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.patterns})
+    return profile
+
+
+class ResourceStats:
+    """Estimates bytes and load time saved by blocking, from the network log.
+
+    Bytes saved are blocked requests times the average size of requests of
+    the same category that did load (on control pages or unblocked
+    categories). Time saved compares average load time of blocked pages with
+    control pages.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages = {"blocked": 0, "control": 0}
+        self.load_seconds = {"blocked": 0.0, "control": 0.0}
+        self.blocked_requests: Dict[str, int] = {category: 0 for category in CATEGORY_PATTERNS}
+        self.loaded_requests: Dict[str, int] = {category: 0 for category in CATEGORY_PATTERNS}
+        self.loaded_bytes: Dict[str, int] = {category: 0 for category in CATEGORY_PATTERNS}
+
+    def record(self, profile: BlockingProfile, network_log: List[Dict], load_seconds: float):
+        """Account one page load from its DevTools network events."""
+        urls: Dict[str, str] = {}
+        blocked: Dict[str, int] = {}
+        loaded: Dict[str, List[int]] = {}
+        for message in network_log:
+            method, params = message.get("method"), message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                urls[params["requestId"]] = params["request"]["url"]
+                continue
+            category = resource_category(urls.get(params.get("requestId"), ""))
+            if category is None:
+                continue
+            if method == "Network.loadingFailed" and params.get("blockedReason"):
+                blocked[category] = blocked.get(category, 0) + 1
+            elif method == "Network.loadingFinished":
+                loaded.setdefault(category, []).append(int(params.get("encodedDataLength", 0)))
+
+        # Pages of domains with blocking switched off only feed the size averages
+        group = "control" if profile.control else "blocked" if profile.categories else None
+        with self._lock:
+            if group:
+                self.pages[group] += 1
+                self.load_seconds[group] += load_seconds
+            for category, count in blocked.items():
+                self.blocked_requests[category] += count
+            for category, sizes in loaded.items():
+                self.loaded_requests[category] += len(sizes)
+                self.loaded_bytes[category] += sum(sizes)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            categories = {}
+            bytes_saved = 0
+            for category in CATEGORY_PATTERNS:
+                average = self.loaded_bytes[category] / self.loaded_requests[category] if self.loaded_requests[category] else 0
+                saved = int(self.blocked_requests[category] * average)
+                bytes_saved += saved
+                categories[category] = {
+                    "blocked_requests": self.blocked_requests[category],
+                    "average_bytes": int(average),
+                    "bytes_saved": saved
+                }
+            blocked_pages = self.pages["blocked"]
+            average_load = {
+                group: self.load_seconds[group] / self.pages[group] if self.pages[group] else None
+                for group in self.pages
+            }
+            time_saved = None
+            if average_load["blocked"] is not None and average_load["control"] is not None:
+                time_saved = average_load["control"] - average_load["blocked"]
+            return {
+                "pages": dict(self.pages),
+                "categories": categories,
+                "bytes_saved_per_page": int(bytes_saved / blocked_pages) if blocked_pages else 0,
+                "average_load_seconds": average_load,
+                "seconds_saved_per_page": time_saved
+            }
+
+
+resource_stats = ResourceStats()
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+
+from static_fetcher import PageValidators, revalidate_static
+from tracing import span
+
+logger = logging.getLogger()
+
+# Response cache configuration
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", "3600"))
+RESPONSE_CACHE_MEMORY_BYTES = int(os.getenv("RESPONSE_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_DISK_BYTES = int(os.getenv("RESPONSE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+# Query parameters that never change what a page shows
+TRACKING_PARAMS = {"ref", "fbclid", "gclid", "msclkid"}
+
+
+def normalize_url(url: str) -> str:
+    """`url` with a lowercase scheme and host, sorted query and no tracking parameters or fragment."""
+    parsed = urlparse(url)
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if name not in TRACKING_PARAMS and not name.startswith("utm_")
+    )
+    return urlunparse((
+        parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or "/", parsed.params, urlencode(params), ""
+    ))
+
+
+def cache_key(url: str, page_limit: int, parser: Optional[str] = None) -> str:
+    return f"{normalize_url(url)} {page_limit} {parser or ''}"
+
+
+class CachedResponse:
+    """A serialized scrape response, when it was stored and how to revalidate it."""
+
+    def __init__(self, response: Dict, size: int, stored_at: float, validators: Optional[PageValidators]):
+        self.response = response
+        self.size = size
+        self.stored_at = stored_at
+        self.validators = validators
+
+
+class ResponseCache:
+    """Two-tier (LRU memory + SQLite) cache of whole `/api/reviews` responses.
+
+    Both tiers are bounded by the bytes of the serialized responses. Entries
+    are fresh for `ttl` seconds. For `stale_ttl` seconds after that they are
+    still served, while a background refresh brings them up to date. Older
+    entries are revalidated before being served. Responses served by the
+    static tier keep their first page's validators, so revalidation is a
+    conditional GET of that page. The first page stands in for the whole
+    product here, since new reviews show up there first. Browser-rendered
+    responses are scraped again.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        path: str = RESPONSE_CACHE_PATH,
+        ttl: float = RESPONSE_CACHE_TTL,
+        stale_ttl: float = RESPONSE_CACHE_STALE_TTL,
+        memory_bytes: int = RESPONSE_CACHE_MEMORY_BYTES,
+        disk_bytes: int = RESPONSE_CACHE_DISK_BYTES
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._memory_size = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fingerprint TEXT,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._db.commit()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_failures": 0
+        }
+
+    async def serve(
+        self,
+        url: str,
+        page_limit: int,
+        parser: Optional[str],
+        scrape: Callable[[], Awaitable],
+        refresh: bool = False
+    ) -> Dict:
+        """The cached response for this scrape, calling `scrape` only when needed.
+
+        With `refresh`, the cache is skipped but still updated.
+        """
+        key = cache_key(url, page_limit, parser)
+        entry = None if refresh else await run_in_threadpool(self.get, key)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age <= self.ttl:
+                self._count("hits")
+                return entry.response
+            if age <= self.ttl + self.stale_ttl:
+                self._count("stale_hits")
+                self._refresh_in_background(key, url, entry, scrape)
+                return entry.response
+            if await run_in_threadpool(self.revalidate, key, url, entry):
+                return entry.response
+
+        self._count("misses")
+        return await self._scrape(key, url, scrape)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            entry = self._load(key)
+            if entry is not None:
+                self._db.execute(
+                    "UPDATE response_cache SET last_used = ? WHERE namespace = ? AND key = ?",
+                    (time.time(), self.namespace, key)
+                )
+                self._db.commit()
+                self._remember(key, entry)
+            return entry
+
+    def put(self, key: str, response, validators: Optional[PageValidators] = None) -> Dict:
+        """Store a response, returning it as the JSON-ready dict that gets served."""
+        response = jsonable_encoder(response)
+        serialized = json.dumps(response)
+        now = time.time()
+        entry = CachedResponse(response, len(serialized), now, validators)
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.namespace, key, serialized, entry.size, now, now,
+                    validators.etag if validators else None,
+                    validators.last_modified if validators else None,
+                    validators.fingerprint if validators else None
+                )
+            )
+            self._evict_disk()
+            self._db.commit()
+        return response
+
+    def revalidate(self, key: str, url: str, entry: CachedResponse) -> bool:
+        """Whether the page behind `entry` is unchanged, renewing the entry if so."""
+        if entry.validators is None:
+            return False
+        validators = revalidate_static(url, entry.validators)
+        if validators is None:
+            return False
+        self.put(key, entry.response, validators)
+        self._count("revalidated")
+        logger.info(f"Revalidated cached response for {url}")
+        return True
+
+    def snapshot(self) -> Dict:
+        """Counters plus derived hit rate, for the stats endpoint."""
+        with self._lock:
+            served = self.stats["hits"] + self.stats["stale_hits"] + self.stats["revalidated"]
+            lookups = served + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": served / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "refreshing": len(self._refreshing)
+            }
+
+    async def _scrape(self, key: str, url: str, scrape: Callable[[], Awaitable]) -> Dict:
+        # Validators come back with the scrape, wherever it ran, but aren't served
+        response = jsonable_encoder(await scrape())
+        validators = PageValidators.from_dict(response.pop("validators", None))
+        return await run_in_threadpool(self.put, key, response, validators)
+
+    def _refresh_in_background(self, key: str, url: str, entry: CachedResponse, scrape: Callable[[], Awaitable]):
+        if key in self._refreshing:
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, url, entry, scrape))
+
+    async def _refresh(self, key: str, url: str, entry: CachedResponse, scrape: Callable[[], Awaitable]):
+        try:
+            with span("response_cache_refresh"):
+                if not await run_in_threadpool(self.revalidate, key, url, entry):
+                    await self._scrape(key, url, scrape)
+            self._count("refreshes")
+        except HTTPException as e:
+            self._count("refresh_failures")
+            logger.warning(f"Background refresh of {url} failed: {e.detail}")
+        except Exception as e:
+            self._count("refresh_failures")
+            logger.error(f"Background refresh of {url} failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _remember(self, key: str, entry: CachedResponse):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= previous.size
+        self._memory[key] = entry
+        self._memory_size += entry.size
+        while self._memory_size > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= evicted.size
+
+    def _load(self, key: str) -> Optional[CachedResponse]:
+        row = self._db.execute(
+            "SELECT response, size, stored_at, etag, last_modified, fingerprint FROM response_cache "
+            "WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        validators = PageValidators(row[3], row[4], row[5]) if row[5] else None
+        return CachedResponse(json.loads(row[0]), row[1], row[2], validators)
+
+    def _evict_disk(self):
+        # Keep the most recently used entries that fit in `disk_bytes`
+        self._db.execute(
+            "DELETE FROM response_cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total "
+            "FROM response_cache WHERE namespace = ?) WHERE total > ?)",
+            (self.namespace, self.namespace, self.disk_bytes)
+        )
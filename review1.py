@@ -1,247 +1,294 @@
 import os
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel, HttpUrl
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
-from groq import Groq
 import json
 import time
 import logging
 import re
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
 from urllib.parse import urljoin
+from browser_pool import BrowserPool, read_network_log
+from readiness import wait_for_page_ready
+from scrape_executor import ScrapeExecutor
+from selector_cache import SelectorCache, page_domain
+from static_fetcher import TIER_STATIC, claim_validators, fetch_static, fetch_tiered
+from pagination import Page, PageBudget, RenderedPage, expand_load_more, paginate
+from network_capture import capture_page_feed, review_feeds
+from resource_blocking import apply_blocking, resource_stats
+from review_stream import stream_pages, stream_response
+from review_store import ReviewStore, scrape_incremental
+from response_cache import RESPONSE_CACHE, ResponseCache
+from batch_jobs import BatchScheduler, add_batch_routes
+from job_queue import SCRAPE_WORKERS, JobClient, add_job_routes
+from html_parser import PARSER_PATTERN, parse_html
+from in_page_extraction import IN_PAGE_EXTRACTION, harvest_in_page, page_fingerprint_in_page
+from llm_gateway import LLMGateway, create_llm_backend, groq_api_key
+from llm_selectors import DEFAULT_SELECTORS, Review, SelectorExtractor, build_review
+from tracing import instrument_app, span
+from structured_logging import configure_logging, instrument_logging
 
 # Initialize FastAPI app
 app = FastAPI()
+instrument_app(app, "review1")
+instrument_logging(app)
+
+# Shared pool of warm headless Chrome instances
+browser_pool = BrowserPool()
+
+# Bounded executor for blocking scrape jobs
+scrape_executor = ScrapeExecutor()
+
+# Per-domain/template cache of LLM selectors
+selector_cache = SelectorCache(namespace="review1")
+
+# Every review seen per product, for incremental scrapes
+review_store = ReviewStore(namespace="review1")
+
+# Whole /api/reviews responses, answered without scraping while fresh
+response_cache = ResponseCache(namespace="review1")
+
+# With SCRAPE_WORKERS=1 scrapes run on scrape_worker.py processes and this one only serves HTTP
+job_client = JobClient("review1") if SCRAPE_WORKERS else None
+
+@app.on_event("startup")
+def start_scraper():
+    browser_pool.start()
+    batch_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scraper():
+    browser_pool.close()
+    scrape_executor.shutdown()
+    if job_client:
+        job_client.shutdown()
+    batch_scheduler.close()
+    llm_gateway.close()
 
 # Groq API Configuration
 
-GROQ_API_KEY = "g######J###X######hnPakkSHWGd#####9xf6fgW##0WpyjJ2qw"
+GROQ_API_KEY = groq_api_key("g######J###X######hnPakkSHWGd#####9xf6fgW##0WpyjJ2qw")
+
+# Coalesced, rate-limited LLM calls (LLM_BACKEND=stub for offline runs)
+llm_gateway = LLMGateway(create_llm_backend(GROQ_API_KEY))
 
-client = Groq(api_key=GROQ_API_KEY)
+# Selectors from the cache, the LLM or the defaults, matched against each page
+selector_extractor = SelectorExtractor(llm_gateway, selector_cache)
 
 # Logging configuration
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+configure_logging("review1", "INFO")
 logger = logging.getLogger()
 
 # Response models
-class Review(BaseModel):
-    body: str
-    rating: Optional[float] = None
-    reviewer: Optional[str] = None
-    images: List[str] = []
-
 class ReviewResponse(BaseModel):
     reviews_count: int
     reviews: List[Review]
     next_page: Optional[str] = None
+    tier: Optional[str] = None
+    cursor: Optional[int] = None
+    # Static-tier validators for the response cache; never served
+    validators: Optional[Dict] = None
 
-# Default selectors as fallback
-DEFAULT_SELECTORS = {
-    "review_item": [
-        ".review",
-        "[class*=review]",
-        "[class*=Review]",
-        ".product-review",
-        ".comment",
-        "[data-review]"
-    ],
-    "body": [
-        ".review-content",
-        ".review-text",
-        ".review-body",
-        "p",
-        "[class*=review-content]",
-        "[class*=ReviewText]"
-    ],
-    "rating": [
-        ".rating",
-        ".stars",
-        "[class*=rating]",
-        "[class*=stars]",
-        "[data-rating]"
-    ],
-    "reviewer": [
-        ".reviewer-name",
-        ".author",
-        ".username",
-        "[class*=author]",
-        "[class*=reviewer]"
-    ]
-}
-
-def extract_json_from_llm_response(text: str) -> Dict:
-    """Extract JSON from LLM response even if it's wrapped in text."""
-    try:
-        # Try to find JSON-like structure in the text
-        json_match = re.search(r'\{[^{}]*\}', text)
-        if json_match:
-            return json.loads(json_match.group(0))
-        return {}
-    except Exception as e:
-        logger.error(f"Error extracting JSON from LLM response: {e}")
-        return {}
-
-def get_llm_selectors(html_content: str) -> dict:
-    """Get CSS selectors using LLM with improved error handling."""
-    try:
-        prompt = """
-        Analyze this HTML and return ONLY a JSON object with CSS selectors for reviews.
-        Format:
-        {
-            "review_item": "CSS selector for individual review container",
-            "body": "CSS selector for review text",
-            "rating": "CSS selector for rating",
-            "reviewer": "CSS selector for reviewer name"
-        }
-        """
+def render_page(url: str, budget: Optional[PageBudget] = None) -> Page:
+    """Load a page in a pooled browser and return the rendered HTML, or the reviews extracted in it."""
+    with browser_pool.session() as driver:
+        # Skip images, fonts, media and trackers the extractors never look at
+        blocking = apply_blocking(driver, url)
+        start = time.monotonic()
+        with span("navigate"):
+            driver.get(url)
         
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": f"HTML: {html_content[:3000]}"}
-            ],
-            stream=False,
-            max_tokens=1024
-        )
+        # Wait until review containers render or the page settles
+        readiness = wait_for_page_ready(driver, DEFAULT_SELECTORS["review_item"])
+        logger.info(f"Page ready via {readiness.strategy} after {readiness.waited:.2f}s: {url}")
+        network_log = read_network_log(driver)
+        resource_stats.record(blocking, network_log, time.monotonic() - start)
         
-        # Try to extract JSON from response
-        selectors = extract_json_from_llm_response(response.choices[0].message.content)
+        # Each "load more" click or infinite-scroll round spends a page of the budget,
+        # unless a captured review JSON feed makes them unnecessary
+        if capture_page_feed(driver, url, network_log) is not None:
+            budget = None
         
-        if not selectors:
-            logger.warning("Using default selectors as fallback")
-            return DEFAULT_SELECTORS
-            
-        return selectors
-    except Exception as e:
-        logger.error(f"Error getting LLM selectors: {e}")
-        return DEFAULT_SELECTORS
-
-def find_working_selector(soup: BeautifulSoup, selectors: List[str]) -> Optional[str]:
-    """Try multiple selectors and return the first one that works."""
-    for selector in selectors:
-        try:
-            elements = soup.select(selector)
-            if elements:
-                return selector
-        except Exception:
-            continue
-    return None
-
-def extract_review_data(review_element: BeautifulSoup, selectors: dict) -> Optional[Review]:
-    """Extract data for a single review with improved error handling."""
-    try:
-        # Get review body
-        body_selector = find_working_selector(review_element, selectors["body"])
-        if not body_selector:
-            return None
-            
-        body_element = review_element.select_one(body_selector)
-        if not body_element:
-            return None
-            
-        body = body_element.get_text(strip=True)
-        if not body:
-            return None
-
-        # Get rating (optional)
-        rating = None
-        rating_selector = find_working_selector(review_element, selectors["rating"])
-        if rating_selector:
-            rating_element = review_element.select_one(rating_selector)
-            if rating_element:
-                rating_text = rating_element.get_text(strip=True)
-                # Try to extract number from text
-                rating_match = re.search(r'(\d+(?:\.\d+)?)', rating_text)
-                if rating_match:
-                    rating = float(rating_match.group(1))
-
-        # Get reviewer name (optional)
-        reviewer = None
-        reviewer_selector = find_working_selector(review_element, selectors["reviewer"])
-        if reviewer_selector:
-            reviewer_element = review_element.select_one(reviewer_selector)
-            if reviewer_element:
-                reviewer = reviewer_element.get_text(strip=True)
-
-        # Get images
-        images = [img["src"] for img in review_element.select("img[src]")]
-
-        return Review(
-            body=body,
-            rating=rating,
-            reviewer=reviewer,
-            images=images
-        )
-    except Exception as e:
-        logger.error(f"Error extracting review data: {e}")
+        # With selectors cached for this template, harvest in the page and skip the full HTML
+        if IN_PAGE_EXTRACTION:
+            extracted = extract_cached_in_page(driver, url, budget)
+            if extracted is not None:
+                return extracted
+        
+        expand_load_more(driver, budget)
+        with span("page_source"):
+            return driver.page_source
+
+def extract_cached_in_page(driver, url: str, budget: Optional[PageBudget] = None) -> Optional[RenderedPage]:
+    """Harvest reviews inside the browser using the template's cached selectors.
+
+    Returns None when nothing usable is cached, since asking the LLM needs the
+    page's HTML, or when the cached selectors no longer find reviews.
+    """
+    domain = page_domain(url)
+    fingerprint = page_fingerprint_in_page(driver)
+    # Checked first so pages without cached selectors don't count as cache misses twice
+    if not fingerprint or not selector_cache.contains(domain, fingerprint):
+        return None
+    selectors = selector_cache.get(domain, fingerprint)
+    if not selectors:
         return None
+    
+    result = harvest_in_page(
+        driver,
+        selectors["review_item"],
+        {field: selectors[field] for field in ("body", "rating", "reviewer")},
+        budget
+    )
+    if result is None:
+        return None
+    if result.container is None:
+        selector_cache.invalidate(domain, fingerprint)
+        return None
+    reviews = [review for review in map(build_review, result.fields) if review]
+    return RenderedPage(reviews, result.next_link)
+
+def extract_page_reviews(url: str, html_content: Page, parser: Optional[str] = None) -> List[Review]:
+    """Extract every review on one page of HTML."""
+    # Already extracted in the browser
+    if isinstance(html_content, RenderedPage):
+        return html_content.reviews
+    return selector_extractor.select_page_reviews(url, html_content, parse_html(html_content, parser))
 
-async def fetch_reviews(url: str, page_limit: int = 5) -> ReviewResponse:
+def scrape_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> ReviewResponse:
     """Fetch reviews with improved error handling and fallback mechanisms."""
-    all_reviews = []
-    
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        driver.get(url)
-        time.sleep(5)  # Wait for page load
+        def extract(html_content: Page) -> List[Review]:
+            return extract_page_reviews(url, html_content, parser)
         
-        # Get HTML and selectors
-        html_content = driver.page_source
-        soup = BeautifulSoup(html_content, "html.parser")
+        # The first page, its load-more rounds and every page followed share page_limit
+        budget = PageBudget(page_limit)
+
+        def render(page_url: str) -> Page:
+            return render_page(page_url, budget)
         
-        # Get selectors from LLM or use defaults
-        selectors = get_llm_selectors(html_content)
+        # Newest first, stopping at reviews already stored, returning only new ones
+        if incremental:
+            result = scrape_incremental(review_store, url, budget, extract, render, render_next=render_page)
+            return ReviewResponse(
+                reviews_count=len(result.reviews),
+                reviews=result.reviews,
+                next_page=result.next_page,
+                tier=result.tier,
+                cursor=result.cursor
+            )
         
-        # Find working review item selector
-        review_item_selector = find_working_selector(soup, selectors["review_item"])
-        if not review_item_selector:
-            raise HTTPException(status_code=404, detail="No reviews found on page")
-            
-        # Extract reviews
-        for review_element in soup.select(review_item_selector):
-            review_data = extract_review_data(review_element, selectors)
-            if review_data:
-                all_reviews.append(review_data)
+        # Plain HTTP first, headless Chrome only when the static page has no reviews
+        first_reviews, tier, html_content = fetch_tiered(url, extract, render)
+        
+        # Follow pagination with whichever tier served the first page
+        fetch_html = fetch_static if tier == TIER_STATIC else render_page
+        all_reviews, next_page = paginate(
+            url, html_content, first_reviews, budget, fetch_html, extract, review_feeds.pop(url)
+        )
         
         if not all_reviews:
             raise HTTPException(status_code=404, detail="No valid reviews found on page")
             
+        review_store.add(url, all_reviews)
         return ReviewResponse(
             reviews_count=len(all_reviews),
-            reviews=all_reviews
+            reviews=all_reviews,
+            next_page=next_page,
+            tier=tier,
+            validators=claim_validators(url, tier),
+            cursor=review_store.cursor(url)
         )
-            
+
+    except HTTPException as e:
+        raise e
+
     except Exception as e:
         logger.error(f"Error in fetch_reviews: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if 'driver' in locals():
-            driver.quit()
 
-@app.get("/api/reviews", response_model=ReviewResponse)
+def stream_reviews(url: str, page_limit: int, parser: Optional[str], emit: Callable[[Dict], None]):
+    """Scrape like scrape_reviews but emit each review as soon as it is extracted."""
+    budget = PageBudget(page_limit)
+    stream_pages(
+        url,
+        budget,
+        lambda html_content: extract_page_reviews(url, html_content, parser),
+        lambda page_url: render_page(page_url, budget),
+        emit,
+        render_next=render_page
+    )
+
+async def fetch_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> ReviewResponse:
+    """Run the blocking scrape on a worker process, or on the bounded executor so the event loop stays free."""
+    if job_client:
+        return await job_client.run(url, page_limit, parser, incremental)
+    return await scrape_executor.run(scrape_reviews, url, page_limit, parser, incremental)
+
+# Batch jobs, scheduled per domain with adaptive concurrency
+batch_scheduler = BatchScheduler(job_client.scrape if job_client else scrape_reviews)
+add_batch_routes(app, batch_scheduler)
+if job_client:
+    add_job_routes(app, job_client)
+
+@app.get("/api/reviews", response_model=ReviewResponse, response_model_exclude={"validators"})
 async def get_reviews(
     page: HttpUrl = Query(..., description="URL of the product page to scrape reviews from"),
-    page_limit: int = Query(5, description="Maximum number of pages to scrape")
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)"),
+    incremental: bool = Query(False, description="Only return reviews not seen by earlier scrapes, newest first"),
+    fresh: bool = Query(False, description="Scrape now instead of answering from the response cache")
 ):
     """Extract reviews from a given product page URL."""
     try:
-        reviews_data = await fetch_reviews(str(page), page_limit)
-        return reviews_data
+        url = str(page)
+        # Incremental scrapes depend on what earlier scrapes stored, so never cache them
+        if incremental or not RESPONSE_CACHE:
+            return await fetch_reviews(url, page_limit, parser, incremental)
+        return await response_cache.serve(
+            url, page_limit, parser, lambda: fetch_reviews(url, page_limit, parser), refresh=fresh
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"API Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/reviews/stream")
+async def stream_reviews_endpoint(
+    page: HttpUrl = Query(..., description="URL of the product page to scrape reviews from"),
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    format: str = Query("ndjson", regex="^(ndjson|sse)$", description="Stream as NDJSON or server-sent events"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)")
+):
+    """Stream reviews as they are extracted, with page events and a final summary."""
+    return stream_response(scrape_executor, stream_reviews, str(page), page_limit, parser, stream_format=format)
+
+@app.get("/api/reviews/changes", response_model=ReviewResponse, response_model_exclude={"validators"})
+async def get_review_changes(
+    page: HttpUrl = Query(..., description="URL of the product page whose stored reviews to return"),
+    cursor: int = Query(0, description="Cursor from an earlier response; only reviews stored after it are returned")
+):
+    """Reviews stored for a product since `cursor`, without scraping."""
+    reviews, cursor = review_store.changes(str(page), cursor)
+    return ReviewResponse(reviews_count=len(reviews), reviews=reviews, cursor=cursor)
+
+@app.get("/api/selector-cache")
+async def get_selector_cache_stats():
+    """Selector cache hit rate and the LLM time it has saved."""
+    return selector_cache.snapshot()
+
+@app.get("/api/response-cache")
+async def get_response_cache_stats():
+    """Response cache hits, stale answers, revalidations and background refreshes."""
+    return response_cache.snapshot()
+
+@app.get("/api/resource-blocking")
+async def get_resource_blocking_stats():
+    """Requests blocked while rendering and the bytes and time saved per page."""
+    return resource_stats.snapshot()
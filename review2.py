@@ -3,103 +3,69 @@ from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel, HttpUrl
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 from groq import Groq
 import json
 import time
 import logging
 import re
 import traceback
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
+from browser_pool import BrowserPool, build_chrome_options, get_driver_path, read_network_log
+from readiness import wait_for_page_ready
+from scrape_executor import ScrapeExecutor
+from static_fetcher import TIER_STATIC, claim_validators, fetch_static, fetch_tiered
+from pagination import Page, PageBudget, RenderedPage, expand_load_more, paginate
+from network_capture import capture_page_feed, review_feeds
+from resource_blocking import apply_blocking, resource_stats
+from review_stream import stream_pages, stream_response
+from review_store import ReviewStore, scrape_incremental
+from response_cache import RESPONSE_CACHE, ResponseCache
+from batch_jobs import BatchScheduler, add_batch_routes
+from job_queue import SCRAPE_WORKERS, JobClient, add_job_routes
+from html_parser import PARSER_PATTERN, parse_html, resolve_backend
+from in_page_extraction import IN_PAGE_EXTRACTION, harvest_in_page
+from tracing import instrument_app, span
+from structured_logging import configure_logging, instrument_logging
+from pattern_extraction import REVIEW_SELECTORS, Review, build_review, extract_reviews
 
 # Initialize FastAPI app
 app = FastAPI()
+instrument_app(app, "review2")
+instrument_logging(app)
 
-# Configure detailed logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('review_scraper.log')
-    ]
-)
+# Configure detailed logging, written off the request threads
+configure_logging("review2", "DEBUG", log_file="review_scraper.log")
 logger = logging.getLogger()
 
 # Response models
-class Review(BaseModel):
-    body: str
-    rating: Optional[float] = None
-    reviewer: Optional[str] = None
-    images: List[str] = []
-
 class ReviewResponse(BaseModel):
     reviews_count: int
     reviews: List[Review]
     next_page: Optional[str] = None
-
-# Common selectors patterns
-REVIEW_SELECTORS = {
-    "review_containers": [
-        ".review-item",
-        "[class*=review]",
-        "[class*=Review]",
-        ".review-card",
-        ".review_container",
-        "#reviews-container [class*=review]",
-        "[data-review]",
-        "[itemtype*=Review]",
-        ".product-review"
-    ],
-    "review_text": [
-        ".review-content",
-        ".review-text",
-        ".review-body",
-        "[class*=reviewText]",
-        "[class*=review-content]",
-        "[class*=ReviewContent]",
-        ".review p",
-        "[itemprop=reviewBody]",
-        "[data-review-text]"
-    ],
-    "rating": [
-        "[class*=rating]",
-        "[class*=stars]",
-        "[class*=Rating]",
-        "[itemprop=ratingValue]",
-        "[data-rating]",
-        ".rating-score"
-    ],
-    "reviewer": [
-        "[class*=author]",
-        "[class*=reviewer]",
-        "[itemprop=author]",
-        ".review-username",
-        ".reviewer-name",
-        "[data-reviewer]"
-    ]
-}
+    tier: Optional[str] = None
+    cursor: Optional[int] = None
+    # Static-tier validators for the response cache; never served
+    validators: Optional[Dict] = None
 
 def setup_webdriver():
     """Setup and return configured Chrome WebDriver with detailed error handling."""
     try:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--disable-notifications")
+        chrome_options = build_chrome_options([
+            "--headless",
+            "--disable-gpu",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--window-size=1920,1080",
+            "--disable-notifications"
+        ])
         
         logger.debug("Setting up Chrome WebDriver...")
         driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
+            service=Service(get_driver_path()),
             options=chrome_options
         )
         logger.debug("WebDriver setup successful")
@@ -109,117 +75,130 @@ def setup_webdriver():
         logger.error(traceback.format_exc())
         raise
 
-def find_first_working_selector(soup: BeautifulSoup, selector_list: List[str]) -> Optional[str]:
-    """Try multiple selectors and return the first one that finds elements."""
-    for selector in selector_list:
-        try:
-            elements = soup.select(selector)
-            if elements:
-                logger.debug(f"Found working selector: {selector}")
-                return selector
-        except Exception as e:
-            logger.debug(f"Selector {selector} failed: {str(e)}")
-    logger.warning("No working selector found")
-    return None
+# Shared pool of warm browsers built by setup_webdriver
+browser_pool = BrowserPool(factory=setup_webdriver)
 
-def extract_reviews(soup: BeautifulSoup) -> List[Review]:
-    """Extract reviews using multiple selector patterns with detailed logging."""
-    reviews = []
-    
-    # Find review containers
-    container_selector = find_first_working_selector(soup, REVIEW_SELECTORS["review_containers"])
-    if not container_selector:
-        logger.warning("No review containers found")
-        return reviews
+# Bounded executor for blocking scrape jobs
+scrape_executor = ScrapeExecutor()
 
-    review_elements = soup.select(container_selector)
-    logger.info(f"Found {len(review_elements)} potential review containers")
+# Every review seen per product, for incremental scrapes
+review_store = ReviewStore(namespace="review2")
 
-    for element in review_elements:
-        try:
-            # Extract review text
-            text_selector = find_first_working_selector(element, REVIEW_SELECTORS["review_text"])
-            if not text_selector:
-                continue
-            
-            review_text = element.select_one(text_selector)
-            if not review_text or not review_text.get_text(strip=True):
-                continue
+# Whole /api/reviews responses, answered without scraping while fresh
+response_cache = ResponseCache(namespace="review2")
 
-            # Extract rating
-            rating = None
-            rating_selector = find_first_working_selector(element, REVIEW_SELECTORS["rating"])
-            if rating_selector:
-                rating_element = element.select_one(rating_selector)
-                if rating_element:
-                    rating_text = rating_element.get_text(strip=True)
-                    rating_match = re.search(r'(\d+(?:\.\d+)?)', rating_text)
-                    if rating_match:
-                        rating = float(rating_match.group(1))
-                        if rating > 5:  # Normalize to 5-star scale
-                            rating = rating / 20 if rating <= 100 else 5
+# With SCRAPE_WORKERS=1 scrapes run on scrape_worker.py processes and this one only serves HTTP
+job_client = JobClient("review2") if SCRAPE_WORKERS else None
 
-            # Extract reviewer name
-            reviewer = None
-            reviewer_selector = find_first_working_selector(element, REVIEW_SELECTORS["reviewer"])
-            if reviewer_selector:
-                reviewer_element = element.select_one(reviewer_selector)
-                if reviewer_element:
-                    reviewer = reviewer_element.get_text(strip=True)
+@app.on_event("startup")
+def start_scraper():
+    browser_pool.start()
+    batch_scheduler.start()
 
-            # Extract images
-            images = [
-                img["src"] for img in element.select("img[src]")
-                if not any(skip in img.get("src", "") for skip in ["avatar", "profile", "user"])
-            ]
+@app.on_event("shutdown")
+def stop_scraper():
+    browser_pool.close()
+    scrape_executor.shutdown()
+    if job_client:
+        job_client.shutdown()
+    batch_scheduler.close()
 
-            review = Review(
-                body=review_text.get_text(strip=True),
-                rating=rating,
-                reviewer=reviewer,
-                images=images
-            )
-            reviews.append(review)
-            logger.debug(f"Successfully extracted review: {review.dict()}")
-
-        except Exception as e:
-            logger.error(f"Error extracting single review: {str(e)}")
-            logger.error(traceback.format_exc())
-            continue
+def render_page(url: str, budget: Optional[PageBudget] = None) -> Page:
+    """Load a page in a pooled browser and return the rendered HTML, or the reviews extracted in it."""
+    with browser_pool.session() as driver:
+        # Skip images, fonts, media and trackers the extractors never look at
+        blocking = apply_blocking(driver, url)
+        start = time.monotonic()
+        logger.debug("Loading page...")
+        with span("navigate"):
+            driver.get(url)
+        
+        # Wait until review containers render or the page settles
+        readiness = wait_for_page_ready(driver, REVIEW_SELECTORS["review_containers"])
+        logger.info(f"Page ready via {readiness.strategy} after {readiness.waited:.2f}s: {url}")
+        network_log = read_network_log(driver)
+        resource_stats.record(blocking, network_log, time.monotonic() - start)
+        
+        # Each "load more" click or infinite-scroll round spends a page of the budget,
+        # unless a captured review JSON feed makes them unnecessary
+        if capture_page_feed(driver, url, network_log) is not None:
+            budget = None
+        
+        # Match REVIEW_SELECTORS inside the page and fetch only the review fields,
+        # harvesting just the reviews each round inserts
+        if IN_PAGE_EXTRACTION:
+            result = harvest_in_page(driver, REVIEW_SELECTORS["review_containers"], {
+                "review_text": REVIEW_SELECTORS["review_text"],
+                "rating": REVIEW_SELECTORS["rating"],
+                "reviewer": REVIEW_SELECTORS["reviewer"]
+            }, budget)
+            if result is not None:
+                reviews = [review for review in map(build_review, result.fields) if review]
+                return RenderedPage(reviews, result.next_link)
+        
+        expand_load_more(driver, budget)
+        with span("page_source"):
+            return driver.page_source
 
-    return reviews
+def parse_and_extract_reviews(html_content: Page, parser: Optional[str] = None) -> List[Review]:
+    """Parse raw HTML and extract its reviews."""
+    # Already extracted in the browser
+    if isinstance(html_content, RenderedPage):
+        return html_content.reviews
+    soup = parse_html(html_content, parser)
+    logger.debug(f"HTML parsed successfully with {resolve_backend(parser)}")
+    return extract_reviews(soup)
 
-async def fetch_reviews(url: str, page_limit: int = 5) -> ReviewResponse:
+def scrape_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> ReviewResponse:
     """Fetch reviews with comprehensive error handling and logging."""
-    driver = None
     try:
         logger.info(f"Starting review extraction for URL: {url}")
         
-        driver = setup_webdriver()
-        logger.debug("Loading page...")
-        driver.get(url)
+        def extract(html_content: Page) -> List[Review]:
+            return parse_and_extract_reviews(html_content, parser)
         
-        # Wait for page load
-        time.sleep(5)
-        logger.debug("Page loaded")
+        # The first page, its load-more rounds and every page followed share page_limit
+        budget = PageBudget(page_limit)
+
+        def render(page_url: str) -> Page:
+            return render_page(page_url, budget)
         
-        # Get page content
-        html_content = driver.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
-        logger.debug("HTML parsed successfully")
+        # Newest first, stopping at reviews already stored, returning only new ones
+        if incremental:
+            result = scrape_incremental(review_store, url, budget, extract, render, render_next=render_page)
+            logger.info(f"Incremental scrape found {len(result.reviews)} new reviews in {result.pages} pages")
+            return ReviewResponse(
+                reviews_count=len(result.reviews),
+                reviews=result.reviews,
+                next_page=result.next_page,
+                tier=result.tier,
+                cursor=result.cursor
+            )
         
-        # Extract reviews
-        reviews = extract_reviews(soup)
+        # Plain HTTP first, headless Chrome only when the static page has no reviews
+        first_reviews, tier, html_content = fetch_tiered(url, extract, render)
+        logger.info(f"Page served by the {tier} tier")
+        
+        # Follow pagination with whichever tier served the first page
+        fetch_html = fetch_static if tier == TIER_STATIC else render_page
+        reviews, next_page = paginate(
+            url, html_content, first_reviews, budget, fetch_html, extract, review_feeds.pop(url)
+        )
         
         if not reviews:
             logger.warning("No reviews found on page")
             raise HTTPException(status_code=404, detail="No reviews found on page")
         
         logger.info(f"Successfully extracted {len(reviews)} reviews")
+        new_reviews = review_store.add(url, reviews)
+        logger.info(f"{len(new_reviews)} reviews were not in the review store yet")
         return ReviewResponse(
             reviews_count=len(reviews),
             reviews=reviews,
-            next_page=None  # Pagination handling can be added here
+            next_page=next_page,
+            tier=tier,
+            validators=claim_validators(url, tier),
+            cursor=review_store.cursor(url)
         )
 
     except WebDriverException as e:
@@ -234,25 +213,83 @@ async def fetch_reviews(url: str, page_limit: int = 5) -> ReviewResponse:
         logger.error(f"Unexpected error: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-    
-    finally:
-        if driver:
-            logger.debug("Closing WebDriver")
-            driver.quit()
 
-@app.get("/api/reviews", response_model=ReviewResponse)
+def stream_reviews(url: str, page_limit: int, parser: Optional[str], emit: Callable[[Dict], None]):
+    """Scrape like scrape_reviews but emit each review as soon as it is extracted."""
+    logger.info(f"Starting streaming review extraction for URL: {url}")
+    budget = PageBudget(page_limit)
+    stream_pages(
+        url,
+        budget,
+        lambda html_content: parse_and_extract_reviews(html_content, parser),
+        lambda page_url: render_page(page_url, budget),
+        emit,
+        render_next=render_page
+    )
+
+async def fetch_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> ReviewResponse:
+    """Run the blocking scrape on a worker process, or on the bounded executor so the event loop stays free."""
+    if job_client:
+        return await job_client.run(url, page_limit, parser, incremental)
+    return await scrape_executor.run(scrape_reviews, url, page_limit, parser, incremental)
+
+# Batch jobs, scheduled per domain with adaptive concurrency
+batch_scheduler = BatchScheduler(job_client.scrape if job_client else scrape_reviews)
+add_batch_routes(app, batch_scheduler)
+if job_client:
+    add_job_routes(app, job_client)
+
+@app.get("/api/reviews", response_model=ReviewResponse, response_model_exclude={"validators"})
 async def get_reviews(
     page: HttpUrl = Query(..., description="URL of the product page to scrape reviews from"),
-    page_limit: int = Query(5, description="Maximum number of pages to scrape")
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)"),
+    incremental: bool = Query(False, description="Only return reviews not seen by earlier scrapes, newest first"),
+    fresh: bool = Query(False, description="Scrape now instead of answering from the response cache")
 ):
     """API endpoint to extract reviews from a given URL."""
     try:
         logger.info(f"Received request for URL: {page}")
-        reviews_data = await fetch_reviews(str(page), page_limit)
-        return reviews_data
+        url = str(page)
+        # Incremental scrapes depend on what earlier scrapes stored, so never cache them
+        if incremental or not RESPONSE_CACHE:
+            return await fetch_reviews(url, page_limit, parser, incremental)
+        return await response_cache.serve(
+            url, page_limit, parser, lambda: fetch_reviews(url, page_limit, parser), refresh=fresh
+        )
     except HTTPException as e:
         raise e
     except Exception as e:
         logger.error(f"API Error: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/reviews/stream")
+async def stream_reviews_endpoint(
+    page: HttpUrl = Query(..., description="URL of the product page to scrape reviews from"),
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    format: str = Query("ndjson", regex="^(ndjson|sse)$", description="Stream as NDJSON or server-sent events"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)")
+):
+    """API endpoint to stream reviews as they are extracted, ending with a summary record."""
+    logger.info(f"Received streaming request for URL: {page}")
+    return stream_response(scrape_executor, stream_reviews, str(page), page_limit, parser, stream_format=format)
+
+@app.get("/api/reviews/changes", response_model=ReviewResponse, response_model_exclude={"validators"})
+async def get_review_changes(
+    page: HttpUrl = Query(..., description="URL of the product page whose stored reviews to return"),
+    cursor: int = Query(0, description="Cursor from an earlier response; only reviews stored after it are returned")
+):
+    """API endpoint returning reviews stored for a product since `cursor`, without scraping."""
+    reviews, cursor = review_store.changes(str(page), cursor)
+    return ReviewResponse(reviews_count=len(reviews), reviews=reviews, cursor=cursor)
+
+@app.get("/api/response-cache")
+async def get_response_cache_stats():
+    """API endpoint reporting response cache hits, stale answers, revalidations and refreshes."""
+    return response_cache.snapshot()
+
+@app.get("/api/resource-blocking")
+async def get_resource_blocking_stats():
+    """API endpoint reporting requests blocked while rendering and the bytes and time saved."""
+    return resource_stats.snapshot()
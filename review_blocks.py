@@ -0,0 +1,334 @@
+import os
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
+
+from dom_condenser import DROP_TAGS, REVIEW_SIGNAL
+from tracing import traced
+
+logger = logging.getLogger()
+
+# Detector configuration
+BLOCK_MIN_REPEATS = int(os.getenv("BLOCK_MIN_REPEATS", "3"))
+BLOCK_MIN_TEXT_CHARS = int(os.getenv("BLOCK_MIN_TEXT_CHARS", "30"))
+
+# Share of blocks a child path must appear in to be considered a field
+FIELD_MIN_SUPPORT = 0.5
+# Blocks looked at to infer field paths; the rest are only read
+FIELD_SAMPLE = 50
+# Per-block text beyond this adds nothing to a group's score
+MAX_SCORED_TEXT = 500
+
+# Hash or index suffixes that differ between otherwise identical blocks
+# ("sc-3x", "ReviewCard__Root-a2", "review-17")
+CLASS_SUFFIX = re.compile(r"[-_]?[a-z]{0,2}\d[\w-]*$")
+NAME_SIGNAL = re.compile(r"author|reviewer|user|customer|nickname|name|by\b", re.I)
+RATING_SIGNAL = re.compile(r"rating|stars?\b|score", re.I)
+TITLE_SIGNAL = re.compile(r"title|headline|summary|subject", re.I)
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "strong", "b"}
+RATING_ATTRIBUTES = ["data-rating", "data-score", "aria-label", "title", "content", "data-value"]
+RATING_TEXT = re.compile(r"^\D{0,20}?(\d(?:[.,]\d+)?)\s*(?:/\s*5|out of 5|stars?|★)?\D{0,20}$", re.I)
+PERCENT_TEXT = re.compile(r"^(\d{1,3})\s*%$")
+SKIP_IMAGE = re.compile(r"avatar|profile|user|icon|star", re.I)
+
+
+def _class_stems(element: Tag) -> Tuple[str, ...]:
+    classes = element.attrs.get("class")
+    if not classes:
+        return ()
+    return tuple(sorted({CLASS_SUFFIX.sub("", name) or name for name in classes}))
+
+
+def _block_key(element: Tag) -> Tuple:
+    """Siblings with the same key are treated as repeats of one block."""
+    return (element.name, _class_stems(element))
+
+
+def _own_text(element: Tag) -> str:
+    parts = [
+        child for child in element.children
+        if isinstance(child, NavigableString) and not isinstance(child, PreformattedString)
+    ]
+    return " ".join(" ".join(parts).split())
+
+
+def _has_signal(element: Tag) -> bool:
+    for name, value in element.attrs.items():
+        if name in ("class", "id", "itemprop") or name.startswith("data-"):
+            if REVIEW_SIGNAL.search(" ".join(value) if isinstance(value, list) else str(value)):
+                return True
+    return False
+
+
+def _signal_text(element: Tag) -> str:
+    values = []
+    for name, value in element.attrs.items():
+        if name in ("class", "id", "itemprop") or name.startswith("data-"):
+            values.append(" ".join(value) if isinstance(value, list) else str(value))
+    return " ".join(values)
+
+
+def parse_rating(element: Tag) -> Optional[float]:
+    """A 0-5 rating from an element's rating attributes or its text."""
+    candidates = [element.get(attr) for attr in RATING_ATTRIBUTES] + [_own_text(element)]
+    for value in candidates:
+        if not isinstance(value, str) or not value.strip():
+            continue
+        value = value.strip()
+        percent = PERCENT_TEXT.match(value)
+        if percent:
+            return min(5.0, int(percent.group(1)) / 20)
+        match = RATING_TEXT.match(value)
+        if match:
+            rating = float(match.group(1).replace(",", "."))
+            if 0 <= rating <= 5:
+                return rating
+    return None
+
+
+def _group_score(blocks: List[Tag], text_lengths: Dict[int, int], signals: Dict[int, bool]) -> float:
+    """How much a run of similar sibling blocks looks like a review list.
+
+    Blocks with enough text, times their average text, boosted by the share
+    of blocks carrying review-ish class names or attributes.
+    """
+    lengths = [text_lengths[id(block)] for block in blocks]
+    texty = sum(1 for length in lengths if length >= BLOCK_MIN_TEXT_CHARS)
+    average = sum(min(length, MAX_SCORED_TEXT) for length in lengths) / len(blocks)
+    signal_share = sum(1 for block in blocks if signals[id(block)]) / len(blocks)
+    return texty * average * (1 + signal_share)
+
+
+class FieldPath:
+    """One child path inside the blocks and what its text looks like across them."""
+
+    def __init__(self, steps: Tuple, order: int):
+        self.steps = steps
+        self.order = order
+        self.elements: Dict[int, Tag] = {}
+        self.classes: Optional[set] = None
+
+    def add(self, index: int, element: Tag):
+        if index in self.elements:
+            return
+        self.elements[index] = element
+        classes = set(element.get("class") or ())
+        self.classes = classes if self.classes is None else self.classes & classes
+
+    def texts(self) -> List[str]:
+        return [_own_text(element) for element in self.elements.values()]
+
+    def find(self, block: Tag) -> Optional[Tag]:
+        """First element at this path inside `block`, descending only through matching steps."""
+        stack = [(child, 0) for child in reversed(block.contents) if isinstance(child, Tag)]
+        while stack:
+            element, depth = stack.pop()
+            if (element.name, _class_stems(element)) != self.steps[depth]:
+                continue
+            if depth == len(self.steps) - 1:
+                return element
+            stack.extend((child, depth + 1) for child in reversed(element.contents) if isinstance(child, Tag))
+        return None
+
+    def css(self) -> str:
+        """Child-combinator selector relative to the block, using classes every block shares."""
+        parts = [tag for tag, _ in self.steps]
+        if self.classes:
+            parts[-1] += "".join(f".{name}" for name in sorted(self.classes))
+        return " > ".join(parts)
+
+
+class ReviewBlocks:
+    """The best review list on a page: its blocks and the inferred field paths."""
+
+    def __init__(self, parent: Tag, blocks: List[Tag], score: float):
+        self.parent = parent
+        self.blocks = blocks
+        self.score = score
+        self.fields: Dict[str, Optional[FieldPath]] = {"title": None, "body": None, "rating": None, "reviewer": None}
+        self._infer_fields()
+
+    def _paths(self) -> List[FieldPath]:
+        """Every child path in a sample of the blocks, walked once per block."""
+        paths: Dict[Tuple, FieldPath] = {}
+        sample = self.blocks[:FIELD_SAMPLE]
+        for index, block in enumerate(sample):
+            stack = [(child, ()) for child in reversed(list(block.children)) if isinstance(child, Tag)]
+            while stack:
+                element, parent_steps = stack.pop()
+                if element.name in DROP_TAGS:
+                    continue
+                steps = parent_steps + ((element.name, _class_stems(element)),)
+                path = paths.get(steps)
+                if path is None:
+                    path = paths[steps] = FieldPath(steps, len(paths))
+                path.add(index, element)
+                stack.extend((child, steps) for child in reversed(list(element.children)) if isinstance(child, Tag))
+        minimum = FIELD_MIN_SUPPORT * len(sample)
+        return [path for path in paths.values() if len(path.elements) >= minimum]
+
+    def _infer_fields(self):
+        candidates = []
+        for path in self._paths():
+            texts = path.texts()
+            filled = [text for text in texts if text]
+            signal = " ".join(f"{tag} {' '.join(classes)}" for tag, classes in path.steps[-2:])
+            signal += " " + _signal_text(next(iter(path.elements.values())))
+            candidates.append({
+                "path": path,
+                "length": sum(len(text) for text in filled) / len(filled) if filled else 0,
+                "distinct": len(set(filled)) / len(filled) if filled else 0,
+                "ratings": sum(1 for element in path.elements.values() if parse_rating(element) is not None) / len(path.elements),
+                "signal": signal
+            })
+
+        ratings = [
+            candidate for candidate in candidates
+            if candidate["ratings"] >= 0.8 and (RATING_SIGNAL.search(candidate["signal"]) or candidate["length"] <= 12)
+        ]
+        if ratings:
+            # Prefer an element named like a rating, then the outermost one
+            best = max(ratings, key=lambda c: (bool(RATING_SIGNAL.search(c["signal"])), -len(c["path"].steps), -c["path"].order))
+            self.fields["rating"] = best["path"]
+        rating_steps = self.fields["rating"].steps if self.fields["rating"] else None
+
+        def unclaimed(candidate) -> bool:
+            steps = candidate["path"].steps
+            return rating_steps is None or steps[:len(rating_steps)] != rating_steps
+
+        bodies = [c for c in candidates if unclaimed(c) and c["length"] >= BLOCK_MIN_TEXT_CHARS / 2 and c["distinct"] >= 0.5]
+        if bodies:
+            self.fields["body"] = max(bodies, key=lambda c: c["length"] * c["distinct"])["path"]
+        body = self.fields["body"]
+
+        short = [
+            c for c in candidates
+            if unclaimed(c) and c["path"] is not body and 2 <= c["length"] <= 60 and c["ratings"] < 0.8
+        ]
+        titles = [c for c in short if TITLE_SIGNAL.search(c["signal"]) or c["path"].steps[-1][0] in HEADING_TAGS]
+        if titles:
+            self.fields["title"] = min(titles, key=lambda c: c["path"].order)["path"]
+        names = [c for c in short if c["path"] is not self.fields["title"]]
+        if names:
+            # Named like an author if possible, otherwise the first short text in the block
+            self.fields["reviewer"] = min(names, key=lambda c: (not NAME_SIGNAL.search(c["signal"]), c["path"].order))["path"]
+
+    def reviews(self) -> List[Dict]:
+        """Review dicts (title, body, rating, reviewer, images) read from every block."""
+        reviews = []
+        for index, block in enumerate(self.blocks):
+            elements = {
+                field: path.elements.get(index) if index < FIELD_SAMPLE else path.find(block)
+                for field, path in self.fields.items() if path
+            }
+
+            def text(field: str) -> Optional[str]:
+                element = elements.get(field)
+                return (_own_text(element) or element.get_text(" ", strip=True) or None) if element else None
+
+            body = text("body")
+            if not body:
+                continue
+            rating_element = elements.get("rating")
+            reviews.append({
+                "title": text("title"),
+                "body": body,
+                "rating": parse_rating(rating_element) if rating_element else None,
+                "reviewer": text("reviewer"),
+                "images": [
+                    image["src"] for image in block.find_all("img", src=True)
+                    if not SKIP_IMAGE.search(image["src"])
+                ]
+            })
+        return reviews
+
+    def selectors(self) -> Dict[str, List[str]]:
+        """The inferred paths as selector lists in the shape review1's extractors use."""
+        item = self.blocks[0].name + "".join(f".{name}" for name in sorted(self._shared_classes()))
+        return {
+            "review_item": [f"{css_path(self.parent)} > {item}"],
+            **{field: [path.css()] for field, path in self.fields.items() if path}
+        }
+
+    def _shared_classes(self) -> set:
+        shared = set(self.blocks[0].get("class") or ())
+        for block in self.blocks[1:]:
+            shared &= set(block.get("class") or ())
+        return shared
+
+
+def css_path(element: Tag) -> str:
+    """Selector for `element`: its nearest id-bearing ancestor, then tags and classes down to it."""
+    parts = []
+    while isinstance(element, Tag) and element.name not in ("[document]", "html"):
+        if element.get("id") and not re.search(r"\d{3,}", element["id"]):
+            parts.append(f"{element.name}#{element['id']}")
+            break
+        parts.append(element.name + "".join(f".{name}" for name in element.get("class") or ()))
+        element = element.parent
+    return " > ".join(reversed(parts))
+
+
+@traced("block_detection")
+def detect_review_blocks(soup: BeautifulSoup) -> Optional[ReviewBlocks]:
+    """Find the run of repeated sibling blocks that looks most like a review list.
+
+    One bottom-up pass computes each element's text length and review
+    signals; each element's children are grouped by tag and class stem once,
+    so the whole page is analysed in time linear in its size.
+    """
+    root = soup.body or soup
+    text_lengths: Dict[int, int] = {}
+    signals: Dict[int, bool] = {}
+    best: Optional[Tuple[float, Tag, List[Tag]]] = None
+
+    # Iterative post-order walk: children are finished before their parent
+    stack: List[Tuple[Tag, Optional[List[Tag]], int]] = [(root, None, 0)]
+    while stack:
+        element, children, own_length = stack.pop()
+        if children is None:
+            children = []
+            for child in element.contents:
+                if isinstance(child, Tag):
+                    if child.name not in DROP_TAGS:
+                        children.append(child)
+                elif not isinstance(child, PreformattedString):
+                    own_length += len(child.strip())
+            stack.append((element, children, own_length))
+            stack.extend((child, None, 0) for child in children)
+            continue
+
+        text_lengths[id(element)] = own_length + sum(text_lengths[id(child)] for child in children)
+        signals[id(element)] = _has_signal(element) or any(signals[id(child)] for child in children)
+        if len(children) < BLOCK_MIN_REPEATS:
+            continue
+
+        groups: Dict[Tuple, List[Tag]] = {}
+        for child in children:
+            groups.setdefault(_block_key(child), []).append(child)
+        for blocks in groups.values():
+            if len(blocks) >= BLOCK_MIN_REPEATS:
+                score = _group_score(blocks, text_lengths, signals)
+                if score and (best is None or score > best[0]):
+                    best = (score, element, blocks)
+
+    if best is None:
+        return None
+    detected = ReviewBlocks(best[1], best[2], best[0])
+    if detected.fields["body"] is None:
+        return None
+    logger.info(
+        f"Detected {len(detected.blocks)} review blocks under {css_path(detected.parent)} "
+        f"(fields: {', '.join(field for field, path in detected.fields.items() if path)})"
+    )
+    return detected
+
+
+@traced("heuristic")
+def heuristic_reviews(soup: BeautifulSoup) -> List[Dict]:
+    """Reviews read from the detected review list, or none when the page has no such list."""
+    detected = detect_review_blocks(soup)
+    return detected.reviews() if detected else []
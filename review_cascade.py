@@ -0,0 +1,275 @@
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, HttpUrl
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+from browser_pool import BrowserPool, read_network_log
+from readiness import wait_for_page_ready
+from scrape_executor import ScrapeExecutor
+from selector_cache import SelectorCache
+from static_fetcher import TIER_STATIC, claim_validators, fetch_static, fetch_tiered
+from pagination import PageBudget, expand_load_more, paginate
+from network_capture import capture_page_feed, review_feeds
+from resource_blocking import apply_blocking, resource_stats
+from review_stream import stream_pages, stream_response
+from review_store import ReviewStore, scrape_incremental
+from response_cache import RESPONSE_CACHE, ResponseCache
+from batch_jobs import BatchScheduler, add_batch_routes
+from job_queue import SCRAPE_WORKERS, JobClient, add_job_routes
+from html_parser import PARSER_PATTERN, parse_html
+from extraction_cascade import ExtractionCascade, ExtractionStrategy, Page
+from pattern_extraction import REVIEW_SELECTORS, extract_reviews
+from llm_selectors import DEFAULT_SELECTORS, SelectorExtractor
+from review_blocks import heuristic_reviews
+from llm_gateway import LLMGateway, create_llm_backend, groq_api_key
+from tracing import instrument_app, span
+from structured_logging import configure_logging, instrument_logging
+
+# Initialize FastAPI app
+app = FastAPI()
+instrument_app(app, "review_cascade")
+instrument_logging(app)
+
+# Shared pool of warm headless Chrome instances
+browser_pool = BrowserPool()
+
+# Bounded executor for blocking scrape jobs
+scrape_executor = ScrapeExecutor()
+
+# Per-domain/template cache of LLM selectors
+selector_cache = SelectorCache(namespace="review_cascade")
+
+# Every review seen per product, for incremental scrapes
+review_store = ReviewStore(namespace="review_cascade")
+
+# Whole /api/reviews responses, answered without scraping while fresh
+response_cache = ResponseCache(namespace="review_cascade")
+
+# With SCRAPE_WORKERS=1 scrapes run on scrape_worker.py processes and this one only serves HTTP
+job_client = JobClient("review_cascade") if SCRAPE_WORKERS else None
+
+# Groq API Configuration
+GROQ_API_KEY = groq_api_key()
+
+# Coalesced, rate-limited LLM calls (LLM_BACKEND=stub for offline runs)
+llm_gateway = LLMGateway(create_llm_backend(GROQ_API_KEY))
+selector_extractor = SelectorExtractor(llm_gateway, selector_cache)
+
+# The three services' strategies sharing one parsed page: review2's selector
+# patterns, review1's LLM selectors (cheap once cached for the page template)
+# and server3's text heuristic
+cascade = ExtractionCascade([
+    ExtractionStrategy("patterns", lambda page: extract_reviews(page.soup)),
+    ExtractionStrategy(
+        "llm_selectors",
+        lambda page: selector_extractor.select_page_reviews(page.url, page.html_content, page.soup, page.fingerprint),
+        cheap=lambda page: selector_cache.contains(page.domain, page.fingerprint)
+    ),
+    ExtractionStrategy("heuristic", lambda page: heuristic_reviews(page.soup))
+])
+
+@app.on_event("startup")
+def start_scraper():
+    browser_pool.start()
+    batch_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scraper():
+    browser_pool.close()
+    scrape_executor.shutdown()
+    if job_client:
+        job_client.shutdown()
+    batch_scheduler.close()
+    cascade.close()
+    llm_gateway.close()
+
+# Logging configuration
+configure_logging("review_cascade", "INFO")
+logger = logging.getLogger()
+
+# Response models
+class Review(BaseModel):
+    title: Optional[str] = None
+    body: str
+    rating: Optional[float] = None
+    reviewer: Optional[str] = None
+    images: List[str] = []
+
+class ReviewResponse(BaseModel):
+    reviews_count: int
+    reviews: List[Review]
+    next_page: Optional[str] = None
+    tier: Optional[str] = None
+    strategy: Optional[str] = None
+    cursor: Optional[int] = None
+    # Static-tier validators for the response cache; never served
+    validators: Optional[Dict] = None
+
+# Any container either extractor knows signals that reviews have rendered
+READY_SELECTORS = DEFAULT_SELECTORS["review_item"] + REVIEW_SELECTORS["review_containers"]
+
+def render_page(url: str, budget: Optional[PageBudget] = None) -> str:
+    """Load a page in a pooled browser and return the rendered HTML."""
+    with browser_pool.session() as driver:
+        # Skip images, fonts, media and trackers the extractors never look at
+        blocking = apply_blocking(driver, url)
+        start = time.monotonic()
+        with span("navigate"):
+            driver.get(url)
+
+        # Wait until review containers render or the page settles
+        readiness = wait_for_page_ready(driver, READY_SELECTORS)
+        logger.info(f"Page ready via {readiness.strategy} after {readiness.waited:.2f}s: {url}")
+        network_log = read_network_log(driver)
+        resource_stats.record(blocking, network_log, time.monotonic() - start)
+
+        # Click through "load more" buttons, counting each click as a page,
+        # unless a captured review JSON feed makes them unnecessary
+        if capture_page_feed(driver, url, network_log) is None:
+            expand_load_more(driver, budget)
+
+        with span("page_source"):
+            return driver.page_source
+
+def page_extractor(url: str, parser: Optional[str], winners: List[str]) -> Callable[[str], List[Dict]]:
+    """Run the cascade on each page of HTML, noting the winning strategy in `winners`."""
+    def extract(html_content: str) -> List[Dict]:
+        result = cascade.extract(Page(url, html_content, parse_html(html_content, parser)))
+        if result.strategy:
+            winners.append(result.strategy)
+        return result.reviews
+    return extract
+
+def scrape_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> ReviewResponse:
+    """Fetch reviews with whichever strategy first gives good results on the page."""
+    try:
+        winners: List[str] = []
+        extract = page_extractor(url, parser, winners)
+
+        # The first page, its load-more rounds and every page followed share page_limit
+        budget = PageBudget(page_limit)
+
+        def render(page_url: str) -> str:
+            return render_page(page_url, budget)
+
+        # Newest first, stopping at reviews already stored, returning only new ones
+        if incremental:
+            result = scrape_incremental(review_store, url, budget, extract, render, render_next=render_page)
+            return ReviewResponse(
+                reviews_count=len(result.reviews),
+                reviews=result.reviews,
+                next_page=result.next_page,
+                tier=result.tier,
+                strategy=winners[-1] if winners else None,
+                cursor=result.cursor
+            )
+
+        # Plain HTTP first, headless Chrome only when the static page has no reviews
+        first_reviews, tier, html_content = fetch_tiered(url, extract, render)
+
+        # Follow pagination with whichever tier served the first page
+        fetch_html = fetch_static if tier == TIER_STATIC else render_page
+        all_reviews, next_page = paginate(
+            url, html_content, first_reviews, budget, fetch_html, extract, review_feeds.pop(url)
+        )
+
+        if not all_reviews:
+            raise HTTPException(status_code=404, detail="No valid reviews found on page")
+
+        review_store.add(url, all_reviews)
+        return ReviewResponse(
+            reviews_count=len(all_reviews),
+            reviews=all_reviews,
+            next_page=next_page,
+            tier=tier,
+            validators=claim_validators(url, tier),
+            strategy=winners[-1] if winners else None,
+            cursor=review_store.cursor(url)
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error in fetch_reviews: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def stream_reviews(url: str, page_limit: int, parser: Optional[str], emit: Callable[[Dict], None]):
+    """Scrape like scrape_reviews but emit each review as soon as it is extracted."""
+    budget = PageBudget(page_limit)
+    stream_pages(
+        url,
+        budget,
+        page_extractor(url, parser, []),
+        lambda page_url: render_page(page_url, budget),
+        emit,
+        render_next=render_page
+    )
+
+async def fetch_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False) -> ReviewResponse:
+    """Run the blocking scrape on a worker process, or on the bounded executor so the event loop stays free."""
+    if job_client:
+        return await job_client.run(url, page_limit, parser, incremental)
+    return await scrape_executor.run(scrape_reviews, url, page_limit, parser, incremental)
+
+# Batch jobs, scheduled per domain with adaptive concurrency
+batch_scheduler = BatchScheduler(job_client.scrape if job_client else scrape_reviews)
+add_batch_routes(app, batch_scheduler)
+if job_client:
+    add_job_routes(app, job_client)
+
+@app.get("/api/reviews", response_model=ReviewResponse, response_model_exclude={"validators"})
+async def get_reviews(
+    page: HttpUrl = Query(..., description="URL of the product page to scrape reviews from"),
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)"),
+    incremental: bool = Query(False, description="Only return reviews not seen by earlier scrapes, newest first"),
+    fresh: bool = Query(False, description="Scrape now instead of answering from the response cache")
+):
+    """Extract reviews from a given product page URL."""
+    try:
+        url = str(page)
+        # Incremental scrapes depend on what earlier scrapes stored, so never cache them
+        if incremental or not RESPONSE_CACHE:
+            return await fetch_reviews(url, page_limit, parser, incremental)
+        return await response_cache.serve(
+            url, page_limit, parser, lambda: fetch_reviews(url, page_limit, parser), refresh=fresh
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"API Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/reviews/stream")
+async def stream_reviews_endpoint(
+    page: HttpUrl = Query(..., description="URL of the product page to scrape reviews from"),
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    format: str = Query("ndjson", regex="^(ndjson|sse)$", description="Stream as NDJSON or server-sent events"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)")
+):
+    """Stream reviews as they are extracted, with page events and a final summary."""
+    return stream_response(scrape_executor, stream_reviews, str(page), page_limit, parser, stream_format=format)
+
+@app.get("/api/reviews/changes", response_model=ReviewResponse, response_model_exclude={"validators"})
+async def get_review_changes(
+    page: HttpUrl = Query(..., description="URL of the product page whose stored reviews to return"),
+    cursor: int = Query(0, description="Cursor from an earlier response; only reviews stored after it are returned")
+):
+    """Reviews stored for a product since `cursor`, without scraping."""
+    reviews, cursor = review_store.changes(str(page), cursor)
+    return ReviewResponse(reviews_count=len(reviews), reviews=reviews, cursor=cursor)
+
+@app.get("/api/cascade")
+async def get_cascade_stats():
+    """Runs, wins and time per strategy, and how often the LLM was raced."""
+    return cascade.stats.snapshot()
+
+@app.get("/api/response-cache")
+async def get_response_cache_stats():
+    """Response cache hits, stale answers, revalidations and background refreshes."""
+    return response_cache.snapshot()
+
+@app.get("/api/resource-blocking")
+async def get_resource_blocking_stats():
+    """Requests blocked while rendering and the bytes and time saved per page."""
+    return resource_stats.snapshot()
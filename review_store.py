@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from network_capture import review_feeds
+from pagination import PAGE_PARAMS, Page, PageBudget, Paginator
+from review_stream import review_data
+from selector_cache import page_domain
+from static_fetcher import TIER_STATIC, fetch_static, fetch_tiered
+
+logger = logging.getLogger()
+
+# Review store configuration
+REVIEW_STORE_PATH = os.getenv("REVIEW_STORE_PATH", "review_store.db")
+INCREMENTAL_KNOWN_STOP = int(os.getenv("INCREMENTAL_KNOWN_STOP", "3"))
+# Per-domain query parameters that sort reviews newest first, e.g.
+# {"shop.example.com": {"sort": "newest"}}
+INCREMENTAL_SORT_PARAMS: Dict[str, Dict[str, str]] = json.loads(os.getenv("INCREMENTAL_SORT_PARAMS", "{}"))
+
+# Query parameters that never change which product a URL is about
+VOLATILE_PARAMS = set(PAGE_PARAMS) | {"sort", "sortBy", "sort_by", "order", "orderBy", "ref", "fbclid", "gclid"}
+WHITESPACE = re.compile(r"\s+")
+
+
+def product_key(url: str) -> str:
+    """The product a URL is about: host and path plus its meaningful query parameters.
+
+    Tracking, paging and sort parameters and the fragment are dropped so every
+    page and ordering of one product's reviews shares a key.
+    """
+    parsed = urlparse(url)
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query)
+        if name not in VOLATILE_PARAMS and not name.startswith("utm_")
+    )
+    key = parsed.netloc.lower() + (parsed.path.rstrip("/") or "/")
+    return f"{key}?{urlencode(params)}" if params else key
+
+
+def _normalized(value) -> str:
+    return WHITESPACE.sub(" ", str(value or "")).strip().lower()
+
+
+def review_hash(review) -> str:
+    """Content hash of a review that survives whitespace, case and image URL changes."""
+    data = review_data(review)
+    rating = data.get("rating")
+    parts = [
+        _normalized(data.get("title")),
+        _normalized(data.get("body")),
+        _normalized(data.get("reviewer")),
+        "" if rating is None else f"{float(rating):g}"
+    ]
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def newest_first_url(url: str) -> str:
+    """`url` with the domain's newest-first sort parameters, if any are configured."""
+    sort = INCREMENTAL_SORT_PARAMS.get(page_domain(url))
+    if not sort:
+        return url
+    parsed = urlparse(url)
+    params = dict(parse_qsl(parsed.query), **sort)
+    return urlunparse(parsed._replace(query=urlencode(params)))
+
+
+class ReviewStore:
+    """Every review seen per product, keyed by content hash, in SQLite.
+
+    Each product's reviews get increasing sequence numbers in the order they
+    were first seen; the highest one is the product's cursor, so a caller
+    holding an older cursor can ask for just what was added since.
+    """
+
+    def __init__(self, namespace: str, path: str = REVIEW_STORE_PATH):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS review_store (
+                namespace TEXT NOT NULL,
+                product TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                review TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                PRIMARY KEY (namespace, product, hash)
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS review_store_seq ON review_store (namespace, product, seq)"
+        )
+        self._db.commit()
+
+    def add(self, url: str, reviews: List) -> List:
+        """Store the reviews of `url`'s product, returning the ones not stored before."""
+        product = product_key(url)
+        now = time.time()
+        with self._lock:
+            seq = self._cursor(product)
+            new = []
+            for review in reviews:
+                seq += 1
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO review_store VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, product, review_hash(review), seq, json.dumps(review_data(review)), now)
+                ).rowcount
+                if inserted:
+                    new.append(review)
+                else:
+                    seq -= 1
+            self._db.commit()
+        return new
+
+    def cursor(self, url: str) -> int:
+        """Sequence number of the newest stored review of `url`'s product (0 if none)."""
+        with self._lock:
+            return self._cursor(product_key(url))
+
+    def changes(self, url: str, cursor: int = 0) -> Tuple[List[Dict], int]:
+        """Reviews stored after `cursor`, oldest first, and the cursor to resume from."""
+        product = product_key(url)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, review FROM review_store WHERE namespace = ? AND product = ? AND seq > ? ORDER BY seq",
+                (self.namespace, product, cursor)
+            ).fetchall()
+        return [json.loads(review) for _, review in rows], rows[-1][0] if rows else cursor
+
+    def _cursor(self, product: str) -> int:
+        row = self._db.execute(
+            "SELECT MAX(seq) FROM review_store WHERE namespace = ? AND product = ?",
+            (self.namespace, product)
+        ).fetchone()
+        return row[0] or 0
+
+
+class IncrementalResult:
+    """Reviews an incremental scrape had not stored before, and where it stopped."""
+
+    def __init__(self, reviews: List, cursor: int, tier: str, pages: int, next_page: Optional[str]):
+        self.reviews = reviews
+        self.cursor = cursor
+        self.tier = tier
+        self.pages = pages
+        self.next_page = next_page
+
+
+def scrape_incremental(
+    store: ReviewStore,
+    url: str,
+    budget: PageBudget,
+    extract: Callable[[Page], List],
+    render: Callable[[str], Page],
+    accept: Callable[[List], bool] = bool,
+    render_next: Optional[Callable[[str], Page]] = None
+) -> IncrementalResult:
+    """Scrape newest reviews first, stopping at the first page of already-stored ones.
+
+    `render` renders the first page, spending `budget` on its load-more
+    rounds, and `render_next`, defaulting to `render`, the older pages after it.
+
+    A page stops the walk once INCREMENTAL_KNOWN_STOP of its reviews (or all
+    of them, on shorter pages) are known, which tolerates a few pinned or
+    featured reviews above the new ones. Only the new reviews are returned.
+    """
+    sorted_url = newest_first_url(url)
+    first_reviews, tier, html_content = fetch_tiered(sorted_url, extract, render, accept)
+    fetch_html = fetch_static if tier == TIER_STATIC else render_next or render
+    paginator = Paginator(sorted_url, html_content, budget, fetch_html, extract, review_feeds.pop(sorted_url))
+
+    new_reviews = []
+    pages = 0
+    stopped = False
+    walk = paginator.pages(first_reviews)
+    try:
+        for _, page_reviews in walk:
+            pages += 1
+            new = store.add(url, page_reviews)
+            new_reviews.extend(new)
+            known = len(page_reviews) - len(new)
+            if known and known >= min(INCREMENTAL_KNOWN_STOP, len(page_reviews)):
+                logger.info(f"Page {pages} of {url} has {known} known reviews, stopping")
+                stopped = True
+                break
+    finally:
+        # Cancels pages still being prefetched
+        walk.close()
+
+    return IncrementalResult(
+        new_reviews,
+        store.cursor(url),
+        tier,
+        pages,
+        None if stopped else paginator.next_page
+    )
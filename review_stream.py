@@ -0,0 +1,135 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from network_capture import review_feeds
+from pagination import Page, PageBudget, Paginator
+from scrape_executor import ScrapeExecutor
+from static_fetcher import TIER_STATIC, fetch_static, fetch_tiered
+
+logger = logging.getLogger()
+
+# Streaming configuration
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream"
+}
+
+
+class StreamClosed(Exception):
+    """Raised in the scrape thread once the client has gone away."""
+
+
+def review_data(review) -> Dict:
+    """Plain dict for a `Review` model or an already-plain review."""
+    return review if isinstance(review, dict) else review.dict()
+
+
+def stream_pages(
+    url: str,
+    budget: PageBudget,
+    extract: Callable[[Page], List],
+    render: Callable[[str], Page],
+    emit: Callable[[Dict], None],
+    accept: Callable[[List], bool] = bool,
+    render_next: Optional[Callable[[str], Page]] = None
+):
+    """Scrape like the batch endpoints, emitting reviews page by page.
+
+    `render` renders the first page, spending `budget` on its load-more
+    rounds, and `render_next`, defaulting to `render`, the pages after it.
+
+    Emits one `review` event per review, a `page` event after each page and a
+    final `summary`. Nothing is kept after a page has been emitted.
+    """
+    first_reviews, tier, html_content = fetch_tiered(url, extract, render, accept)
+    fetch_html = fetch_static if tier == TIER_STATIC else render_next or render
+    paginator = Paginator(url, html_content, budget, fetch_html, extract, review_feeds.pop(url))
+
+    reviews_count = 0
+    pages = 0
+    for page_url, new_reviews in paginator.pages(first_reviews):
+        pages += 1
+        for review in new_reviews:
+            emit({"event": "review", "page": pages, "review": review_data(review)})
+        reviews_count += len(new_reviews)
+        emit({"event": "page", "page": pages, "url": page_url, "new_reviews": len(new_reviews), "tier": tier})
+
+    emit({
+        "event": "summary",
+        "reviews_count": reviews_count,
+        "pages": pages,
+        "next_page": paginator.next_page,
+        "tier": tier
+    })
+
+
+def format_event(event: Dict, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+
+def stream_response(executor: ScrapeExecutor, produce: Callable, *args, stream_format: str = "ndjson") -> StreamingResponse:
+    """Run `produce(*args, emit)` on the executor and stream what it emits.
+
+    The hand-off queue is bounded, so a slow client slows the scrape down
+    instead of letting events pile up in memory.
+    """
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue" = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    closed = threading.Event()
+
+    def emit(event: Dict):
+        if closed.is_set():
+            raise StreamClosed()
+        future = asyncio.run_coroutine_threadsafe(queue.put(event), loop)
+        while True:
+            try:
+                future.result(timeout=1)
+                return
+            except concurrent.futures.TimeoutError:
+                if closed.is_set():
+                    future.cancel()
+                    raise StreamClosed()
+
+    # Admission happens here so a full queue is still a plain 429 response
+    job = executor.submit(produce, *args, emit)
+
+    async def run_job():
+        try:
+            await job
+        except StreamClosed:
+            return
+        except HTTPException as e:
+            await queue.put({"event": "error", "status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Streaming scrape failed: {e}")
+            await queue.put({"event": "error", "status": 500, "detail": str(e)})
+        await queue.put(None)
+
+    async def events() -> AsyncIterator[str]:
+        task = asyncio.create_task(run_job())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield format_event(event, stream_format)
+        finally:
+            # The scrape thread notices on its next emit and stops
+            closed.set()
+            if not task.done():
+                logger.info("Stream client disconnected, stopping scrape")
+                task.cancel()
+
+    return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[stream_format])
@@ -0,0 +1,113 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger()
+
+# Executor configuration
+SCRAPE_MAX_IN_FLIGHT = int(os.getenv("SCRAPE_MAX_IN_FLIGHT", "4"))
+SCRAPE_MAX_QUEUE = int(os.getenv("SCRAPE_MAX_QUEUE", "16"))
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "90"))
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a queued job reaches the front after its deadline passed."""
+
+
+class ScrapeExecutor:
+    """Runs blocking scrape jobs on a bounded thread pool behind an admission queue.
+
+    At most `max_in_flight` jobs run at once and at most `max_queue` more wait
+    for a slot; anything beyond that is rejected with 429 so the event loop
+    stays free to answer other requests.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = SCRAPE_MAX_IN_FLIGHT,
+        max_queue: int = SCRAPE_MAX_QUEUE,
+        deadline: float = SCRAPE_DEADLINE
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="scrape")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._closed = False
+
+    @property
+    def queued(self) -> int:
+        return self._admitted - self._running
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def run(self, func: Callable, *args, deadline: Optional[float] = None):
+        """Run `func(*args)` off the event loop, enforcing admission and a deadline."""
+        return await self.submit(func, *args, deadline=deadline)
+
+    def submit(self, func: Callable, *args, deadline: Optional[float] = None) -> Awaitable:
+        """Admit and start `func(*args)` now, returning an awaitable for its result.
+
+        Admission failures raise immediately, which lets streaming endpoints
+        answer 429/503 before they commit to a response.
+        """
+        deadline = deadline or self.deadline
+        with self._lock:
+            if self._closed:
+                raise HTTPException(status_code=503, detail="Scraper is shutting down")
+            if self._admitted >= self.max_in_flight + self.max_queue:
+                logger.warning(f"Rejecting scrape job: {self._admitted} jobs already admitted")
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many scrape jobs queued, retry later",
+                    headers={"Retry-After": "5"}
+                )
+            self._admitted += 1
+
+        expires_at = time.monotonic() + deadline
+        # Run in a copy of the caller's context so request tracing follows the job
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._run_job, func, args, expires_at)
+        # Release the admission slot when the thread finishes, not when the
+        # caller stops waiting, so timed-out jobs still count against the limit
+        future.add_done_callback(self._release)
+        return self._wait(future, deadline)
+
+    async def _wait(self, future: Future, deadline: float):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            logger.error(f"Scrape job exceeded its {deadline:.0f}s deadline")
+            raise HTTPException(status_code=504, detail=f"Scraping did not finish within {deadline:.0f}s")
+
+    def shutdown(self):
+        """Stop admitting jobs and drop everything still waiting in the queue."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_job(self, func: Callable, args: tuple, expires_at: float):
+        if time.monotonic() >= expires_at:
+            raise DeadlineExceeded()
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, _future):
+        with self._lock:
+            self._admitted -= 1
@@ -0,0 +1,160 @@
+"""Worker process that runs one app's scrapes from the job queue.
+
+Start as many as the machine has cores (or browsers to spare), on any host
+that reaches the queue, and run the API with SCRAPE_WORKERS=1:
+
+    SCRAPE_WORKERS=1 uvicorn review2:app
+    python scrape_worker.py review2 --concurrency 2
+"""
+import os
+import uuid
+import signal
+import socket
+import logging
+import argparse
+import importlib
+import threading
+from typing import Dict
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from job_queue import JOB_LEASE_TIMEOUT, create_job_queue
+from selector_cache import page_domain
+from static_fetcher import throttle_signals
+from structured_logging import configure_logging
+
+logger = logging.getLogger()
+
+# Worker configuration
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", os.getenv("BROWSER_POOL_SIZE", "2")))
+WORKER_IDLE_POLL = float(os.getenv("WORKER_IDLE_POLL", "0.5"))
+
+# Each app's blocking single-URL scrape
+SCRAPE_FUNCTIONS = {
+    "review1": "scrape_reviews",
+    "review2": "scrape_reviews",
+    "server3": "fetch_reviews",
+    "review_cascade": "scrape_reviews"
+}
+
+# Errors worth another attempt; anything else (e.g. 404, no reviews) is final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ScrapeWorker:
+    """Claims jobs for one service and runs them on `concurrency` threads.
+
+    The main thread heartbeats the leases of running jobs and the worker's
+    own liveness every third of a lease. Stopping lets running jobs finish.
+    """
+
+    def __init__(self, service: str, concurrency: int = WORKER_CONCURRENCY, queue=None):
+        self.service = service
+        self.concurrency = max(1, concurrency)
+        self.module = importlib.import_module(service)
+        self.scrape = getattr(self.module, SCRAPE_FUNCTIONS[service])
+        self.queue = queue or create_job_queue()
+        self.id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.done = 0
+        self.failed = 0
+        self._running: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def run(self):
+        # Only the browsers: batches are scheduled by the API process, not here
+        self.module.browser_pool.start()
+        threads = [
+            threading.Thread(target=self._work, name=f"worker-{number}", daemon=True)
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        logger.info(f"Worker {self.id} running {self.concurrency} {self.service} scrapes at a time")
+        try:
+            while True:
+                self._heartbeat()
+                if self._stopping.wait(JOB_LEASE_TIMEOUT / 3):
+                    break
+            for thread in threads:
+                thread.join()
+            self._heartbeat()
+        finally:
+            self.module.stop_scraper()
+        logger.info(f"Worker {self.id} stopped after {self.done} jobs ({self.failed} failed)")
+
+    def stop(self, *_):
+        logger.info(f"Worker {self.id} stopping once running jobs finish")
+        self._stopping.set()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim(self.service, self.id)
+            if job is None:
+                self._stopping.wait(WORKER_IDLE_POLL)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: Dict):
+        payload = job["payload"]
+        with self._lock:
+            self._running[job["id"]] = payload["url"]
+        logger.info(f"Job {job['id']} attempt {job['attempt']}: {payload['url']}")
+        try:
+            result = self.scrape(payload["url"], payload["page_limit"], payload["parser"], payload["incremental"])
+        except HTTPException as e:
+            error = self._throttled(payload, {"status_code": e.status_code, "detail": e.detail})
+            self._fail(job, error, e.status_code in RETRY_STATUSES)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            self._fail(job, self._throttled(payload, {"status_code": 500, "detail": str(e)}), True)
+        else:
+            if not self.queue.complete(job["id"], self.id, self._throttled(payload, jsonable_encoder(result))):
+                logger.warning(f"Job {job['id']} finished after its lease passed to another worker")
+            with self._lock:
+                self.done += 1
+        finally:
+            with self._lock:
+                self._running.pop(job["id"], None)
+
+    def _throttled(self, payload: Dict, outcome: Dict) -> Dict:
+        """The job's result or error, plus any Retry-After the site sent this process.
+
+        The API process's batch scheduler can't see this process's throttle
+        signals, so they travel back with the job.
+        """
+        retry_after = throttle_signals.take(page_domain(payload["url"]))
+        if retry_after is not None:
+            outcome["retry_after"] = retry_after
+        return outcome
+
+    def _fail(self, job: Dict, error: Dict, retry: bool):
+        self.queue.fail(job["id"], self.id, error, retry)
+        with self._lock:
+            self.failed += 1
+
+    def _heartbeat(self):
+        with self._lock:
+            running = list(self._running)
+            done, failed = self.done, self.failed
+        for job_id in self.queue.heartbeat(running, self.id):
+            logger.warning(f"Lost the lease on job {job_id}")
+        self.queue.register_worker(self.id, self.service, len(running), done, failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=sorted(SCRAPE_FUNCTIONS))
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    configure_logging(f"{args.service}-worker", "INFO")
+    worker = ScrapeWorker(args.service, args.concurrency)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
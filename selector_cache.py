@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger()
+
+# Cache configuration
+SELECTOR_CACHE_PATH = os.getenv("SELECTOR_CACHE_PATH", "selector_cache.db")
+SELECTOR_CACHE_TTL = float(os.getenv("SELECTOR_CACHE_TTL", str(7 * 24 * 3600)))
+SELECTOR_CACHE_MEMORY_ENTRIES = int(os.getenv("SELECTOR_CACHE_MEMORY_ENTRIES", "512"))
+SELECTOR_CACHE_DISK_ENTRIES = int(os.getenv("SELECTOR_CACHE_DISK_ENTRIES", "10000"))
+
+# Tags that say nothing about the page template
+FINGERPRINT_SKIP_TAGS = {"script", "style", "noscript", "svg", "path", "meta", "link"}
+
+
+def page_domain(url: str) -> str:
+    """Domain part of a URL, used as the first half of the cache key."""
+    return urlparse(url).netloc.lower()
+
+
+def page_fingerprint(soup: BeautifulSoup) -> str:
+    """Hash the set of tag/class signatures so pages sharing a template collide.
+
+    Using the set (not the sequence) keeps the fingerprint stable when two
+    product pages only differ in how many reviews or images they show.
+    """
+    signatures = set()
+    for element in soup.find_all(True):
+        if element.name in FINGERPRINT_SKIP_TAGS:
+            continue
+        classes = element.get("class") or []
+        signatures.add(f"{element.name}.{'.'.join(sorted(classes))}")
+    return fingerprint_signatures(signatures)
+
+
+def fingerprint_signatures(signatures: Iterable[str]) -> str:
+    """Fingerprint of a set of `tag.class.class` signatures, however they were collected."""
+    digest = hashlib.sha1("\n".join(sorted(set(signatures))).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class CacheEntry:
+    """Selectors for one domain/template plus what it cost to discover them."""
+
+    def __init__(self, selectors: Dict, llm_latency: float, created_at: float):
+        self.selectors = selectors
+        self.llm_latency = llm_latency
+        self.created_at = created_at
+
+
+class SelectorCache:
+    """Two-tier (LRU memory + SQLite) cache of LLM-discovered selectors."""
+
+    def __init__(
+        self,
+        namespace: str,
+        path: str = SELECTOR_CACHE_PATH,
+        ttl: float = SELECTOR_CACHE_TTL,
+        memory_entries: int = SELECTOR_CACHE_MEMORY_ENTRIES,
+        disk_entries: int = SELECTOR_CACHE_DISK_ENTRIES
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS selector_cache (
+                namespace TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                selectors TEXT NOT NULL,
+                llm_latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, domain, fingerprint)
+            )
+            """
+        )
+        self._db.commit()
+        self.stats: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "saved_llm_seconds": 0.0
+        }
+
+    def get(self, domain: str, fingerprint: str) -> Optional[Dict]:
+        """Return cached selectors, or None on a miss or expired entry."""
+        key = (domain, fingerprint)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = self._load(domain, fingerprint)
+            if entry is not None and now - entry.created_at > self.ttl:
+                self._delete(domain, fingerprint)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._remember(key, entry)
+            self._db.execute(
+                "UPDATE selector_cache SET last_used = ? WHERE namespace = ? AND domain = ? AND fingerprint = ?",
+                (now, self.namespace, domain, fingerprint)
+            )
+            self._db.commit()
+            self.stats["hits"] += 1
+            self.stats["saved_llm_seconds"] += entry.llm_latency
+        logger.info(f"Selector cache hit for {domain} ({fingerprint})")
+        return entry.selectors
+
+    def contains(self, domain: str, fingerprint: str) -> bool:
+        """Whether live selectors are cached, without counting a lookup."""
+        with self._lock:
+            entry = self._memory.get((domain, fingerprint)) or self._load(domain, fingerprint)
+            return entry is not None and time.time() - entry.created_at <= self.ttl
+
+    def put(self, domain: str, fingerprint: str, selectors: Dict, llm_latency: float):
+        """Store selectors whose discovery took `llm_latency` seconds, usually an LLM call."""
+        now = time.time()
+        entry = CacheEntry(selectors, llm_latency, now)
+        with self._lock:
+            self._remember((domain, fingerprint), entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO selector_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, domain, fingerprint, json.dumps(selectors), llm_latency, now, now)
+            )
+            self._evict_disk()
+            self._db.commit()
+
+    def invalidate(self, domain: str, fingerprint: str):
+        """Drop an entry whose selectors no longer match the page."""
+        with self._lock:
+            self._delete(domain, fingerprint)
+            self.stats["invalidations"] += 1
+        logger.warning(f"Invalidated cached selectors for {domain} ({fingerprint})")
+
+    def snapshot(self) -> Dict:
+        """Counters plus derived hit rate, for the stats endpoint."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+    def _remember(self, key: Tuple[str, str], entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, domain: str, fingerprint: str) -> Optional[CacheEntry]:
+        row = self._db.execute(
+            "SELECT selectors, llm_latency, created_at FROM selector_cache "
+            "WHERE namespace = ? AND domain = ? AND fingerprint = ?",
+            (self.namespace, domain, fingerprint)
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2])
+
+    def _delete(self, domain: str, fingerprint: str):
+        self._memory.pop((domain, fingerprint), None)
+        self._db.execute(
+            "DELETE FROM selector_cache WHERE namespace = ? AND domain = ? AND fingerprint = ?",
+            (self.namespace, domain, fingerprint)
+        )
+        self._db.commit()
+
+    def _evict_disk(self):
+        self._db.execute(
+            "DELETE FROM selector_cache WHERE namespace = ? AND created_at < ?",
+            (self.namespace, time.time() - self.ttl)
+        )
+        self._db.execute(
+            "DELETE FROM selector_cache WHERE namespace = ? AND rowid NOT IN ("
+            "SELECT rowid FROM selector_cache WHERE namespace = ? ORDER BY last_used DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.disk_entries)
+        )
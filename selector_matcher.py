@@ -0,0 +1,147 @@
+import re
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import soupsieve
+from bs4 import Tag
+
+logger = logging.getLogger()
+
+# Simple selectors that can be checked without soupsieve:
+# `tag`, `.class`, `tag.class`, `[attr]`, `[attr=value]`, `[attr*=value]`.
+# Unquoted values stop at whitespace, so flagged forms like `[attr*=value i]`
+# don't match and are left to soupsieve
+SIMPLE_SELECTOR = re.compile(
+    r"^(?P<tag>[a-zA-Z][\w-]*)?"
+    r"(?:\.(?P<cls>[\w-]+))?"
+    r"(?:\[(?P<attr>[\w-]+)(?:(?P<op>\*?=)"
+    r"(?P<quote>[\"'])?(?P<value>(?(quote)[^\"'\]]+|[^\s\"'\]]+))(?(quote)(?P=quote)))?\])?$"
+)
+
+Predicate = Callable[[Tag], bool]
+
+
+def _attribute_text(node: Tag, attr: str) -> Optional[str]:
+    value = node.attrs.get(attr)
+    if isinstance(value, list):
+        # bs4 splits multi-valued attributes such as class
+        return " ".join(value)
+    return value
+
+
+def _simple_predicate(selector: str) -> Optional[Predicate]:
+    """Plain-Python test for the simple selector shapes our selector lists use."""
+    match = SIMPLE_SELECTOR.match(selector.strip())
+    if not match or not any(match.group("tag", "cls", "attr")):
+        return None
+    tag, cls, attr, op, value = match.group("tag", "cls", "attr", "op", "value")
+    tag = tag.lower() if tag else None
+
+    def predicate(node: Tag) -> bool:
+        if tag and node.name != tag:
+            return False
+        if cls and cls not in (node.attrs.get("class") or ()):
+            return False
+        if attr:
+            text = _attribute_text(node, attr)
+            if text is None:
+                return False
+            if op == "=" and text != value:
+                return False
+            if op == "*=" and value not in text:
+                return False
+        return True
+
+    return predicate
+
+
+@lru_cache(maxsize=1024)
+def compile_selector(selector: str) -> Optional[Predicate]:
+    """Compile a CSS selector once into a node predicate; None if it can't be parsed."""
+    predicate = _simple_predicate(selector)
+    if predicate:
+        return predicate
+    try:
+        return soupsieve.compile(selector).match
+    except Exception as e:
+        logger.debug(
+            "Skipping invalid selector %r: %s", selector, e,
+            extra={"event": "selector_error", "selector": selector, "error": str(e)}
+        )
+        return None
+
+
+def _compile_all(selectors: List[str]) -> List[Optional[Predicate]]:
+    return [compile_selector(selector) for selector in selectors]
+
+
+class SelectorMatcher:
+    """Evaluates prioritised selector lists for several fields in one DOM walk.
+
+    For each field the result is the first element (in document order)
+    matched by the highest-priority selector that matches anything, which is
+    what `find_working_selector` followed by `select_one` used to return.
+    """
+
+    def __init__(self, fields: Dict[str, List[str]]):
+        self.fields = list(fields)
+        self._compiled = [_compile_all(fields[field]) for field in self.fields]
+
+    def match(self, element: Tag) -> Dict[str, Optional[Tag]]:
+        """Best match per field among the descendants of `element`."""
+        field_count = len(self.fields)
+        best_rank = [len(compiled) for compiled in self._compiled]
+        best_element: List[Optional[Tag]] = [None] * field_count
+        remaining = sum(1 for rank in best_rank if rank)
+
+        for node in element.descendants:
+            if not isinstance(node, Tag):
+                continue
+            for index in range(field_count):
+                rank_limit = best_rank[index]
+                if rank_limit == 0:
+                    continue
+                compiled = self._compiled[index]
+                for rank in range(rank_limit):
+                    predicate = compiled[rank]
+                    if predicate is not None and predicate(node):
+                        best_rank[index] = rank
+                        best_element[index] = node
+                        if rank == 0:
+                            remaining -= 1
+                        break
+            if remaining == 0:
+                # Every field already has its top-priority selector matched
+                break
+
+        return dict(zip(self.fields, best_element))
+
+
+def select_first_working(root: Tag, selectors: List[str]) -> Tuple[Optional[str], List[Tag]]:
+    """One-pass equivalent of picking the first selector with matches and selecting it.
+
+    Returns the winning selector and all of its matches in document order.
+    """
+    compiled = _compile_all(selectors)
+    best_rank = len(compiled)
+    matches: List[Tag] = []
+
+    for node in root.descendants:
+        if not isinstance(node, Tag):
+            continue
+        # Only selectors up to the current winner's priority can change the result
+        for rank in range(min(best_rank + 1, len(compiled))):
+            predicate = compiled[rank]
+            if predicate is None or not predicate(node):
+                continue
+            if rank < best_rank:
+                best_rank = rank
+                matches = [node]
+            else:
+                matches.append(node)
+            break
+
+    if not matches:
+        return None, []
+    return selectors[best_rank], matches
@@ -1,132 +1,339 @@
 import os
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
-from groq import Groq
 import json
 import time
 import logging
+from typing import Optional
+from browser_pool import BrowserPool, read_network_log
+from readiness import wait_for_page_ready
+from scrape_executor import ScrapeExecutor
+from selector_cache import SelectorCache, page_domain, page_fingerprint
+from static_fetcher import TIER_STATIC, claim_validators, fetch_static, fetch_tiered
+from pagination import PageBudget, expand_load_more, paginate
+from network_capture import capture_page_feed, review_feeds
+from resource_blocking import apply_blocking, resource_stats
+from review_stream import stream_pages, stream_response
+from review_store import ReviewStore, scrape_incremental
+from response_cache import RESPONSE_CACHE, ResponseCache
+from batch_jobs import BatchScheduler, add_batch_routes
+from job_queue import SCRAPE_WORKERS, JobClient, add_job_routes
+from html_parser import PARSER_PATTERN, parse_html
+from dom_condenser import condense_html
+from review_blocks import heuristic_reviews
+from llm_gateway import LLMGateway, create_llm_backend, groq_api_key
+from tracing import count_fallback, instrument_app, span
+from structured_logging import configure_logging, instrument_logging
 
 # Initialize FastAPI app
 app = FastAPI()
+instrument_app(app, "server3")
+instrument_logging(app)
+
+# Shared pool of warm headless Chrome instances
+browser_pool = BrowserPool()
+
+# Bounded executor for blocking scrape jobs
+scrape_executor = ScrapeExecutor()
+
+# Per-domain/template cache of Groq selectors
+selector_cache = SelectorCache(namespace="server3")
+
+# Every review seen per product, for incremental scrapes
+review_store = ReviewStore(namespace="server3")
+
+# Whole /api/reviews responses, answered without scraping while fresh
+response_cache = ResponseCache(namespace="server3")
+
+# With SCRAPE_WORKERS=1 scrapes run on scrape_worker.py processes and this one only serves HTTP
+job_client = JobClient("server3") if SCRAPE_WORKERS else None
+
+@app.on_event("startup")
+def start_scraper():
+    browser_pool.start()
+    batch_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_scraper():
+    browser_pool.close()
+    scrape_executor.shutdown()
+    if job_client:
+        job_client.shutdown()
+    batch_scheduler.close()
+    llm_gateway.close()
 
 # Groq API Configuration
-GROQ_API_KEY = "g##########n6hnP#########gW1i0W#####2qw"  # Replace with your actual API key
-client = Groq(api_key=GROQ_API_KEY)
+GROQ_API_KEY = groq_api_key("g##########n6hnP#########gW1i0W#####2qw")  # Replace with your actual API key, or set GROQ_API_KEY
+llm_gateway = LLMGateway(create_llm_backend(GROQ_API_KEY))  # Coalesced, rate-limited Groq calls
 
 # Logging configuration
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+configure_logging("server3", "INFO")
 logger = logging.getLogger()
 
 # Response model for API
 class ReviewResponse(BaseModel):
     reviews_count: int
     reviews: list[dict]
+    next_page: Optional[str] = None
+    tier: Optional[str] = None
+    cursor: Optional[int] = None
+    # Static-tier validators for the response cache; never served
+    validators: Optional[dict] = None
+
+# Keys the Groq selector suggestions must provide
+REQUIRED_SELECTOR_KEYS = ["review", "title", "body", "rating", "reviewer", "images"]
+
+# Function to ask Groq for review selectors; calls with the same key share one request
+def get_llm_selectors(html_content: str, key: Optional[tuple] = None) -> dict:
+    selectors_text = llm_gateway.complete_sync(
+        key,
+        [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {
+                "role": "user",
+                "content": f"Extract CSS selectors for reviews, titles, ratings, reviewers, user Rating or anything related to a review of  a or any product from the following HTML: {condense_html(html_content)}"
+            }
+        ],
+        max_tokens=1024
+    )
+
+    logger.info(f"Groq API Response: {selectors_text}")
+
+    # Timed out, throttled or failed: fall back to the heuristics alone
+    if selectors_text is None:
+        count_fallback("llm_unavailable")
+        return {}
 
-# Function to fetch reviews using Selenium and Groq API
-def fetch_reviews(url: str):
+    # Parse Groq API response for selectors
     try:
-        # Selenium setup
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        driver.get(url)
-        time.sleep(5)  # Wait for the page to fully load
-        html_content = driver.page_source
-        driver.quit()
-
-        # Parse HTML with BeautifulSoup
-        soup = BeautifulSoup(html_content, "html.parser")
-        reviews = []
-
-        # Attempt to extract reviews heuristically
-        for review_block in soup.find_all(text=lambda t: "reviews" in t.lower() or "customer" in t.lower()):
-            parent = review_block.find_parent()
-            if parent:
-                title = parent.find_next("h1") or parent.find_next("h2") or parent.find_next("span")
-                rating = parent.find_next("span", class_=lambda x: x and "rating" in x)
-                reviewer = parent.find_next("div", class_=lambda x: x and "reviewer" in x)
-                body = parent.find_next("p")
+        selectors = json.loads(selectors_text)
+    except json.JSONDecodeError:
+        logger.warning("Groq API provided non-JSON suggestions for CSS selectors.")
+        count_fallback("invalid_response")
+        return {}
+    if not isinstance(selectors, dict) or not all(key in selectors for key in REQUIRED_SELECTOR_KEYS):
+        count_fallback("incomplete_response")
+    return selectors if isinstance(selectors, dict) else {}
 
+# Function to check that selectors still find review containers on a page
+def selectors_match(soup: BeautifulSoup, selectors: dict) -> bool:
+    if not all(key in selectors for key in REQUIRED_SELECTOR_KEYS):
+        return False
+    try:
+        return bool(soup.select(selectors["review"]))
+    except Exception:
+        return False
+
+# Function to render a page in a pooled browser
+def render_page(url: str, budget: Optional[PageBudget] = None) -> str:
+    with browser_pool.session() as driver:
+        blocking = apply_blocking(driver, url)  # Skip images, fonts, media and trackers
+        start = time.monotonic()
+        with span("navigate"):
+            driver.get(url)
+        readiness = wait_for_page_ready(driver)  # Wait for the DOM and network to settle
+        logger.info(f"Page ready via {readiness.strategy} after {readiness.waited:.2f}s: {url}")
+        network_log = read_network_log(driver)
+        resource_stats.record(blocking, network_log, time.monotonic() - start)
+        # Each "load more" click counts as a page, unless a review JSON feed makes them unnecessary
+        if capture_page_feed(driver, url, network_log) is None:
+            expand_load_more(driver, budget)
+        with span("page_source"):
+            return driver.page_source
+
+# Function to extract reviews with Groq selectors, reusing selectors cached for this site template
+def selector_reviews(url: str, html_content: str, soup: BeautifulSoup) -> list:
+    reviews = []
+    domain = page_domain(url)
+    fingerprint = page_fingerprint(soup)
+    selectors = selector_cache.get(domain, fingerprint)
+    if selectors is not None and not selectors_match(soup, selectors):
+        selector_cache.invalidate(domain, fingerprint)
+        selectors = None
+
+    if selectors is None:
+        start = time.monotonic()
+        selectors = get_llm_selectors(html_content, (domain, fingerprint))
+        if selectors_match(soup, selectors):
+            selector_cache.put(domain, fingerprint, selectors, time.monotonic() - start)
+
+    # Use Groq-provided selectors if available
+    if not all(key in selectors for key in REQUIRED_SELECTOR_KEYS):
+        return reviews
+    with span("selector_match"):
+        for review in soup.select(selectors["review"]):
+            try:
+                title = review.select_one(selectors["title"]).get_text(strip=True)
+                body = review.select_one(selectors["body"]).get_text(strip=True)
+                rating = float(review.select_one(selectors["rating"]).get_text(strip=True))
+                reviewer = review.select_one(selectors["reviewer"]).get_text(strip=True)
+                images = [
+                    img["src"]
+                    for img in review.select(selectors["images"])
+                    if img.get("src")
+                ]
                 reviews.append({
-                    "title": title.get_text(strip=True) if title else None,
-                    "rating": rating.get_text(strip=True) if rating else None,
-                    "reviewer": reviewer.get_text(strip=True) if reviewer else None,
-                    "body": body.get_text(strip=True) if body else None
+                    "title": title,
+                    "body": body,
+                    "rating": rating,
+                    "reviewer": reviewer,
+                    "images": images
                 })
+            except Exception as e:
+                logger.warning(f"Error processing review: {e}")
+                continue
 
-        # Additional Groq-based refinement
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Correct Groq model
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {
-                    "role": "user",
-                    "content": f"Extract CSS selectors for reviews, titles, ratings, reviewers, user Rating or anything related to a review of  a or any product from the following HTML: {html_content[:3000]}"
-                }
-            ],
-            stream=False,
-            max_tokens=1024
-        )
+    return reviews
+
+# Function to extract reviews from HTML using heuristics and Groq selectors
+def extract_reviews(url: str, html_content: str, parser: Optional[str] = None) -> list:
+    # Parse HTML with the configured (or requested) parser backend
+    soup = parse_html(html_content, parser)
+    return heuristic_reviews(soup) + selector_reviews(url, html_content, soup)
+
+# Function to fetch reviews, trying plain HTTP before Selenium
+def fetch_reviews(url: str, page_limit: int = 5, parser: Optional[str] = None, incremental: bool = False):
+    try:
+        def extract(html_content: str) -> list:
+            return extract_reviews(url, html_content, parser)
+
+        # The first page, its load-more rounds and every page followed share page_limit
+        budget = PageBudget(page_limit)
+
+        def render(page_url: str) -> str:
+            return render_page(page_url, budget)
+
+        def has_text(reviews: list) -> bool:
+            return any(review.get("body") for review in reviews)
 
-        logger.info(f"Groq API Response: {response}")
-
-        # Parse Groq API response for selectors
-        selectors_text = response.choices[0].message.content
-        try:
-            selectors = json.loads(selectors_text)
-        except json.JSONDecodeError:
-            logger.warning("Groq API provided non-JSON suggestions for CSS selectors.")
-            selectors = {}
-
-        # Use Groq-provided selectors if available
-        required_keys = ["review", "title", "body", "rating", "reviewer", "images"]
-        if all(key in selectors for key in required_keys):
-            for review in soup.select(selectors["review"]):
-                try:
-                    title = review.select_one(selectors["title"]).get_text(strip=True)
-                    body = review.select_one(selectors["body"]).get_text(strip=True)
-                    rating = float(review.select_one(selectors["rating"]).get_text(strip=True))
-                    reviewer = review.select_one(selectors["reviewer"]).get_text(strip=True)
-                    images = [
-                        img["src"]
-                        for img in review.select(selectors["images"])
-                        if img.get("src")
-                    ]
-                    reviews.append({
-                        "title": title,
-                        "body": body,
-                        "rating": rating,
-                        "reviewer": reviewer,
-                        "images": images
-                    })
-                except Exception as e:
-                    logger.warning(f"Error processing review: {e}")
-                    continue
-
-        return {"reviews_count": len(reviews), "reviews": reviews}
+        # Only reviews not stored by earlier scrapes, walking newest pages first
+        if incremental:
+            result = scrape_incremental(
+                review_store, url, budget, extract, render, accept=has_text, render_next=render_page
+            )
+            return {
+                "reviews_count": len(result.reviews),
+                "reviews": result.reviews,
+                "next_page": result.next_page,
+                "tier": result.tier,
+                "cursor": result.cursor
+            }
+
+        # Escalate to the browser unless the static page yields review text
+        first_reviews, tier, html_content = fetch_tiered(url, extract, render, accept=has_text)
+
+        # Follow pagination with whichever tier served the first page
+        fetch_html = fetch_static if tier == TIER_STATIC else render_page
+        reviews, next_page = paginate(
+            url, html_content, first_reviews, budget, fetch_html, extract, review_feeds.pop(url)
+        )
+        review_store.add(url, reviews)
+        return {
+            "reviews_count": len(reviews),
+            "reviews": reviews,
+            "next_page": next_page,
+            "tier": tier,
+            "cursor": review_store.cursor(url),
+            "validators": claim_validators(url, tier)
+        }
 
     except Exception as e:
         logger.error(f"Error while fetching reviews: {e}")
         raise HTTPException(status_code=500, detail=f"Error extracting reviews: {str(e)}")
 
+# Function to stream reviews page by page as they are extracted
+def stream_reviews(url: str, page_limit: int, parser: Optional[str], emit):
+    budget = PageBudget(page_limit)
+    stream_pages(
+        url,
+        budget,
+        lambda html_content: extract_reviews(url, html_content, parser),
+        lambda page_url: render_page(page_url, budget),
+        emit,
+        accept=lambda reviews: any(review.get("body") for review in reviews),
+        render_next=render_page
+    )
+
+async def run_scrape(url: str, page_limit: int, parser: Optional[str], incremental: bool = False):
+    """
+    Run the blocking scrape on a worker process, or on the bounded executor so the event loop stays free.
+    """
+    if job_client:
+        return await job_client.run(url, page_limit, parser, incremental)
+    return await scrape_executor.run(fetch_reviews, url, page_limit, parser, incremental)
+
+# Batch jobs, scheduled per domain with adaptive concurrency
+batch_scheduler = BatchScheduler(job_client.scrape if job_client else fetch_reviews)
+add_batch_routes(app, batch_scheduler)
+if job_client:
+    add_job_routes(app, job_client)
+
 # FastAPI Endpoint
-@app.get("/api/reviews", response_model=ReviewResponse)
-async def get_reviews(page: str = Query(..., description="URL of the product page to scrape reviews from")):
+@app.get("/api/reviews", response_model=ReviewResponse, response_model_exclude={"validators"})
+async def get_reviews(
+    page: str = Query(..., description="URL of the product page to scrape reviews from"),
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)"),
+    incremental: bool = Query(False, description="Only return reviews not seen by earlier scrapes, newest first"),
+    fresh: bool = Query(False, description="Scrape now instead of answering from the response cache")
+):
     """
     Extract reviews from a given product page URL.
     """
     try:
-        reviews_data = fetch_reviews(page)
-        return reviews_data
+        # Incremental scrapes depend on what earlier scrapes stored, so never cache them
+        if incremental or not RESPONSE_CACHE:
+            return await run_scrape(page, page_limit, parser, incremental)
+        return await response_cache.serve(
+            page, page_limit, parser, lambda: run_scrape(page, page_limit, parser), refresh=fresh
+        )
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"API Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/reviews/stream")
+async def stream_reviews_endpoint(
+    page: str = Query(..., description="URL of the product page to scrape reviews from"),
+    page_limit: int = Query(5, description="Maximum number of pages to scrape"),
+    format: str = Query("ndjson", regex="^(ndjson|sse)$", description="Stream as NDJSON or server-sent events"),
+    parser: Optional[str] = Query(None, regex=PARSER_PATTERN, description="HTML parser backend (defaults to HTML_PARSER)")
+):
+    """
+    Stream reviews as they are extracted, followed by a summary record.
+    """
+    return stream_response(scrape_executor, stream_reviews, page, page_limit, parser, stream_format=format)
+
+@app.get("/api/reviews/changes", response_model=ReviewResponse, response_model_exclude={"validators"})
+async def get_review_changes(
+    page: str = Query(..., description="URL of the product page whose stored reviews to return"),
+    cursor: int = Query(0, description="Cursor from an earlier response; only reviews stored after it are returned")
+):
+    """
+    Reviews stored for a product since `cursor`, without scraping.
+    """
+    reviews, cursor = review_store.changes(page, cursor)
+    return {"reviews_count": len(reviews), "reviews": reviews, "next_page": None, "tier": None, "cursor": cursor}
+
+@app.get("/api/selector-cache")
+async def get_selector_cache_stats():
+    """
+    Selector cache hit rate and the Groq time it has saved.
+    """
+    return selector_cache.snapshot()
+
+@app.get("/api/response-cache")
+async def get_response_cache_stats():
+    """
+    Response cache hits, stale answers, revalidations and background refreshes.
+    """
+    return response_cache.snapshot()
+
+@app.get("/api/resource-blocking")
+async def get_resource_blocking_stats():
+    """
+    Requests blocked while rendering and the bytes and time saved per page.
+    """
+    return resource_stats.snapshot()
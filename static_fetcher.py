@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from selector_cache import page_domain
+from tracing import traced
+
+logger = logging.getLogger()
+
+# Static fetch configuration
+STATIC_FETCH_TIMEOUT = float(os.getenv("STATIC_FETCH_TIMEOUT", "10"))
+STATIC_POOL_SIZE = int(os.getenv("STATIC_POOL_SIZE", "20"))
+TIER_MEMORY_TTL = float(os.getenv("TIER_MEMORY_TTL", str(24 * 3600)))
+STATIC_VALIDATOR_ENTRIES = int(os.getenv("STATIC_VALIDATOR_ENTRIES", "1024"))
+
+TIER_STATIC = "static"
+TIER_BROWSER = "browser"
+
+STATIC_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+# Markers of pages that only render (or only let us in) once JavaScript runs
+JS_GATE_PATTERNS = [
+    re.compile(r"<noscript[^>]*>[^<]*(enable|turn on)[^<]*javascript", re.I),
+    re.compile(r"<div[^>]+id=[\"'](root|app|__next|__nuxt)[\"'][^>]*>\s*</div>", re.I),
+    re.compile(r"cf-browser-verification|challenge-platform|captcha-delivery", re.I)
+]
+MIN_STATIC_TEXT_LENGTH = 500
+# Responses that mean the site wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+MARKUP = re.compile(r"<script.*?</script>|<style.*?</style>|<[^>]+>", re.S | re.I)
+
+_session_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+
+
+def get_http_session() -> requests.Session:
+    """Shared keep-alive session so repeat fetches reuse pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=STATIC_POOL_SIZE, pool_maxsize=STATIC_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers.update(STATIC_HEADERS)
+    return _session
+
+
+def visible_text(html_content: str) -> str:
+    """The page's text without markup, scripts or styles, whitespace collapsed."""
+    return " ".join(MARKUP.sub(" ", html_content).split())
+
+
+def content_fingerprint(html_content: str) -> str:
+    """Cheap hash of a page's visible text, for servers that send no validators."""
+    return hashlib.sha1(visible_text(html_content).encode("utf-8")).hexdigest()[:16]
+
+
+class PageValidators:
+    """What a static fetch of a page can later be revalidated against."""
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], fingerprint: str):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_response(cls, response: requests.Response) -> "PageValidators":
+        return cls(response.headers.get("ETag"), response.headers.get("Last-Modified"), content_fingerprint(response.text))
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional["PageValidators"]:
+        return cls(data.get("etag"), data.get("last_modified"), data["fingerprint"]) if data else None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {"etag": self.etag, "last_modified": self.last_modified, "fingerprint": self.fingerprint}
+
+
+class ValidatorRegistry:
+    """Validators of recent static fetches, keyed by URL until a response cache claims them."""
+
+    def __init__(self, max_entries: int = STATIC_VALIDATOR_ENTRIES):
+        self.max_entries = max_entries
+        self._validators: "OrderedDict[str, PageValidators]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, url: str, validators: PageValidators):
+        with self._lock:
+            self._validators[url] = validators
+            self._validators.move_to_end(url)
+            while len(self._validators) > self.max_entries:
+                self._validators.popitem(last=False)
+
+    def pop(self, url: str) -> Optional[PageValidators]:
+        with self._lock:
+            return self._validators.pop(url, None)
+
+
+page_validators = ValidatorRegistry()
+
+
+def claim_validators(url: str, tier: Optional[str]) -> Optional[Dict[str, Optional[str]]]:
+    """Validators of the static fetch of `url`, to travel with its scrape result.
+
+    Claimed in the process that scraped, since a response cache in another
+    process can't see this one's registry. None unless the static tier
+    served the response: a static page from a browser-rendered scrape is
+    only the shell.
+    """
+    validators = page_validators.pop(url)
+    return validators.to_dict() if validators and tier == TIER_STATIC else None
+
+
+class ThrottleSignals:
+    """Domains that answered a static fetch with 429/503 and their Retry-After, until a scheduler takes them."""
+
+    def __init__(self):
+        self._signals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def note(self, domain: str, retry_after: float):
+        with self._lock:
+            self._signals[domain] = max(retry_after, self._signals.get(domain, 0.0))
+
+    def take(self, domain: str) -> Optional[float]:
+        """Seconds the domain asked us to wait (0 if unspecified), or None if it never throttled."""
+        with self._lock:
+            return self._signals.pop(domain, None)
+
+
+throttle_signals = ThrottleSignals()
+
+
+def _retry_after(response: requests.Response) -> float:
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else 0.0
+
+
+def _usable(response: requests.Response) -> bool:
+    return response.status_code == 200 and "html" in response.headers.get("Content-Type", "")
+
+
+@traced("static_fetch")
+def fetch_static(url: str, timeout: float = STATIC_FETCH_TIMEOUT) -> Optional[str]:
+    """Plain HTTP GET; returns the HTML or None if the response is unusable."""
+    try:
+        response = get_http_session().get(url, timeout=timeout)
+    except requests.RequestException as e:
+        logger.info(f"Static fetch failed for {url}: {e}")
+        return None
+    if not _usable(response):
+        logger.info(f"Static fetch unusable for {url}: HTTP {response.status_code}")
+        if response.status_code in THROTTLE_STATUSES:
+            throttle_signals.note(page_domain(url), _retry_after(response))
+        return None
+    page_validators.remember(url, PageValidators.from_response(response))
+    return response.text
+
+
+@traced("static_revalidate")
+def revalidate_static(url: str, validators: PageValidators, timeout: float = STATIC_FETCH_TIMEOUT) -> Optional[PageValidators]:
+    """Conditional GET of a page fetched before.
+
+    Returns the page's current validators if it is unchanged: the server
+    answered 304, or its visible text hashes the same. Returns None if it
+    changed or could not be fetched.
+    """
+    headers = {}
+    if validators.etag:
+        headers["If-None-Match"] = validators.etag
+    if validators.last_modified:
+        headers["If-Modified-Since"] = validators.last_modified
+    try:
+        response = get_http_session().get(url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        logger.info(f"Revalidation failed for {url}: {e}")
+        return None
+    if response.status_code == 304:
+        return PageValidators(
+            response.headers.get("ETag", validators.etag),
+            response.headers.get("Last-Modified", validators.last_modified),
+            validators.fingerprint
+        )
+    if not _usable(response):
+        return None
+    current = PageValidators.from_response(response)
+    return current if current.fingerprint == validators.fingerprint else None
+
+
+def looks_js_gated(html_content: str) -> bool:
+    """Guess whether a server response is an empty shell or a bot challenge."""
+    if any(pattern.search(html_content) for pattern in JS_GATE_PATTERNS):
+        return True
+    return len(visible_text(html_content)) < MIN_STATIC_TEXT_LENGTH
+
+
+class TierMemory:
+    """Remembers per domain which tier last produced reviews."""
+
+    def __init__(self, ttl: float = TIER_MEMORY_TTL):
+        self.ttl = ttl
+        self._tiers: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain: str) -> Optional[str]:
+        with self._lock:
+            entry = self._tiers.get(domain)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self._tiers.pop(domain, None)
+                return None
+            return entry[0]
+
+    def remember(self, domain: str, tier: str):
+        with self._lock:
+            self._tiers[domain] = (tier, time.time())
+
+
+tier_memory = TierMemory()
+
+
+def fetch_tiered(
+    url: str,
+    extract: Callable[[str], List],
+    render: Callable[[str], str],
+    accept: Callable[[List], bool] = bool
+) -> Tuple[List, str, str]:
+    """Try a static GET first and escalate to the browser only when needed.
+
+    `extract` turns HTML into reviews, `render` returns browser-rendered HTML
+    and `accept` decides whether the static result is good enough. Returns
+    the reviews, the tier that served them and the HTML they came from.
+    """
+    domain = page_domain(url)
+
+    if tier_memory.get(domain) != TIER_BROWSER:
+        html_content = fetch_static(url)
+        if html_content and not looks_js_gated(html_content):
+            reviews = extract(html_content)
+            if accept(reviews):
+                tier_memory.remember(domain, TIER_STATIC)
+                logger.info(f"Served {url} from the static tier")
+                return reviews, TIER_STATIC, html_content
+        logger.info(f"Escalating {url} to the browser tier")
+
+    html_content = render(url)
+    reviews = extract(html_content)
+    if reviews:
+        tier_memory.remember(domain, TIER_BROWSER)
+    return reviews, TIER_BROWSER, html_content
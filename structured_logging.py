@@ -0,0 +1,292 @@
+import os
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+
+from tracing import METRICS, Counter
+
+logger = logging.getLogger()
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of each event's records that are kept, e.g. {"review_extracted": 0.01}
+LOG_SAMPLE_RATES: Dict[str, float] = json.loads(os.getenv("LOG_SAMPLE_RATES", '{"review_extracted": 0.01}'))
+LOG_RATE_LIMITED_EVENTS = set(
+    os.getenv("LOG_RATE_LIMITED_EVENTS", "selector_miss,selector_error,no_review_containers,review_error").split(",")
+)
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "5"))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "60"))
+
+# Clients can ask for a different level on a single request
+LOG_LEVEL_REQUEST_HEADER = "x-log-level"
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+MAX_RATE_KEYS = 4096
+
+# Attributes every LogRecord has; anything else came in through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+LOG_RECORDS_DROPPED = Counter(
+    "scraper_log_records_dropped_total",
+    "Log records not written, by reason: sampled, rate_limited or queue_full.",
+    ("reason",)
+)
+METRICS.append(LOG_RECORDS_DROPPED)
+
+_request_level: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar("log_level", default=None)
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "dict"):
+        return value.dict()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the record's `extra` fields as keys."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "service": self.service,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = _jsonable(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class RequestLevelFilter(logging.Filter):
+    """Drops records below the current request's level, or the configured one."""
+
+    def __init__(self, level: int):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = _request_level.get()
+        return record.levelno >= (self.level if level is None else level)
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through `limit` records per `window` seconds for each repeated message.
+
+    Applies to records whose `event` is in LOG_RATE_LIMITED_EVENTS, keyed by
+    the event, message template and selector. The first record let through
+    after some were held back carries their count as `suppressed`.
+    """
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, window: float = LOG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        # Key -> [window start, records let through, records held back]
+        self._windows: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event not in LOG_RATE_LIMITED_EVENTS:
+            return True
+        key = (event, record.msg, getattr(record, "selector", None))
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= self.window:
+                if len(self._windows) >= MAX_RATE_KEYS:
+                    self._windows.clear()
+                suppressed = window[2] if window else 0
+                self._windows[key] = [record.created, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+        LOG_RECORDS_DROPPED.inc("rate_limited")
+        return False
+
+
+def _sample_rate(event: Optional[str]) -> Optional[float]:
+    """The rate an occurrence of `event` is kept at, or None if this one is dropped."""
+    rate = LOG_SAMPLE_RATES.get(event)
+    if rate is None or _request_level.get() is not None:
+        return 1.0
+    if random.random() < rate:
+        return rate
+    LOG_RECORDS_DROPPED.inc("sampled")
+    return None
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of each sampled event's records, as set in LOG_SAMPLE_RATES.
+
+    Kept records carry `sample_rate` so counts can be scaled back up. Requests
+    that set their own log level are not sampled.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Records from log_event were sampled before they were made
+        if hasattr(record, "sample_rate"):
+            return True
+        rate = _sample_rate(getattr(record, "event", None))
+        if rate is None:
+            return False
+        if rate < 1:
+            record.sample_rate = rate
+        return True
+
+
+def log_event(log: logging.Logger, level: int, msg: str, event: str, **fields):
+    """Log `msg` with `event` and `fields` as extras, sampling before the record exists.
+
+    For hot loops: a sampled-out call costs a level check and a random draw,
+    where `logger.debug(..., extra=...)` would build the record first.
+    """
+    if not log.isEnabledFor(level):
+        return
+    rate = _sample_rate(event)
+    if rate is None:
+        return
+    if rate < 1:
+        fields["sample_rate"] = rate
+    log.log(level, msg, extra={"event": event, **fields}, stacklevel=2)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting or waiting.
+
+    Formatting (including tracebacks and `extra` objects) happens on the
+    listener thread. When the queue is full, records are dropped and counted
+    instead of blocking the caller.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in this process, so the record can travel as is
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc("queue_full")
+
+
+def configure_logging(service: str, level: str = "INFO", log_file: Optional[str] = None) -> Optional[QueueListener]:
+    """Send the root logger's records through a queue to a writer thread.
+
+    `level` (overridden by LOG_LEVEL) is the default for requests that don't
+    ask for their own. Like `logging.basicConfig`, this does nothing if the
+    root logger already has handlers, so the first app imported configures
+    logging for the process.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    level_number = logging.getLevelName((LOG_LEVEL or level).upper())
+    formatter = JsonFormatter(service) if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: "queue.Queue" = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(records)
+    queue_handler.addFilter(RequestLevelFilter(level_number))
+    queue_handler.addFilter(RateLimitFilter())
+    queue_handler.addFilter(SamplingFilter())
+    root.addHandler(queue_handler)
+    root.setLevel(level_number)
+    _levels.default = level_number
+
+    listener = QueueListener(records, *handlers)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
+
+class _LevelRegistry:
+    """Keeps the root logger as verbose as the most verbose request in flight.
+
+    Records are only created at or above the root level, so requests at the
+    default level pay nothing for another request's DEBUG; the records they
+    do create below their own level are dropped by RequestLevelFilter.
+    """
+
+    def __init__(self):
+        self.default = logging.INFO
+        self._active: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def enter(self, level: int):
+        with self._lock:
+            self._active[level] = self._active.get(level, 0) + 1
+            self._apply()
+
+    def leave(self, level: int):
+        with self._lock:
+            self._active[level] -= 1
+            if not self._active[level]:
+                del self._active[level]
+            self._apply()
+
+    def _apply(self):
+        level = min([self.default, *self._active])
+        root = logging.getLogger()
+        if root.level != level:
+            root.setLevel(level)
+
+
+_levels = _LevelRegistry()
+
+
+@contextmanager
+def request_log_level(level: Optional[str]):
+    """Log at `level` (e.g. "debug") for the code run inside, including its scrape threads."""
+    level_number = logging.getLevelName(level.upper()) if level else None
+    if not isinstance(level_number, int):
+        yield
+        return
+    token = _request_level.set(level_number)
+    _levels.enter(level_number)
+    try:
+        yield
+    finally:
+        _levels.leave(level_number)
+        _request_level.reset(token)
+
+
+def instrument_logging(app: FastAPI):
+    """Honour an `X-Log-Level` request header for the duration of that request."""
+    @app.middleware("http")
+    async def request_level(request: Request, call_next):
+        with request_log_level(request.headers.get(LOG_LEVEL_REQUEST_HEADER)):
+            return await call_next(request)
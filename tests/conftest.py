@@ -0,0 +1,12 @@
+"""Test setup: import the services offline and keep their files out of the tree."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The services read these at import time: stub Groq and write their SQLite
+# files and review2's log file to a scratch directory
+SCRATCH_DIR = tempfile.mkdtemp(prefix="tests-")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.chdir(SCRATCH_DIR)
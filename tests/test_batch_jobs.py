@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import defaultdict
+
+import pytest
+from fastapi import HTTPException
+
+import batch_jobs
+from batch_jobs import RESULT_DONE, RESULT_EMPTY, RESULT_FAILED, BatchScheduler, DomainState
+from selector_cache import page_domain
+from static_fetcher import throttle_signals
+
+
+def run_batch(scheduler: BatchScheduler, urls, timeout: float = 5.0):
+    scheduler.start()
+    try:
+        job = scheduler.submit(urls, page_limit=1)
+        results, finished = [], False
+        while not finished:
+            new, finished = job.wait(len(results), timeout)
+            results.extend(new)
+            assert new or finished, "batch stalled"
+        return job
+    finally:
+        scheduler.close()
+
+
+def test_a_hung_url_fails_at_the_deadline_and_frees_its_slot(monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_RETRIES", 0)
+    release = threading.Event()
+
+    def scrape(url, page_limit, parser):
+        if url.endswith("/hung"):
+            release.wait()
+        return {"reviews": []}
+
+    scheduler = BatchScheduler(scrape, max_in_flight=1, deadline=0.2)
+    try:
+        job = run_batch(scheduler, ["https://shop.example/hung", "https://shop.example/ok"])
+    finally:
+        release.set()
+
+    outcomes = {result["url"]: result["status"] for result in job.results}
+    assert outcomes == {"https://shop.example/hung": RESULT_FAILED, "https://shop.example/ok": RESULT_DONE}
+    assert scheduler.snapshot()["in_flight"] == 0
+
+
+class FakeSite:
+    """Batch scrapes that sleep briefly and track concurrency per domain."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.running = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.finished = []
+        self._lock = threading.Lock()
+
+    def scrape(self, url, page_limit, parser):
+        domain = page_domain(url)
+        with self._lock:
+            self.running[domain] += 1
+            self.peak[domain] = max(self.peak[domain], self.running[domain])
+        try:
+            time.sleep(self.delay)
+            return self.answer(url)
+        finally:
+            with self._lock:
+                self.running[domain] -= 1
+                self.finished.append(url)
+
+    def answer(self, url):
+        return {"reviews": [{"body": url}]}
+
+
+def test_the_window_grows_fast_until_pushback_then_by_one_per_window():
+    state = DomainState(max_limit=8)
+    for _ in range(3):
+        state.succeeded()
+    assert state.limit == 4
+
+    state.congested(time.monotonic(), None)
+    assert state.limit == 2
+    assert state.threshold == 2
+    # Past the threshold, each success adds 1/limit: about one per window
+    state.succeeded()
+    assert state.limit == 2.5
+    state.succeeded()
+    assert state.limit == pytest.approx(2.9)
+
+
+def test_failures_started_before_a_cut_do_not_cut_again():
+    state = DomainState(max_limit=8)
+    state.limit = 8.0
+    started_at = time.monotonic()
+    state.congested(started_at, None)
+    state.congested(started_at, None)
+    assert state.limit == 4
+    assert state.failures == 2
+
+    state.congested(time.monotonic(), None)
+    assert state.limit == 2
+
+
+def test_a_throttled_domain_pauses_for_its_retry_after(monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_BACKOFF", 1)
+    state = DomainState()
+    state.queue.append(("job", "url", 0))
+    state.congested(time.monotonic(), 30)
+    assert not state.runnable(time.monotonic())
+    assert not state.runnable(time.monotonic() + 29)
+    assert state.runnable(time.monotonic() + 31)
+
+
+def test_urls_are_scheduled_per_domain_without_starving_small_sites():
+    site = FakeSite()
+    scheduler = BatchScheduler(site.scrape, max_in_flight=4)
+    big = [f"https://big.example/p/{number}" for number in range(12)]
+    small = [f"https://small.example/p/{number}" for number in range(2)]
+
+    job = run_batch(scheduler, big + small)
+
+    assert {result["status"] for result in job.results} == {RESULT_DONE}
+    assert len(job.results) == 14
+    # Round-robin across domains: the small site finishes long before the big one
+    assert max(site.finished.index(url) for url in small) < len(site.finished) - 4
+    assert site.peak["big.example"] <= batch_jobs.BATCH_DOMAIN_MAX_CONCURRENCY
+    snapshot = scheduler.snapshot()["domains"]
+    assert snapshot["big.example"]["successes"] == 12
+    assert snapshot["big.example"]["limit"] > 1
+
+
+def test_429s_and_errors_cut_the_domain_window_and_are_retried(monkeypatch):
+    monkeypatch.setattr(batch_jobs, "BATCH_BACKOFF", 0.1)
+
+    class PushyFakeSite(FakeSite):
+        def __init__(self):
+            super().__init__()
+            self.calls = defaultdict(int)
+
+        def answer(self, url):
+            with self._lock:
+                self.calls[url] += 1
+                calls = self.calls[url]
+            if url.endswith("/throttled") and calls == 1:
+                throttle_signals.note(page_domain(url), 0)
+                raise HTTPException(status_code=429, detail="Too many requests")
+            if url.endswith("/broken"):
+                raise RuntimeError("browser crashed")
+            if url.endswith("/empty"):
+                raise HTTPException(status_code=404, detail="No valid reviews found on page")
+            return super().answer(url)
+
+    site = PushyFakeSite()
+    scheduler = BatchScheduler(site.scrape, max_in_flight=2)
+    urls = ["https://pushy.example/throttled", "https://pushy.example/broken", "https://pushy.example/empty"]
+    urls += [f"https://calm.example/p/{number}" for number in range(3)]
+
+    job = run_batch(scheduler, urls)
+
+    results = {result["url"]: result for result in job.results}
+    assert results["https://pushy.example/throttled"]["status"] == RESULT_DONE
+    assert results["https://pushy.example/throttled"]["attempts"] == 2
+    assert results["https://pushy.example/broken"]["status"] == RESULT_FAILED
+    assert results["https://pushy.example/broken"]["attempts"] == batch_jobs.BATCH_RETRIES + 1
+    # A page without reviews is an answer, not pushback, and isn't retried
+    assert results["https://pushy.example/empty"]["status"] == RESULT_EMPTY
+    assert results["https://pushy.example/empty"]["attempts"] == 1
+
+    domains = scheduler.snapshot()["domains"]
+    assert domains["pushy.example"]["failures"] == 1 + batch_jobs.BATCH_RETRIES + 1
+    assert domains["pushy.example"]["limit"] == 1
+    assert domains["calm.example"]["failures"] == 0
+    assert domains["calm.example"]["successes"] == 3
@@ -0,0 +1,13 @@
+import sys
+
+from dom_condenser import condense_html
+
+
+def test_deeply_nested_markup_is_condensed_without_recursing():
+    depth = sys.getrecursionlimit() * 2
+    html_content = (
+        "<html><body>" + "<div>" * depth
+        + '<div class="review"><p>Works well</p></div>' * 3
+        + "</div>" * depth + "</body></html>"
+    )
+    assert "Works well" in condense_html(html_content)
@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+import pytest
+
+from benchmarks.fixtures import load_corpus
+from html_parser import FALLBACK_PARSER, available_backends, parse_html
+from llm_selectors import DEFAULT_SELECTORS
+from pattern_extraction import extract_reviews
+from selector_matcher import SelectorMatcher, select_first_working
+
+# "huge" is "nested" at 25 times the size, there for timings only
+CORPUS = {name: html_content for name, html_content in load_corpus().items() if name != "huge"}
+FIELD_MATCHER = SelectorMatcher({field: DEFAULT_SELECTORS[field] for field in ("body", "rating", "reviewer")})
+
+
+@lru_cache(maxsize=None)
+def extract(name: str, backend: str):
+    """review1's default-selector fields and review2's pattern reviews, as plain data."""
+    soup = parse_html(CORPUS[name], backend)
+    _, elements = select_first_working(soup, DEFAULT_SELECTORS["review_item"])
+    fields = [
+        {field: match.get_text(strip=True) if match else None for field, match in FIELD_MATCHER.match(element).items()}
+        for element in elements
+    ]
+    return fields, [review.dict() for review in extract_reviews(soup)]
+
+
+@pytest.mark.parametrize("backend", available_backends())
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_backends_extract_the_same_reviews(name, backend):
+    fields, reviews = extract(name, backend)
+    assert fields
+    assert (fields, reviews) == extract(name, FALLBACK_PARSER)
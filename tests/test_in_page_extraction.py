@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from benchmarks.fixtures import CORPUS_DIR, load_corpus
+from browser_pool import create_chrome_driver
+from html_parser import parse_html
+from in_page_extraction import extract_in_page
+from llm_selectors import DEFAULT_SELECTORS
+from pattern_extraction import REVIEW_SELECTORS
+from selector_matcher import SelectorMatcher, select_first_working
+
+# "huge" is "nested" at 25 times the size, there for timings only
+PAGES = sorted(name for name in load_corpus() if name != "huge")
+
+# Extractor -> (container selectors, field selectors with the body first)
+EXTRACTORS = {
+    "review1": (
+        DEFAULT_SELECTORS["review_item"],
+        {field: DEFAULT_SELECTORS[field] for field in ("body", "rating", "reviewer")}
+    ),
+    "review2": (
+        REVIEW_SELECTORS["review_containers"],
+        {field: REVIEW_SELECTORS[field] for field in ("review_text", "rating", "reviewer")}
+    )
+}
+
+
+@pytest.fixture(scope="module")
+def driver():
+    try:
+        driver = create_chrome_driver()
+    except Exception as e:
+        pytest.skip(f"Chrome is not available: {e}")
+    yield driver
+    driver.quit()
+
+
+def python_fields(html_content: str, containers, fields):
+    """What the Python side reads from each container, in the in-page result's shape.
+
+    Like the script, containers without a body (the first field) are skipped.
+    """
+    _, elements = select_first_working(parse_html(html_content), containers)
+    matcher = SelectorMatcher(fields)
+    body = next(iter(fields))
+    rows = []
+    for element in elements:
+        row = {field: match.get_text(strip=True) if match else None for field, match in matcher.match(element).items()}
+        if not row[body]:
+            continue
+        row["images"] = [img["src"] for img in element.select("img[src]")]
+        rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize("extractor", sorted(EXTRACTORS))
+@pytest.mark.parametrize("name", PAGES)
+def test_in_page_fields_match_selector_matcher(driver, name, extractor):
+    containers, fields = EXTRACTORS[extractor]
+    driver.get("file://" + os.path.join(CORPUS_DIR, f"{name}.html"))
+
+    result = extract_in_page(driver, containers, fields)
+
+    assert result is not None
+    assert result.fields == python_fields(driver.page_source, containers, fields)
@@ -0,0 +1,100 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import LLMGateway, StubBackend
+
+MESSAGES = [{"role": "user", "content": "html"}]
+
+
+class StalledBackend:
+    """Blocks the gateway loop itself, so the call's own timeout never fires."""
+
+    async def complete(self, messages, max_tokens):
+        time.sleep(1)
+        return "{}"
+
+
+def test_complete_sync_gives_up_on_a_stalled_gateway():
+    gateway = LLMGateway(StalledBackend(), timeout=0.1, queue_grace=0.1)
+    try:
+        start = time.monotonic()
+        assert gateway.complete_sync(None, MESSAGES) is None
+        assert time.monotonic() - start < 0.8
+        assert gateway.stats["timeouts"] == 1
+    finally:
+        gateway.close()
+
+
+class PeakBackend(StubBackend):
+    """Stub that records how many calls it ran at once."""
+
+    def __init__(self, delay: float):
+        super().__init__("{}", delay)
+        self.running = 0
+        self.peak = 0
+
+    async def complete(self, messages, max_tokens):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            return await super().complete(messages, max_tokens)
+        finally:
+            self.running -= 1
+
+
+def test_identical_concurrent_prompts_share_one_call():
+    backend = StubBackend('{"review_item": ".review"}', delay=0.2)
+    gateway = LLMGateway(backend)
+    try:
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            answers = list(pool.map(lambda _: gateway.complete_sync(("shop.example", "abc"), MESSAGES), range(5)))
+        assert answers == ['{"review_item": ".review"}'] * 5
+        assert backend.calls == 1
+        assert gateway.stats["coalesced"] == 4
+
+        # Once the call finished, the same key asks again
+        gateway.complete_sync(("shop.example", "abc"), MESSAGES)
+        assert backend.calls == 2
+    finally:
+        gateway.close()
+
+
+def test_calls_beyond_the_concurrency_limit_wait_their_turn():
+    backend = PeakBackend(delay=0.1)
+    gateway = LLMGateway(backend, max_concurrency=2)
+    try:
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            answers = list(pool.map(lambda index: gateway.complete_sync(("shop.example", index), MESSAGES), range(6)))
+        assert answers == ["{}"] * 6
+        assert backend.calls == 6
+        assert backend.peak == 2
+    finally:
+        gateway.close()
+
+
+def test_a_call_that_would_wait_too_long_for_token_budget_is_skipped():
+    backend = StubBackend()
+    # One token a second, so a second 50-token call would wait far past the timeout
+    gateway = LLMGateway(backend, tokens_per_minute=60, timeout=1)
+    try:
+        assert gateway.complete_sync(None, MESSAGES, max_tokens=50) == "{}"
+        assert gateway.complete_sync(None, MESSAGES, max_tokens=50) is None
+        assert backend.calls == 1
+        assert gateway.stats["throttled"] == 1
+    finally:
+        gateway.close()
+
+
+def test_async_callers_share_one_call_too():
+    backend = StubBackend(delay=0.1)
+    gateway = LLMGateway(backend)
+
+    async def ask_together():
+        return await asyncio.gather(*(gateway.complete("key", MESSAGES) for _ in range(3)))
+
+    try:
+        assert asyncio.run(ask_together()) == ["{}"] * 3
+        assert backend.calls == 1
+    finally:
+        gateway.close()
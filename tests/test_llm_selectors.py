@@ -0,0 +1,56 @@
+import time
+
+from html_parser import parse_html
+from llm_selectors import DEFAULT_SELECTORS, SelectorExtractor
+from selector_cache import SelectorCache, page_domain, page_fingerprint
+
+URL = "https://shop.example/products/1"
+HTML = "<html><body>" + "".join(
+    f'<div class="feedback-card"><p class="feedback-body">Great product number {index}, would buy again</p>'
+    f'<span class="feedback-author">Buyer {index}</span></div>'
+    for index in range(4)
+) + "</body></html>"
+
+
+class FailingGateway:
+    """Answers every selector request like an LLM that timed out."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def complete_sync(self, key, messages, max_tokens=None):
+        time.sleep(self.delay)
+        return None
+
+
+def test_heuristic_selectors_are_cached_without_the_failed_llm_call_latency(tmp_path):
+    cache = SelectorCache("test", path=str(tmp_path / "selectors.db"))
+    extractor = SelectorExtractor(FailingGateway(delay=0.3), cache)
+    soup = parse_html(HTML)
+
+    extractor.get_page_selectors(URL, HTML, soup)
+
+    assert cache.get(page_domain(URL), page_fingerprint(soup)) is not None
+    assert cache.stats["saved_llm_seconds"] < 0.3
+
+
+class AnsweringGateway:
+    def __init__(self, answer: str):
+        self.answer = answer
+
+    def complete_sync(self, key, messages, max_tokens=None):
+        return self.answer
+
+
+def test_llm_selector_values_that_are_not_selectors_fall_back_to_defaults(tmp_path):
+    answer = '{"review_item": ".feedback-card", "body": null, "rating": 5, "reviewer": [".feedback-author", 3]}'
+    extractor = SelectorExtractor(AnsweringGateway(answer), SelectorCache("test", path=str(tmp_path / "selectors.db")))
+
+    selectors = extractor.get_llm_selectors(HTML)
+
+    assert selectors["review_item"] == [".feedback-card"]
+    assert selectors["body"] == DEFAULT_SELECTORS["body"]
+    assert selectors["rating"] == DEFAULT_SELECTORS["rating"]
+    assert selectors["reviewer"] == [".feedback-author"]
+    reviews = extractor.select_page_reviews(URL, HTML, parse_html(HTML))
+    assert len(reviews) == 4
@@ -0,0 +1,83 @@
+import pytest
+
+from pagination import PageBudget, RenderedPage, detect_pagination, paginate
+
+
+def page(number: int, next_href: str) -> str:
+    reviews = "".join(f'<div class="review"><p>Review {number}-{index}</p></div>' for index in range(2))
+    return f'<html><body>{reviews}<a class="next" href="{next_href}">Next</a></body></html>'
+
+
+def extract(html_content: str):
+    return [{"body": line.split("</p>")[0]} for line in html_content.split("<p>")[1:]]
+
+
+@pytest.mark.parametrize("next_href", [
+    "/products/1?page=2",  # numbered pages, prefetched concurrently
+    "/products/1/more"     # a bare next link, followed one page at a time
+])
+def test_a_failing_page_keeps_the_reviews_already_collected(next_href):
+    def fetch_html(page_url: str) -> str:
+        if page_url.endswith("page=3") or page_url.endswith("/more2"):
+            raise RuntimeError("browser crashed")
+        return page(2, "/products/1?page=3" if "page=" in page_url else "/products/1/more2")
+
+    first_page = page(1, next_href)
+    reviews, next_page = paginate("https://shop.example/products/1", first_page, extract(first_page), PageBudget(5), fetch_html, extract)
+
+    assert [review["body"] for review in reviews] == ["Review 1-0", "Review 1-1", "Review 2-0", "Review 2-1"]
+    assert next_page is None
+
+
+def test_a_page_number_in_the_url_alone_is_not_pagination():
+    # ?p=123 is as likely a product id as a page number
+    html_content = '<html><body><a href="/products?p=456">Related product</a></body></html>'
+    assert detect_pagination(html_content, "https://shop.example/products?p=123") is None
+
+
+def test_a_link_to_the_following_page_confirms_numbered_pages():
+    html_content = '<html><body><a href="/reviews?p=4">4</a><a href="/reviews?p=5">5</a></body></html>'
+    pattern = detect_pagination(html_content, "https://shop.example/reviews?p=3")
+    assert pattern.current == 3
+    assert pattern.page_url(4) == "https://shop.example/reviews?p=4"
+
+
+def test_load_more_rounds_and_followed_pages_share_one_budget():
+    budget = PageBudget(4)
+    # Two load-more rounds on the first page leave one page to follow
+    budget.spend(2)
+    fetched = []
+
+    def fetch_html(page_url: str) -> str:
+        fetched.append(page_url)
+        number = int(page_url.rsplit("=", 1)[1])
+        return page(number, f"/products/1?page={number + 1}")
+
+    first_page = page(1, "/products/1?page=2")
+    reviews, next_page = paginate("https://shop.example/products/1", first_page, extract(first_page), budget, fetch_html, extract)
+
+    assert fetched == ["https://shop.example/products/1?page=2"]
+    assert len(reviews) == 4
+    assert next_page == "https://shop.example/products/1?page=3"
+    assert budget.remaining == 0
+
+
+def test_pages_extracted_in_the_browser_are_followed_by_their_next_link():
+    def harvested(number: int) -> RenderedPage:
+        reviews = [{"body": f"Review {number}-{index}"} for index in range(2)]
+        # As written in the page's href
+        return RenderedPage(reviews, f"/products/1/more{number + 1}")
+
+    def extract(page):
+        assert isinstance(page, RenderedPage)
+        return page.reviews
+
+    first_page = harvested(1)
+    reviews, next_page = paginate(
+        "https://shop.example/products/1", first_page, first_page.reviews, PageBudget(3),
+        lambda page_url: harvested(int(page_url.rsplit("more", 1)[1])), extract
+    )
+
+    assert [review["body"] for review in reviews][-2:] == ["Review 3-0", "Review 3-1"]
+    assert len(reviews) == 6
+    assert next_page == "https://shop.example/products/1/more4"
@@ -0,0 +1,27 @@
+import pytest
+
+from resource_blocking import resource_category
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.iconic.com/product/1",
+    "https://www.gifts.example/p/42?color=red",
+    "https://movies.example/reviews",
+    "https://css.example/api/reviews?page=2",
+    "https://shop.example/api/reviews?format=json"
+])
+def test_documents_on_lookalike_hosts_are_never_blocked(url):
+    assert resource_category(url) is None
+
+
+@pytest.mark.parametrize("url, category", [
+    ("https://cdn.example/img/review-1.PNG", "image"),
+    ("https://cdn.example/favicon.ico?v=3", "image"),
+    ("https://fonts.example/inter.woff2", "font"),
+    ("https://cdn.example/clip.mov", "media"),
+    ("https://shop.example/static/site.css?v=abc", "stylesheet"),
+    ("https://www.google-analytics.com/collect?v=1", "analytics")
+])
+def test_subresources_are_categorized_by_path_extension(url, category):
+    assert resource_category(url) == category
+
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import response_cache
+from response_cache import ResponseCache, cache_key
+from static_fetcher import TIER_BROWSER, TIER_STATIC, PageValidators
+
+URL = "https://shop.example/products/1"
+VALIDATORS = {"etag": '"v1"', "last_modified": None, "fingerprint": "abc123"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class Site:
+    """Scrapes that count themselves, and the conditional GETs answered for the first page."""
+
+    def __init__(self, tier: str = TIER_STATIC):
+        self.tier = tier
+        self.version = 0
+        self.changed = False
+        self.revalidations = 0
+        self.failing = False
+
+    async def scrape(self):
+        if self.failing:
+            raise HTTPException(status_code=503, detail="Site unavailable")
+        self.version += 1
+        validators = VALIDATORS if self.tier == TIER_STATIC else None
+        return {"reviews_count": self.version, "reviews": [], "tier": self.tier, "validators": validators}
+
+    def revalidate_static(self, url, validators):
+        self.revalidations += 1
+        return None if self.changed else PageValidators(validators.etag, None, validators.fingerprint)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def site(monkeypatch):
+    site = Site()
+    monkeypatch.setattr(response_cache, "revalidate_static", site.revalidate_static)
+    return site
+
+
+def serve(cache: ResponseCache, site: Site, refresh: bool = False) -> dict:
+    async def serve_and_settle():
+        served = await cache.serve(URL, 5, None, site.scrape, refresh)
+        # Let any background refresh finish before the clock moves on
+        while cache._refreshing:
+            await asyncio.sleep(0.01)
+        return served
+
+    return asyncio.run(serve_and_settle())
+
+
+def test_validators_from_a_worker_scrape_are_kept_but_not_served(tmp_path):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"))
+
+    async def scrape():
+        # What JobClient.run returns: the worker's response, validators included
+        return {"reviews_count": 1, "reviews": [{"body": "Great"}], "tier": TIER_STATIC, "validators": VALIDATORS}
+
+    served = asyncio.run(cache.serve(URL, 5, None, scrape))
+
+    assert "validators" not in served
+    entry = cache.get(cache_key(URL, 5))
+    assert entry.validators.to_dict() == VALIDATORS
+
+
+def test_fresh_entries_are_served_without_scraping(tmp_path, clock, site):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+
+    assert serve(cache, site)["reviews_count"] == 1
+    clock.now += 59
+    assert serve(cache, site)["reviews_count"] == 1
+
+    assert site.version == 1
+    assert site.revalidations == 0
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 1)
+
+
+def test_stale_entries_are_served_while_a_background_refresh_scrapes_changed_pages(tmp_path, clock, site):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+    serve(cache, site)
+
+    site.changed = True
+    clock.now += 120
+    # The stale response goes out at once; the refresh stores the new scrape
+    assert serve(cache, site)["reviews_count"] == 1
+    assert site.version == 2
+    assert serve(cache, site)["reviews_count"] == 2
+    assert (cache.stats["stale_hits"], cache.stats["refreshes"], cache.stats["hits"]) == (1, 1, 1)
+
+
+def test_a_background_refresh_of_an_unchanged_page_only_revalidates(tmp_path, clock, site):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+    serve(cache, site)
+
+    clock.now += 120
+    serve(cache, site)
+    assert site.revalidations == 1
+    assert site.version == 1
+
+    # Renewed: fresh again from the revalidation
+    clock.now += 30
+    serve(cache, site)
+    assert cache.stats["hits"] == 1
+    assert cache.stats["revalidated"] == 1
+
+
+def test_a_failed_background_refresh_keeps_the_stale_entry(tmp_path, clock, site):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+    serve(cache, site)
+
+    site.changed = True
+    site.failing = True
+    clock.now += 120
+    assert serve(cache, site)["reviews_count"] == 1
+    assert serve(cache, site)["reviews_count"] == 1
+    assert cache.stats["refresh_failures"] == 2
+
+
+def test_expired_entries_are_revalidated_before_being_served(tmp_path, clock, site):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+    serve(cache, site)
+
+    clock.now += 1000
+    assert serve(cache, site)["reviews_count"] == 1
+    assert site.revalidations == 1
+    assert site.version == 1
+
+    site.changed = True
+    clock.now += 1000
+    assert serve(cache, site)["reviews_count"] == 2
+    assert cache.stats["misses"] == 2
+
+
+def test_expired_browser_responses_are_scraped_again(tmp_path, clock, monkeypatch):
+    site = Site(TIER_BROWSER)
+    monkeypatch.setattr(response_cache, "revalidate_static", site.revalidate_static)
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+    serve(cache, site)
+
+    clock.now += 1000
+    assert serve(cache, site)["reviews_count"] == 2
+    assert site.revalidations == 0
+
+
+def test_refresh_skips_the_cache_but_updates_it(tmp_path, clock, site):
+    cache = ResponseCache("test", path=str(tmp_path / "responses.db"), ttl=60, stale_ttl=600)
+    serve(cache, site)
+
+    assert serve(cache, site, refresh=True)["reviews_count"] == 2
+    assert serve(cache, site)["reviews_count"] == 2
+    assert cache.stats["hits"] == 1
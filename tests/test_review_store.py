@@ -0,0 +1,117 @@
+from fastapi.testclient import TestClient
+
+import review_store
+from pagination import PageBudget
+from review_store import ReviewStore, product_key, scrape_incremental
+from static_fetcher import TIER_BROWSER
+
+URL = "https://shop.example/products/1"
+
+
+class SyntheticProduct:
+    """A product's reviews, newest first, two per page linked by bare next links."""
+
+    def __init__(self, count: int):
+        self.reviews = [{"body": f"Review {number}", "reviewer": f"Buyer {number}"} for number in range(count, 0, -1)]
+        self.fetched = []
+
+    def post(self, count: int):
+        newest = len(self.reviews)
+        self.reviews[:0] = [
+            {"body": f"Review {number}", "reviewer": f"Buyer {number}"}
+            for number in range(newest + count, newest, -1)
+        ]
+
+    def render(self, page_url: str) -> str:
+        self.fetched.append(page_url)
+        page = int(page_url.rsplit("/more", 1)[1]) if "/more" in page_url else 1
+        reviews = self.reviews[2 * (page - 1):2 * page]
+        html_content = "".join(f'<div class="review"><p>{review["body"]}</p><b>{review["reviewer"]}</b></div>' for review in reviews)
+        if 2 * page < len(self.reviews):
+            html_content += f'<a rel="next" href="/products/1/more{page + 1}">Next</a>'
+        return f"<html><body>{html_content}</body></html>"
+
+
+def extract(html_content: str):
+    return [
+        {"body": block.split("<p>")[1].split("</p>")[0], "reviewer": block.split("<b>")[1].split("</b>")[0]}
+        for block in html_content.split('<div class="review">')[1:]
+    ]
+
+
+def scrape(store: ReviewStore, product: SyntheticProduct, page_limit: int = 10):
+    product.fetched = []
+    return scrape_incremental(store, URL, PageBudget(page_limit), extract, product.render)
+
+
+def fetch_rendered(monkeypatch):
+    # Skip the static GET: every page comes from the synthetic renderer
+    def fetch_tiered(url, extract, render, accept=bool):
+        html_content = render(url)
+        return extract(html_content), TIER_BROWSER, html_content
+
+    monkeypatch.setattr(review_store, "fetch_tiered", fetch_tiered)
+
+
+def test_product_key_ignores_paging_sorting_and_tracking():
+    assert product_key("https://Shop.example/products/1/?page=3&sort=newest&utm_source=mail#reviews") == "shop.example/products/1"
+    assert product_key("https://shop.example/item?id=7&p=2") == "shop.example/item?id=7"
+
+
+def test_cursor_returns_only_reviews_stored_after_it(tmp_path):
+    store = ReviewStore("test", path=str(tmp_path / "reviews.db"))
+    first = [{"body": "One"}, {"body": "Two"}]
+    assert store.add(URL, first) == first
+    cursor = store.cursor(URL)
+    assert cursor == 2
+
+    # Already stored, whatever the whitespace, case or page URL
+    assert store.add(URL + "?page=2", [{"body": " one "}, {"body": "Three"}]) == [{"body": "Three"}]
+
+    reviews, next_cursor = store.changes(URL, cursor)
+    assert [review["body"] for review in reviews] == ["Three"]
+    assert next_cursor == 3
+    assert store.changes(URL, next_cursor) == ([], next_cursor)
+    assert ReviewStore("other", path=str(tmp_path / "reviews.db")).changes(URL) == ([], 0)
+
+
+def test_incremental_scrape_stops_at_the_first_page_of_known_reviews(monkeypatch, tmp_path):
+    fetch_rendered(monkeypatch)
+    store = ReviewStore("test", path=str(tmp_path / "reviews.db"))
+    product = SyntheticProduct(10)
+
+    first = scrape(store, product)
+    assert len(first.reviews) == 10
+    assert first.pages == 5
+    assert first.cursor == 10
+
+    product.post(2)
+    second = scrape(store, product)
+    # Page 1 holds the two new reviews, page 2 only known ones
+    assert [review["body"] for review in second.reviews] == ["Review 12", "Review 11"]
+    assert second.pages == 2
+    assert len(product.fetched) == 2
+    assert second.next_page is None
+    assert second.cursor == 12
+
+    reviews, cursor = store.changes(URL, first.cursor)
+    assert [review["body"] for review in reviews] == ["Review 12", "Review 11"]
+    assert cursor == second.cursor
+
+
+def test_changes_endpoint_serves_stored_reviews_after_the_cursor(monkeypatch, tmp_path):
+    import review1
+    store = ReviewStore("review1", path=str(tmp_path / "reviews.db"))
+    monkeypatch.setattr(review1, "review_store", store)
+    store.add(URL, [{"body": "One"}, {"body": "Two"}])
+    client = TestClient(review1.app)
+
+    response = client.get("/api/reviews/changes", params={"page": URL, "cursor": 1}).json()
+    assert response["reviews_count"] == 1
+    assert response["reviews"][0]["body"] == "Two"
+    assert response["cursor"] == 2
+    assert "validators" not in response
+
+    unchanged = client.get("/api/reviews/changes", params={"page": URL, "cursor": 2}).json()
+    assert unchanged["reviews"] == []
+    assert unchanged["cursor"] == 2
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from job_queue import JOB_FAILED, JobClient, SQLiteJobQueue
+from scrape_worker import ScrapeWorker
+from selector_cache import page_domain
+from static_fetcher import TIER_STATIC, throttle_signals
+
+
+def test_review1_job_without_reviews_fails_without_retry(monkeypatch, tmp_path):
+    import review1
+    monkeypatch.setattr(review1, "fetch_tiered", lambda url, extract, render: ([], TIER_STATIC, "<html></html>"))
+    monkeypatch.setattr(review1, "paginate", lambda *args: ([], None))
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    worker = ScrapeWorker("review1", queue=queue)
+    job_id = queue.enqueue(
+        "review1", {"url": "https://shop.example/p/1", "page_limit": 1, "parser": None, "incremental": False}
+    )
+
+    worker._run_job(queue.claim("review1", worker.id))
+
+    job = queue.get(job_id)
+    assert job["status"] == JOB_FAILED
+    assert job["attempts"] == 1
+    assert job["error"]["status_code"] == 404
+    assert queue.claim("review1", worker.id) is None
+
+
+def test_job_client_rejects_requests_once_the_queue_is_full(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    client = JobClient("review1", queue=queue, max_queue=2)
+    for number in range(2):
+        queue.enqueue("review1", {"url": f"https://shop.example/p/{number}"})
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(client.run("https://shop.example/p/3"))
+    assert rejected.value.status_code == 429
+    assert queue.depth("review1") == 2
+
+    client.shutdown()
+    with pytest.raises(HTTPException) as closed:
+        asyncio.run(client.run("https://shop.example/p/3"))
+    assert closed.value.status_code == 503
+
+
+def test_throttle_signals_travel_back_with_the_job(monkeypatch, tmp_path):
+    import review1
+
+    def throttled(url, extract, render):
+        throttle_signals.note(page_domain(url), 7.0)
+        return [], TIER_STATIC, "<html></html>"
+
+    monkeypatch.setattr(review1, "fetch_tiered", throttled)
+    monkeypatch.setattr(review1, "paginate", lambda *args: ([], None))
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    worker = ScrapeWorker("review1", queue=queue)
+    job_id = queue.enqueue(
+        "review1", {"url": "https://shop.example/p/1", "page_limit": 1, "parser": None, "incremental": False}
+    )
+
+    worker._run_job(queue.claim("review1", worker.id))
+
+    # Taken in the worker, handed back to the scheduler's process by the client
+    assert throttle_signals.take("shop.example") is None
+    with pytest.raises(HTTPException):
+        JobClient("review1", queue=queue)._outcome(queue.get(job_id))
+    assert throttle_signals.take("shop.example") == 7.0
@@ -0,0 +1,38 @@
+import pytest
+
+from html_parser import parse_html
+from selector_matcher import SIMPLE_SELECTOR, compile_selector
+
+HTML = """
+<div class="Review-card" data-x="a b"><p class="REVIEW-text">One</p></div>
+<div class="review" data-x="a"><p class="review-text">Two</p></div>
+<span itemprop="reviewBody">Three</span>
+"""
+
+
+@pytest.mark.parametrize("selector", [
+    "[class*=review i]",
+    "[class*='review' i]",
+    '[class*="review" s]',
+    "[data-x=a b]",
+    "[data-x=\"a']"
+])
+def test_flagged_or_malformed_attribute_selectors_are_left_to_soupsieve(selector):
+    assert SIMPLE_SELECTOR.match(selector) is None
+
+
+@pytest.mark.parametrize("selector", [
+    ".review",
+    "div.review",
+    "[class*=review]",
+    "[class*=review i]",
+    "[class*='review' i]",
+    '[data-x="a b"]',
+    "[data-x='a']",
+    "[itemprop=reviewBody]",
+    "p"
+])
+def test_compiled_selectors_match_like_soupsieve(selector):
+    soup = parse_html(HTML)
+    predicate = compile_selector(selector)
+    assert [node for node in soup.find_all(True) if predicate(node)] == soup.select(selector)
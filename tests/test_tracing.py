@@ -0,0 +1,23 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tracing import instrument_app, render_metrics
+
+
+def test_request_seconds_are_labelled_by_route_template():
+    app = FastAPI()
+    instrument_app(app, "test_tracing")
+
+    @app.get("/products/{product_id}")
+    def product(product_id: str):
+        return {}
+
+    client = TestClient(app)
+    for path in ("/products/1", "/products/2", "/missing/3", "/missing/4"):
+        client.get(path)
+
+    counts = [line for line in render_metrics().splitlines() if line.startswith("scraper_request_seconds_count") and 'service="test_tracing"' in line]
+    assert counts == [
+        'scraper_request_seconds_count{service="test_tracing",path="/products/{product_id}",status="200"} 2.0',
+        'scraper_request_seconds_count{service="test_tracing",path="unmatched",status="404"} 2.0'
+    ]
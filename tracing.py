@@ -0,0 +1,202 @@
+import os
+import time
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger()
+
+# Tracing configuration
+TIMING_HEADER = os.getenv("TIMING_HEADER", "0") == "1"
+TRACE_BUCKETS = [
+    float(bucket)
+    for bucket in os.getenv("TRACE_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60").split(",")
+]
+
+# Clients can ask for the timing header on a single request
+TIMING_REQUEST_HEADER = "x-timing"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Service label for stages timed outside any request (e.g. benchmarks)
+service_name = "scraper"
+
+
+def _label_text(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: List[float] = TRACE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = sorted(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: str, value: float):
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            series = self._series.setdefault(labels, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("scraper_stage_seconds", "Time spent in each scrape stage.", ("service", "stage"))
+REQUEST_SECONDS = Histogram("scraper_request_seconds", "End-to-end HTTP request time.", ("service", "path", "status"))
+SELECTOR_FALLBACKS = Counter(
+    "scraper_selector_fallbacks_total",
+    "Pages where LLM selectors were unavailable and defaults or heuristics were used.",
+    ("service", "reason")
+)
+METRICS = [STAGE_SECONDS, REQUEST_SECONDS, SELECTOR_FALLBACKS]
+
+
+class Trace:
+    """Stage timings collected for one HTTP request, across its scrape threads."""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.spans: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        totals: Dict[str, Tuple[float, int]] = {}
+        with self._lock:
+            for stage, seconds in self.spans:
+                total, count = totals.get(stage, (0.0, 0))
+                totals[stage] = (total + seconds, count + 1)
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total milliseconds per stage."""
+        return ", ".join(
+            f'{stage};dur={total * 1000:.1f};desc="{count}x"'
+            for stage, (total, count) in self.totals().items()
+        )
+
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as `stage` in the histograms and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+        STAGE_SECONDS.observe(trace.service if trace else service_name, stage, value=elapsed)
+
+
+def traced(stage: str):
+    """Decorator form of `span` for functions that are a stage on their own."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_fallback(reason: str):
+    trace = _current_trace.get()
+    SELECTOR_FALLBACKS.inc(trace.service if trace else service_name, reason)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def route_path(request: Request) -> str:
+    """The matched route's path template, so label values stay bounded whatever the URL."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def instrument_app(app: FastAPI, service: str):
+    """Trace every request of `app` and serve Prometheus metrics on /metrics."""
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        trace = Trace(service)
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            _current_trace.reset(token)
+            if request.url.path != "/metrics":
+                REQUEST_SECONDS.observe(service, route_path(request), str(status), value=time.perf_counter() - start)
+        if trace.spans and (TIMING_HEADER or request.headers.get(TIMING_REQUEST_HEADER)):
+            response.headers["Server-Timing"] = trace.server_timing()
+        return response
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)